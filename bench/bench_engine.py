@@ -0,0 +1,71 @@
+# タイマーの処理を仮想の時計で進め、1回の tick にかかる時間を計測する
+#   python bench/bench_engine.py [--days 7] [--step 0] [--working 90] [--rest 10]
+# --step: 1回の tick で進める秒数 (0 なら画面と同じく次の秒境界まで)。
+#         大きくすると、スリープ復帰のように時間が飛んだ場合の動作になる
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from perf import percentile  # noqa: E402
+from timer_engine import TimerEngine, VirtualClock  # noqa: E402
+
+START = datetime(2026, 1, 5, 9, tzinfo=timezone(timedelta(hours=9)))
+
+
+def simulate(days, step=0, working_min=90, rest_min=10):
+    clock = VirtualClock(START)
+    sessions = []
+    engine = TimerEngine(
+        working_min,
+        rest_min,
+        clock=clock.monotonic,
+        now=clock.now,
+        on_work_end=lambda: sessions.append(engine.take_session()),
+    )
+    costs = []
+    engine.start()
+    until = days * 86400
+    while clock.elapsed < until:
+        start = time.perf_counter()
+        delay = engine.tick()
+        costs.append(time.perf_counter() - start)
+        clock.advance(max(delay / 1000, step))
+    return sessions, costs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--step", type=float, default=0)
+    parser.add_argument("--working", type=int, default=90)
+    parser.add_argument("--rest", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sessions, costs = simulate(args.days, args.step, args.working, args.rest)
+    elapsed = time.perf_counter() - start
+
+    # 記録した作業時間は、時間が飛んでも作業時間の設定どおりになる
+    wrong = [s for _, s, _ in sessions if s != args.working * 60]
+    if wrong:
+        raise AssertionError(f"{len(wrong)} sessions with wrong duration: {wrong[:5]}")
+    costs.sort()
+    print(
+        f"{args.days:g} days: {len(sessions)} sessions, {len(costs)} ticks "
+        f"in {elapsed * 1000:.0f} ms"
+    )
+    print(
+        "tick: "
+        + ", ".join(
+            f"p{p} {percentile(costs, p) * 1e6:.1f} us" for p in (50, 90, 99)
+        )
+        + f", max {costs[-1] * 1e6:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# セッションログの読み込み速度を比較するベンチマーク
+#   python bench/bench_loader.py [行数]
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from rollup_cache import SessionRollup  # noqa: E402
+from session_table import (  # noqa: E402
+    iter_sessions,
+    load_recent_sessions,
+    load_sessions,
+)
+
+
+def write_log(path, rows):
+    day = date(2000, 1, 1)
+    rng = random.Random(0)
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        for _ in range(rows):
+            day += timedelta(days=rng.random() < 0.3)
+            duration = timedelta(seconds=rng.randrange(5400))
+            writer.writerow([day.isoformat(), str(duration)])
+
+
+def legacy(path):
+    # 変更前の calculate_monthly_stats + calculate_daily_stats と同じ処理
+    import pandas as pd
+
+    monthly_stats = defaultdict(timedelta)
+    with open(path, "r") as file:
+        for row in csv.reader(file):
+            day = datetime.strptime(row[0], "%Y-%m-%d")
+            duration = datetime.strptime(row[1], "%H:%M:%S")
+            monthly_stats[(day.year, day.month)] += timedelta(
+                hours=duration.hour, minutes=duration.minute, seconds=duration.second
+            )
+    df = pd.read_csv(path, names=["date", "duration"])
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["duration"] = pd.to_timedelta(df["duration"])
+    last = df["date"].max()
+    df = df[df["date"] > last - timedelta(days=30)]
+    return monthly_stats, df.groupby("date")["duration"].sum().to_dict()
+
+
+def single_pass(path):
+    table, _ = load_sessions(path)
+    last = int(table.days.max())
+    return table.monthly_totals(), table.window_totals(last - 29, 30)
+
+
+def streaming(path):
+    # 一定量ずつ読み、日別・月別の合計だけを残す
+    stats = SessionRollup()
+    for table, _ in iter_sessions(path):
+        stats.add_table(table)
+    return stats
+
+
+def recent(path, first_day):
+    # 末尾から first_day まで遡って読む
+    return load_recent_sessions(path, first_day)
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func, path, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pomodoro_sessions.csv")
+        write_log(path, rows)
+
+        monthly, daily = legacy(path)
+        (months, totals), window = single_pass(path)
+        assert sum(v.total_seconds() for v in monthly.values()) == totals.sum()
+        assert sum(v.total_seconds() for v in daily.values()) == window.sum()
+
+        stats = streaming(path)
+        assert sum(stats.monthly.values()) == totals.sum()
+        first_day = date.fromisoformat(max(stats.daily)) - timedelta(days=29)
+        assert recent(path, first_day).seconds.sum() == window.sum()
+
+        old = measure(legacy, path)
+        new = measure(single_pass, path)
+        stream = measure(streaming, path)
+        tail = measure(lambda p: recent(p, first_day), path)
+        print(f"rows:        {rows}")
+        print(f"legacy:      {old:.3f}s (csv+strptime, pandas)")
+        print(f"single pass: {new:.3f}s (load_sessions)")
+        print(f"speedup:     {old / new:.1f}x")
+        print(f"streaming:   {stream:.3f}s (iter_sessions)")
+        print(f"recent:      {tail:.3f}s (load_recent_sessions, 30 days)")
+        mb = 1024 * 1024
+        print(f"peak memory: single pass {peak_memory(single_pass, path) / mb:.1f}MB, "
+              f"streaming {peak_memory(streaming, path) / mb:.1f}MB, "
+              f"recent {peak_memory(recent, path, first_day) / mb:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# 2台のPCのセッションログを合わせて月別に集計する時間とメモリを比べる
+#   python bench/bench_merge.py [--rows 500000] [--shared 0.2]
+# before: 2つのログを pd.read_csv で読んで連結する (同期された重複も数える)
+# after:  session_merge.py で日付順にマージし、重複を除きながら集計する
+# incremental: マージしたログに、それぞれ数行追記された分だけをマージする
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from generate_log import generate_log  # noqa: E402
+from session_merge import merged_rollup, update_merged  # noqa: E402
+
+APPENDED_ROWS = 10
+
+
+def split_log(path, desktop, laptop, shared):
+    # 行をどちらかのPCに振り分け、shared の割合の行は両方のログに入れる
+    rng = random.Random(0)
+    with open(path, "rb") as source, open(desktop, "wb") as a, open(laptop, "wb") as b:
+        for line in source:
+            r = rng.random()
+            if r < shared:
+                a.write(line)
+                b.write(line)
+            elif r < (1 + shared) / 2:
+                a.write(line)
+            else:
+                b.write(line)
+
+
+def concat_read(paths):
+    import pandas as pd
+
+    frames = [
+        pd.read_csv(path, header=None, usecols=[0, 1], names=["date", "duration"])
+        for path in paths
+    ]
+    df = pd.concat(frames)
+    df["duration"] = pd.to_timedelta(df["duration"])
+    months = pd.to_datetime(df["date"]).dt.to_period("M")
+    return df.groupby(months)["duration"].sum()
+
+
+def measure(function, *args):
+    # tracemalloc は割り当てごとに遅くなるので、時間とメモリは別々に測る
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--shared", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "all.csv")
+        generate_log(source, args.rows)
+        paths = [os.path.join(tmp, "desktop.csv"), os.path.join(tmp, "laptop.csv")]
+        split_log(source, *paths, args.shared)
+        expected = sum(1 for _ in open(source, "rb"))
+
+        before, before_s, before_peak = measure(concat_read, paths)
+        after, after_s, after_peak = measure(merged_rollup, paths)
+        before_total = before.sum().total_seconds()
+        after_total = sum(after.monthly.values())
+        print(
+            f"before: {before_s:6.2f} s, peak {before_peak / 1e6:7.1f} MB, "
+            f"{before_total / after_total - 1:+.1%} total time (duplicates)"
+        )
+        print(f"after:  {after_s:6.2f} s, peak {after_peak / 1e6:7.1f} MB")
+
+        output = os.path.join(tmp, "merged.csv")
+        update_merged(paths, output)
+        rows = sum(1 for _ in open(output, "rb"))
+        if rows != expected:
+            raise AssertionError(f"merged {rows} rows, expected {expected}")
+        last = open(source, "rb").readlines()[-1]
+        for path in paths:
+            with open(path, "ab") as file:
+                file.write(last * APPENDED_ROWS)
+        start = time.perf_counter()
+        update_merged(paths, output)
+        appended_s = time.perf_counter() - start
+        print(
+            f"incremental: {appended_s * 1000:6.1f} ms "
+            f"({APPENDED_ROWS} rows appended to each log)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# 月別のセッション一覧で、1ページを表示するまでの時間を比べる
+#   python bench/bench_pages.py [--rows 1000000] [--pages 200]
+# before: ログ全体を読み込んでその月の行を取り出す
+# after:  月の索引 (<csv>.months.json) からその月のブロックだけを読む
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from generate_log import generate_log  # noqa: E402
+from session_list import PAGE_ROWS  # noqa: E402
+from session_pages import CsvSessionPages, table_rows  # noqa: E402
+from session_table import load_sessions  # noqa: E402
+
+
+def full_scan(path, key, first):
+    table, _ = load_sessions(path)
+    months = table.days.astype("datetime64[D]").astype("datetime64[M]")
+    month = np.datetime64(f"{key[0]:04d}-{key[1]:02d}", "M")
+    rows = table.take(months == month)
+    return table_rows(rows.take(slice(first, first + PAGE_ROWS)))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pomodoro_sessions.csv")
+        generate_log(path, args.rows)
+        pages = CsvSessionPages(path)
+        _, cold = timed(pages.refresh)
+        _, warm = timed(pages.refresh)
+        print(f"index: build {cold:.1f} ms, reload {warm:.1f} ms")
+
+        rng = random.Random(0)
+        months = [key for key in _months(pages) if pages.count(key)]
+        requests = []
+        for _ in range(args.pages):
+            key = rng.choice(months)
+            requests.append((key, rng.randrange(pages.count(key))))
+
+        key, first = requests[0]
+        expected, before = timed(full_scan, path, key, first)
+        if pages.page(key, first, PAGE_ROWS) != expected:
+            raise AssertionError("page differs from a full scan")
+        print(f"before: {before:8.2f} ms/page (full scan)")
+        for order in ("time", "duration"):
+            times = [
+                timed(pages.page, key, first, PAGE_ROWS, order)[1]
+                for key, first in requests
+            ]
+            print(
+                f"after:  {np.median(times):8.2f} ms/page median, "
+                f"{max(times):.2f} ms max (order={order})"
+            )
+
+
+def _months(pages):
+    # 索引に含まれる (年, 月)
+    return [(1970 + month // 12, month % 12 + 1) for month in pages.months]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# 起動時間のベンチマーク
+#   python bench/bench_startup.py [--budget-ms 200] [--top 10]
+# -X importtime の内訳と、最初のフレームを描画するまでの時間を表示する
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+SCRIPTS = ("timer.py", "timer6.py", "260130_timer.py")
+# 起動時に読み込まれてはいけないモジュール
+HEAVY_MODULES = ("pandas", "matplotlib", "numpy")
+
+PROBE = """
+import os, runpy, sys, time
+start = time.perf_counter()
+sys.path.insert(0, os.path.dirname(sys.argv[1]))
+namespace = runpy.run_path(sys.argv[1], run_name="startup_bench")
+result = {"import_ms": (time.perf_counter() - start) * 1000}
+try:
+    root = namespace["ctk"].CTk() if "ctk" in namespace else namespace["tk"].Tk()
+except Exception as e:
+    result["first_frame_ms"] = None
+    result["error"] = str(e)
+else:
+    namespace["PomodroTimer"](root)
+    root.update()
+    result["first_frame_ms"] = (time.perf_counter() - start) * 1000
+    root.destroy()
+result["heavy_modules"] = [m for m in %r if m in sys.modules]
+import json
+print(json.dumps(result))
+""" % (HEAVY_MODULES,)
+
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package" の行から
+    # 直接 import されたモジュール (インデントなし) だけを取り出す
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if name.startswith("  "):
+            continue
+        entries.append((int(cumulative_us), int(self_us), name.strip()))
+    return entries
+
+
+def run(script):
+    path = os.path.abspath(os.path.join(SRC, script))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, path],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=200.0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", help="結果を書き出すファイル")
+    args = parser.parse_args()
+
+    failed = False
+    results = {}
+    for script in SCRIPTS:
+        try:
+            result = run(script)
+        except RuntimeError as e:
+            print(f"{script}: skipped ({e})")
+            continue
+        results[script] = result
+
+        print(f"== {script}")
+        print(f"  import:      {result['import_ms']:8.1f} ms")
+        if result["first_frame_ms"] is None:
+            print(f"  first frame: n/a ({result['error']})")
+            elapsed = result["import_ms"]
+        else:
+            print(f"  first frame: {result['first_frame_ms']:8.1f} ms")
+            elapsed = result["first_frame_ms"]
+        top = sorted(result["imports"], reverse=True)[: args.top]
+        for cumulative_us, self_us, name in top:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+        if result["heavy_modules"]:
+            print(f"  NG: loaded at startup: {', '.join(result['heavy_modules'])}")
+            failed = True
+        if elapsed > args.budget_ms:
+            print(f"  NG: over budget ({args.budget_ms:.0f} ms)")
+            failed = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
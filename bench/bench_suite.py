@@ -0,0 +1,166 @@
+# 各処理の時間を計測し、コミット間で比較できるように JSON で書き出す
+#   python bench/bench_suite.py [--rows 10000 1000000 10000000] [--output FILE]
+# ディスプレイがない環境では show_stats の計測を省略する (xvfb-run で実行すれば計測できる)
+import argparse
+import json
+import os
+import platform
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCH, "..", "src")
+sys.path.insert(0, SRC)
+
+from bench_startup import SCRIPTS, run as run_startup  # noqa: E402
+from generate_log import generate_log  # noqa: E402
+from lifecycle import ChildWindow  # noqa: E402
+from stats_worker import StatsJob  # noqa: E402
+
+RECORD_COUNT = 200  # record_session を呼ぶ回数
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def load_script(script):
+    return runpy.run_path(os.path.join(SRC, script), run_name="bench")
+
+
+class Untagged:
+    # タグの入力欄の代わり (タグを付けずに記録する)
+    def get(self):
+        return ""
+
+
+def headless_app(namespace):
+    # ウィジェットを作らずに集計・記録の処理だけを呼べるようにする
+    app = object.__new__(namespace["PomodroTimer"])
+    app.storage = namespace["open_storage"](namespace["SESSION_BACKEND"])
+    app.engine = namespace["TimerEngine"]()
+    app.engine.duration_time = 90 * 60
+    app.stats_window = ChildWindow(None, None)  # 作らないので常に隠れている
+    app.day_index = None
+    app.index_job = StatsJob(None, None)  # 累積和は作らない
+    app.tag_choice = Untagged()
+    app.checkpoint = namespace["Checkpoint"]()
+    return app
+
+
+def make_root(namespace):
+    try:
+        return namespace["ctk"].CTk() if "ctk" in namespace else namespace["tk"].Tk()
+    except Exception:
+        return None
+
+
+def show_stats_and_wait(app, root):
+    # 集計は別スレッドで行われるので、グラフが表示されるまで待つ
+    app.show_stats()
+    while app.stats_job.running():
+        root.update()
+        time.sleep(0.005)
+    root.update()
+
+
+def bench_script(script):
+    namespace = load_script(script)
+    cls = namespace["PomodroTimer"]
+    results = {}
+    app = headless_app(namespace)
+    try:
+        if hasattr(cls, "compute_stats"):
+            # Analysis の集計 (別スレッドで行う分)。1回目はキャッシュの作成を含む
+            results["compute_stats_cold"], _ = timed(app.compute_stats)
+            results["compute_stats_warm"], _ = timed(app.compute_stats)
+
+        latencies = []
+        for _ in range(RECORD_COUNT):
+            elapsed, _ = timed(app.record_session)
+            latencies.append(elapsed)
+        latencies.sort()
+        results["record_session_p50"] = latencies[len(latencies) // 2]
+        results["record_session_max"] = latencies[-1]
+        results["record_session_flush"], _ = timed(app.storage.flush)
+    finally:
+        app.storage.close()
+
+    if hasattr(cls, "show_stats"):
+        root = make_root(namespace)
+        if root is None:
+            results["show_stats"] = None
+        else:
+            app = cls(root)
+            results["show_stats"], _ = timed(show_stats_and_wait, app, root)
+            app.storage.close()
+            root.destroy()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "date": date.today().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "startup": {},
+        "runs": {},
+    }
+    for script in SCRIPTS:
+        result = run_startup(script)
+        report["startup"][script] = {
+            "import_ms": result["import_ms"],
+            "first_frame_ms": result["first_frame_ms"],
+        }
+
+    cwd = os.getcwd()
+    for rows in args.rows:
+        report["runs"][rows] = {}
+        for script in SCRIPTS:
+            # スクリプトはカレントディレクトリのCSVを使うので、毎回作り直す
+            with tempfile.TemporaryDirectory() as tmp:
+                csv_path = os.path.join(tmp, "pomodoro_sessions.csv")
+                generate_log(csv_path, rows, years=args.years)
+                os.chdir(tmp)
+                try:
+                    results = bench_script(script)
+                finally:
+                    os.chdir(cwd)
+            report["runs"][rows][script] = results
+            for stage, seconds in results.items():
+                value = "n/a" if seconds is None else f"{seconds * 1000:10.2f} ms"
+                print(f"{rows:>9} {script:<16} {stage:<22} {value}")
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
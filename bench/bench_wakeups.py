@@ -0,0 +1,78 @@
+# 1時間あたりにタイマーが起きる回数と、残り時間の表示を描き直す回数を比べる
+#   python bench/bench_wakeups.py [--hours 8]
+# before: 表示状態にかかわらず毎秒起きて描き直す (以前の update_timer)
+# after:  最小化中はチェックポイントを保存する間隔 (または作業・休憩の終わり) まで
+#         起きず、文字が変わったときだけ描き直す。再表示 (Map) の時点で一度起きて表示を合わせる
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from checkpoint import CHECKPOINT_INTERVAL_SEC  # noqa: E402
+from timer_engine import TimerEngine, VirtualClock  # noqa: E402
+
+# 各時間のうち、最後の何割を最小化しているか
+SCENARIOS = {"visible": 0.0, "half minimized": 0.5, "minimized": 1.0}
+
+
+def simulate(hours, hidden_fraction, adaptive):
+    clock = VirtualClock()
+    counts = {"wakeups": 0, "redraws": 0}
+    shown = [None]
+
+    def on_tick(time_left):
+        text = divmod(time_left, 60)
+        if not adaptive or text != shown[0]:
+            shown[0] = text
+            counts["redraws"] += 1
+
+    def is_hidden(t):
+        return hidden_fraction > 0 and t % 3600 >= 3600 * (1 - hidden_fraction)
+
+    def next_change(t):
+        # t より後で、表示・非表示が次に切り替わる時刻
+        if hidden_fraction in (0, 1):
+            return float("inf")
+        hour = t - t % 3600
+        for edge in (hour + 3600 * (1 - hidden_fraction), hour + 3600):
+            if edge > t:
+                return edge
+        return hour + 3600
+
+    engine = TimerEngine(
+        clock=clock.monotonic,
+        now=clock.now,
+        on_tick=on_tick,
+        idle_wake_sec=CHECKPOINT_INTERVAL_SEC,
+    )
+    engine.start()
+    until = hours * 3600
+    wake = 0.0
+    while clock.elapsed < until:
+        if adaptive:
+            wake = min(wake, next_change(clock.elapsed))
+        clock.advance(wake - clock.elapsed)
+        delay = engine.tick(idle=adaptive and is_hidden(clock.elapsed))
+        counts["wakeups"] += 1
+        wake = clock.elapsed + delay / 1000
+    return {name: count / hours for name, count in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=8)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<16} {'':>7} {'wakeups/h':>10} {'redraws/h':>10}")
+    for name, fraction in SCENARIOS.items():
+        for label, adaptive in (("before", False), ("after", True)):
+            result = simulate(args.hours, fraction, adaptive)
+            print(
+                f"{name:<16} {label:>7} {result['wakeups']:>10.1f} "
+                f"{result['redraws']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# ベンチマーク用の pomodoro_sessions.csv を生成する
+#   python bench/generate_log.py 1000000 pomodoro_sessions.csv [--years 10] [--legacy]
+#                                [--tags 5]
+# 休暇による空白期間、週末の少なさ、24時間を超える記録 ("1 day, ...") を含む
+# --legacy を付けると開始・終了時刻のない以前の形式 (2列) で書き出す
+# --tags を付けると、3割程度を除いた行にその数のプロジェクトのタグを付ける
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+CHUNK_ROWS = 100_000
+TZ_OFFSET = 9 * 3600  # 生成する時刻の時差 (+0900)
+
+
+def _active_days(rng, n_days, years, start):
+    active = np.ones(n_days, dtype=bool)
+    # 年に2回程度、1〜3週間の空白期間を作る
+    for gap in rng.integers(0, n_days, size=years * 2):
+        active[gap : gap + rng.integers(7, 22)] = False
+    # 週末は半分程度しか作業しない
+    weekend = (np.arange(n_days) + start.weekday()) % 7 >= 5
+    active &= ~weekend | (rng.random(n_days) < 0.5)
+    return np.flatnonzero(active)
+
+
+def _durations(rng, rows):
+    seconds = rng.normal(5400, 1500, size=rows).clip(60, 8100).astype(np.int64)
+    # 止め忘れによる24時間超の記録をまれに混ぜる
+    forgotten = rng.random(rows) < 0.001
+    seconds[forgotten] = rng.integers(86400, 3 * 86400, size=forgotten.sum())
+    return seconds
+
+
+def _format_duration(seconds):
+    text = str(timedelta(seconds=seconds))
+    return f'"{text}"' if "," in text else text
+
+
+def _tags(rng, rows, n_tags):
+    # 行ごとのタグの列 ("" はタグなし)
+    names = np.array([""] + [f"project-{i:02d}" for i in range(n_tags)])
+    codes = rng.integers(1, n_tags + 1, size=rows)
+    codes[rng.random(rows) < 0.3] = 0
+    return names[codes]
+
+
+def generate_log(
+    path, rows, years=10, start=date(2000, 1, 1), seed=0, legacy=False, tags=0
+):
+    rng = np.random.default_rng(seed)
+    n_days = years * 365
+    days = np.sort(rng.choice(_active_days(rng, n_days, years, start), size=rows))
+    seconds = _durations(rng, rows)
+    first = np.datetime64(start, "D")
+    # 終了時刻は 8時〜24時 (同じ日の中では時刻順)
+    day_epochs = (first + days).astype(np.int64) * 86400 - TZ_OFFSET
+    time_of_day = rng.integers(8 * 3600, 24 * 3600, size=rows)
+    ends = day_epochs + time_of_day[np.lexsort((time_of_day, days))]
+    starts = ends - seconds
+    tag_column = _tags(rng, rows, tags) if tags else np.full(rows, "")
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        for begin in range(0, rows, CHUNK_ROWS):
+            end = begin + CHUNK_ROWS
+            dates = np.datetime_as_string(first + days[begin:end]).tolist()
+            durations = [_format_duration(s) for s in seconds[begin:end].tolist()]
+            if legacy:
+                lines = (f"{d},{t}\r\n" for d, t in zip(dates, durations))
+            else:
+                lines = (
+                    f"{d},{t},{s},{e},+0900{',' + g if g else ''}\r\n"
+                    for d, t, s, e, g in zip(
+                        dates,
+                        durations,
+                        starts[begin:end].tolist(),
+                        ends[begin:end].tolist(),
+                        tag_column[begin:end].tolist(),
+                    )
+                )
+            file.writelines(lines)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", type=int)
+    parser.add_argument("path", nargs="?", default="pomodoro_sessions.csv")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--legacy", action="store_true")
+    parser.add_argument("--tags", type=int, default=0, help="プロジェクトの数")
+    args = parser.parse_args()
+    generate_log(
+        args.path,
+        args.rows,
+        years=args.years,
+        seed=args.seed,
+        legacy=args.legacy,
+        tags=args.tags,
+    )
+
+
+if __name__ == "__main__":
+    main()
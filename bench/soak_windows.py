@@ -0,0 +1,121 @@
+# 設定・分析・Perf ウィンドウを何千回も開閉し、メモリとウィジェット・after の数が
+# 増え続けないことを確かめる (tracemalloc で Python のメモリを比べる)
+#   python bench/soak_windows.py [--script timer6.py] [--cycles 2000] [--rows 10000]
+# ディスプレイが必要 (ない環境では xvfb-run で実行する)
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import load_script, make_root  # noqa: E402
+from generate_log import generate_log  # noqa: E402
+
+WARMUP_CYCLES = 20  # 初回の作成やキャッシュを計測から除く
+MAX_GROWTH_BYTES = 256 * 1024
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def pending_afters(root):
+    return len(root.tk.splitlist(root.tk.call("after", "info")))
+
+
+def cycle(app, root):
+    app.set_config()
+    root.update()
+    app.config_window.hide()
+    app.show_stats()
+    while app.stats_job.running():
+        root.update()
+        time.sleep(0.001)
+    root.update()
+    app.stats_window.hide()
+    root.update()
+    app.show_perf()
+    root.update()
+    app.perf_window.hide()
+    root.update()
+
+
+def snapshot(root):
+    gc.collect()
+    return (
+        tracemalloc.get_traced_memory()[0],
+        count_widgets(root),
+        pending_afters(root),
+    )
+
+
+def soak(script, cycles):
+    namespace = load_script(script)
+    root = make_root(namespace)
+    if root is None:
+        raise SystemExit("no display (run with xvfb-run)")
+    app = namespace["PomodroTimer"](root)
+    root.update()
+    try:
+        for _ in range(WARMUP_CYCLES):
+            cycle(app, root)
+        tracemalloc.start()
+        before = snapshot(root)
+        start = time.perf_counter()
+        for _ in range(cycles):
+            cycle(app, root)
+        elapsed = time.perf_counter() - start
+        after = snapshot(root)
+        tracemalloc.stop()
+    finally:
+        app.stats_job.cancel()
+        app.index_job.cancel()
+        app.flush_job.cancel()
+        app.afters.cancel_all()
+        app.storage.close()
+        root.destroy()
+    return before, after, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--script", default="timer6.py")
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # スクリプトはカレントディレクトリのCSVを使う
+        generate_log(os.path.join(tmp, "pomodoro_sessions.csv"), args.rows)
+        os.chdir(tmp)
+        try:
+            before, after, elapsed = soak(args.script, args.cycles)
+        finally:
+            os.chdir(cwd)
+
+    (memory_before, widgets_before, afters_before) = before
+    (memory_after, widgets_after, afters_after) = after
+    growth = memory_after - memory_before
+    print(f"{args.script}: {args.cycles} open/close cycles in {elapsed:.1f} s")
+    print(
+        f"python memory: {memory_before / 1024:.0f} KiB -> "
+        f"{memory_after / 1024:.0f} KiB ({growth / args.cycles:+.1f} B/cycle)"
+    )
+    print(f"widgets: {widgets_before} -> {widgets_after}")
+    print(f"pending afters: {afters_before} -> {afters_after}")
+    if widgets_after != widgets_before:
+        raise AssertionError("widgets are not released")
+    if afters_after > afters_before:
+        raise AssertionError("after() callbacks keep accumulating")
+    if growth > MAX_GROWTH_BYTES:
+        raise AssertionError(f"memory grew by {growth / 1024:.0f} KiB")
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
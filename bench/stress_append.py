@@ -0,0 +1,136 @@
+# 複数のプロセスから同じCSVへ同時に追記し、行が混ざったり欠けたりしないか確かめる
+#   python bench/stress_append.py [--writers 8] [--rows 500] [--binary] [--importer]
+# --binary: バイナリ形式の複製も同時に更新する
+# --importer: 書き込み中に SQLite への取り込み (import-csv) を繰り返す
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from binary_store import BinaryStore  # noqa: E402
+from session_storage import SqliteStorage  # noqa: E402
+from session_writer import FSYNC_NEVER, SessionWriter, journal_paths  # noqa: E402
+
+ROW = re.compile(r"\d{4}-\d{2}-\d{2},\d+:\d{2}:\d{2},(\d+),\d+,\+0900\r?\n")
+KEY_BASE = 10**6  # 行の開始時刻 = 書き込み側の番号 * KEY_BASE + 行番号
+FLUSH_TIMEOUT_SEC = 60.0
+
+
+def write_rows(csv_path, binary_path, writer_id, rows):
+    writer = SessionWriter(csv_path, fsync=FSYNC_NEVER, binary_path=binary_path)
+    rng = random.Random(writer_id)
+    for i in range(rows):
+        start = writer_id * KEY_BASE + i
+        writer.append(["2026-01-01", "0:01:00", start, start + 60, "+0900"])
+        # 書き込みのまとまりが他のプロセスと重なるように、少しずつ間を空ける
+        if rng.random() < 0.05:
+            time.sleep(rng.random() * 0.01)
+    if not writer.flush(FLUSH_TIMEOUT_SEC):
+        raise RuntimeError(f"writer {writer_id} did not finish")
+    writer.close()
+
+
+def import_until(csv_path, db_path, stop):
+    storage = SqliteStorage(db_path)
+    while not stop.is_set():
+        storage.import_csv(csv_path)
+    storage.import_csv(csv_path)
+    storage.close()
+
+
+def check(csv_path, expected):
+    keys = []
+    with open(csv_path, encoding="utf-8", newline="") as file:
+        for number, line in enumerate(file, 1):
+            match = ROW.fullmatch(line)
+            if match is None:
+                raise AssertionError(f"torn or interleaved row {number}: {line!r}")
+            keys.append(int(match.group(1)))
+    if sorted(keys) != sorted(expected):
+        missing = len(set(expected) - set(keys))
+        raise AssertionError(
+            f"{len(keys)} rows, {missing} missing, "
+            f"{len(keys) - len(set(keys))} duplicated"
+        )
+    return len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--binary", action="store_true")
+    parser.add_argument("--importer", action="store_true")
+    args = parser.parse_args()
+
+    expected = [
+        writer * KEY_BASE + i
+        for writer in range(args.writers)
+        for i in range(args.rows)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "pomodoro_sessions.csv")
+        db_path = os.path.join(tmp, "pomodoro_sessions.db")
+        open(csv_path, "w").close()
+        binary_path = None
+        if args.binary:
+            binary_path = os.path.join(tmp, "pomodoro_sessions.bin")
+            BinaryStore(binary_path).create()
+
+        stop = multiprocessing.Event()
+        importer = None
+        if args.importer:
+            importer = multiprocessing.Process(
+                target=import_until, args=(csv_path, db_path, stop)
+            )
+            importer.start()
+        start = time.perf_counter()
+        writers = [
+            multiprocessing.Process(
+                target=write_rows, args=(csv_path, binary_path, i, args.rows)
+            )
+            for i in range(args.writers)
+        ]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        if importer is not None:
+            importer.join()
+
+        failed = [writer.exitcode for writer in writers if writer.exitcode]
+        if failed:
+            raise SystemExit(f"{len(failed)} writers failed")
+        count = check(csv_path, expected)
+        if journal_paths(csv_path):
+            raise AssertionError(f"journals left behind: {journal_paths(csv_path)}")
+        print(
+            f"{args.writers} writers x {args.rows} rows: {count} rows ok, "
+            f"{elapsed:.2f} s ({count / elapsed:.0f} rows/s)"
+        )
+        if binary_path is not None:
+            starts = BinaryStore(binary_path).load_table().start.tolist()
+            if sorted(starts) != sorted(expected):
+                raise AssertionError(f"binary store has {len(starts)} rows")
+            print("binary store ok")
+        if importer is not None:
+            with sqlite3.connect(db_path) as connection:
+                (imported,) = connection.execute(
+                    "SELECT COUNT(*) FROM sessions"
+                ).fetchone()
+            if imported != count:
+                raise AssertionError(f"importer saw {imported} of {count} rows")
+            print("importer ok")
+
+
+if __name__ == "__main__":
+    main()
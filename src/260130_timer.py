@@ -1,12 +1,24 @@
 import customtkinter as ctk
 from tkinter import messagebox, ttk
-import csv
-from datetime import datetime, timedelta
-import calendar
-from collections import defaultdict
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
+from datetime import date, datetime, timedelta
+from timer_engine import TimerEngine
+from checkpoint import CHECKPOINT_INTERVAL_SEC, Checkpoint
+from perf import timed
+from timer_checkpoint import recover_session, resync, save_if_due
+from session_storage import open_storage
+from instance import SingleInstance
+from lifecycle import AfterRegistry, ChildWindow
+from prewarm import prewarm_analysis
+from session_log import clean_tag
+from stats_worker import StatsJob
+
+PREWARM_DELAY_MS = 1000  # 起動後、分析用ライブラリを先読みするまでの時間
+SESSION_BACKEND = "csv"  # セッションの保存先 ("csv", "sqlite" または "merge")
+# "merge" のとき、自分のログと合わせて Analysis で集計する他のPCのセッションログ
+MERGE_LOGS = []
+# Analysis の日別グラフで選べる期間 (直近の日数)
+STATS_RANGES = {"7 days": 7, "30 days": 30, "90 days": 90, "1 year": 365}
+DEFAULT_RANGE = "30 days"
 
 ctk.set_appearance_mode("System")  # モードをシステム設定に合わせる
 ctk.set_default_color_theme("blue")  # テーマカラーを設定
@@ -16,19 +28,29 @@ class PomodroTimer:
     def __init__(self, master):
         self.master = master
         self.master.title("KeepTimer")
-        self.master.geometry("280x210")
+        self.master.geometry("280x250")
         self.master.attributes("-topmost", True)
 
-        self.working_min = 90
-        self.rest_min = 10
-
-        self.time_left = self.working_min * 60
-        self.is_break = False
-        self.is_running = False
-        self.duration_time = 0
+        self.engine = TimerEngine(
+            on_tick=self.show_time,
+            on_work_end=self.end_work,
+            on_break_end=self.end_break,
+            # 最小化中も、チェックポイントの間隔では起きて保存する
+            idle_wake_sec=CHECKPOINT_INTERVAL_SEC,
+        )
+        # after() の予約 (終了時にまとめて取り消す)
+        self.afters = AfterRegistry(self.master)
+        self.storage = open_storage(SESSION_BACKEND, MERGE_LOGS)
+        # 強制終了に備えて、実行中の状態を数秒ごとに保存する
+        self.checkpoint = Checkpoint()
 
         self.label = ctk.CTkLabel(master, text="90:00", font=("Arial", 48))
-        self.label.pack(pady=20)
+        self.label.pack(pady=(20, 5))
+
+        # 記録するセッションのプロジェクト (入力するか、使ったことのあるものから選ぶ)
+        self.tag_choice = ctk.CTkComboBox(master, values=[], width=200)
+        self.tag_choice.set("")
+        self.tag_choice.pack(pady=(0, 10))
 
         self.button = ctk.CTkButton(master, text="Start", command=self.start_timer)
         self.button.pack(pady=0)
@@ -44,41 +66,89 @@ class PomodroTimer:
         self.config_button.pack(pady=0)
 
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.child_windows = []
+        # 最小化されている間は秒ごとに起こさず、再表示されたらすぐに表示を合わせる
+        self.time_text = None  # 表示中の残り時間
+        for sequence in ("<Map>", "<Unmap>", "<FocusIn>"):
+            self.master.bind(sequence, lambda event: resync(self, event), add="+")
+        # F12 で計測結果の Perf ウィンドウを開く
+        self.master.bind("<F12>", lambda event: self.show_perf())
+        self.perf_window = None
+        # 設定・分析ウィンドウは一度だけ作り、閉じても隠すだけにする
+        self.config_window = ChildWindow(
+            self.master,
+            self.build_config,
+            on_show=self.fill_config,
+            factory=ctk.CTkToplevel,
+        )
+        self.stats_window = ChildWindow(
+            self.master,
+            self.build_stats,
+            on_hide=self.hide_stats,
+            factory=ctk.CTkToplevel,
+        )
+        # 月の行をダブルクリックすると開く、その月のセッションの一覧
+        self.sessions_window = ChildWindow(
+            self.master, self.build_sessions, factory=ctk.CTkToplevel
+        )
+        self.session_list = None
+        self.monthly_table = None
+        self.day_index = None
+        self.tag_index = None
+        self.daily_chart = None
+        self.tag_chart = None
+        self.hour_chart = None
+        self.stats_job = StatsJob(self.master, self.compute_stats)
+        # タグの候補と日別の累積和は、起動時に保存済みの集計 (.rollup.json) から作る
+        self.index_job = StatsJob(self.master, self.load_indexes)
+        # 一覧を開く前の書き出し (保存先が "merge" ならログのマージも行う)
+        self.flush_job = StatsJob(self.master, self.storage.flush)
+        self.sessions_key = None
+        self.afters.schedule("prewarm", PREWARM_DELAY_MS, prewarm_analysis)
+        self.afters.schedule(
+            "indexes", PREWARM_DELAY_MS, self.index_job.request, self.on_indexes_loaded
+        )
+        self.master.after_idle(lambda: recover_session(self))
 
     def start_timer(self):
-        if not self.is_running:
-            self.is_running = True
+        if not self.engine.is_running:
+            self.engine.start()
             self.button.configure(text="Stop")
             self.update_timer()
         else:
-            self.is_running = False
-            self.button.configure(text="Start")
+            self.stop_timer()
 
+    def stop_timer(self):
+        self.engine.stop()
+        self.button.configure(text="Start")
+        self.afters.cancel("tick")
+        self.checkpoint.save_engine(self.engine)
+
+    @timed("update_timer")
     def update_timer(self):
-        if self.is_running:
-            self.time_left -= 1
-            if not self.is_break:
-                self.duration_time += 1
-            minutes, seconds = divmod(self.time_left, 60)
-            time_string = f"{minutes:02d}:{seconds:02d}"
-            self.label.configure(text=time_string)
-
-            if self.time_left <= 0:
-                if not self.is_break:
-                    self.record_session()
-                    messagebox.showinfo(
-                        "Pomodoro", "作業セッション終了！休憩を取りましょう。"
-                    )
-                    self.time_left = self.rest_min * 60
-                    self.is_break = True
-                    self.duration_time = 0
-                else:
-                    messagebox.showinfo("Pomodoro", "休憩終了！作業を再開しましょう。")
-                    self.time_left = self.working_min * 60
-                    self.is_break = False
-
-            self.master.after(1000, self.update_timer)
+        hidden = self.is_hidden()
+        delay = self.engine.tick(idle=hidden)
+        if delay is None:
+            return
+        save_if_due(self, hidden)
+        self.afters.schedule("tick", delay, self.update_timer)
+
+    def show_time(self, time_left):
+        # 文字が変わったときだけ描き直す
+        minutes, seconds = divmod(time_left, 60)
+        text = f"{minutes:02d}:{seconds:02d}"
+        if text != self.time_text:
+            self.time_text = text
+            self.label.configure(text=text)
+
+    def is_hidden(self):
+        return self.master.state() in ("iconic", "withdrawn")
+
+    def end_work(self):
+        self.record_session()
+        messagebox.showinfo("Pomodoro", "作業セッション終了！休憩を取りましょう。")
+
+    def end_break(self):
+        messagebox.showinfo("Pomodoro", "休憩終了！作業を再開しましょう。")
 
     def set_new_timer(self, working_min, rest_min):
         try:
@@ -92,85 +162,143 @@ class PomodroTimer:
             messagebox.showerror("エラー", "正の整数を入力してください")
             return
 
-        if self.is_running:
-            self.is_running = False
-            self.button.configure(text="Start")
+        if self.engine.is_running:
+            self.stop_timer()
 
-        if self.duration_time != 0:
+        if self.engine.duration_time != 0:
             if messagebox.askyesno("保存", "現在の作業時間を保存しますか？"):
                 self.record_session()
 
-        self.working_min = working_min
-        self.rest_min = rest_min
-        self.time_left = self.working_min * 60
-        self.is_break = False
-        self.duration_time = 0
-
-        minutes, seconds = divmod(self.time_left, 60)
-        time_string = f"{minutes:02d}:{seconds:02d}"
-        self.label.configure(text=time_string)
+        self.engine.configure(working_min, rest_min)
+        self.checkpoint.clear()
+        self.show_time(self.engine.time_left)
 
         messagebox.showinfo(
             "設定完了", f"作業時間: {working_min}分\n休憩時間: {rest_min}分"
         )
 
-    def record_session(self):
-        end_time = datetime.now()
-        td = timedelta(seconds=self.duration_time)
-        with open("pomodoro_sessions.csv", "a", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow([end_time.strftime("%Y-%m-%d"), str(td)])
+    @timed("record_session")
+    def record_session(self, end_time=None):
+        end_time, seconds, start_time = self.engine.take_session(end_time)
+        tag = clean_tag(self.tag_choice.get())
+        self.storage.append(end_time, seconds, start_time, tag)
+        self.checkpoint.clear()
+        if tag and tag not in self.tag_choice.cget("values"):
+            tags = self.tag_choice.cget("values")
+            self.tag_choice.configure(values=[*tags, tag])
+        # 日別の累積和は、分析ウィンドウを表示していなくても更新しておく
+        if self.day_index is not None:
+            self.day_index.add(end_time.date(), seconds)
+            self.tag_index.add(tag, end_time.date(), seconds)
+        elif self.index_job.running():
+            # 作成中の累積和に今回の分が含まれるとは限らないので、終わり次第作り直す
+            self.index_job.invalidate()
+        # 分析ウィンドウを表示中 (最小化中を含む) なら、読み込み直さずに今回の分を加える
+        if not self.stats_window.visible():
+            return
+        if self.stats_job.running():
+            # 集計中の結果に今回の分が含まれるとは限らないので、終わり次第集計し直す
+            self.stats_job.invalidate()
+        else:
+            self.monthly_table.add(end_time.date(), seconds, tag)
+            self.show_range(notify=False)
+            self.add_to_heatmap(end_time, seconds, start_time)
+
+    def load_indexes(self):
+        # 別スレッドで実行される。集計のキャッシュもここで作っておく
+        from day_index import DayIndex, TagIndex
+
+        stats = self.storage.stats()
+        tags = sorted(stats.tags())
+        return tags, DayIndex.from_stats(stats), TagIndex.from_stats(stats)
+
+    def on_indexes_loaded(self, result, error):
+        if error is not None:
+            return
+        tags, day_index, tag_index = result
+        self.tag_choice.configure(values=tags)
+        # 分析ウィンドウの集計が先に終わっていれば、そちらの方が新しい
+        if self.day_index is None:
+            self.day_index, self.tag_index = day_index, tag_index
+
+    def show_perf(self):
+        from perf_window import PerfWindow
+
+        # 一度だけ作り、閉じても隠しておく
+        if self.perf_window is None:
+            self.perf_window = PerfWindow(self.master)
+        self.perf_window.show()
 
     def on_closing(self):
-        for child in self.child_windows:
-            child.after_cancel("check_dpi_scaling")  # すべてのafter呼び出しをキャンセル
-            child.destroy()
-        self.master.after_cancel("update")
-        if self.is_running:
-            self.is_running = False
-            self.button.configure(text="Start")
-        if self.duration_time != 0:
+        if self.perf_window is not None:
+            self.perf_window.destroy()
+        self.stats_job.cancel()
+        self.index_job.cancel()
+        self.flush_job.cancel()
+        self.afters.cancel_all()
+        if self.engine.is_running:
+            self.stop_timer()
+        if self.engine.duration_time != 0:
             if messagebox.askyesno("保存", "現在の作業時間を保存しますか？"):
                 self.record_session()
-        self.master.quit()
+        # 記録しなかった作業も、閉じて終了した場合は次回復元しない
+        self.checkpoint.clear()
+        self.checkpoint.close()
+        self.storage.close()
+        self.config_window.destroy()
+        self.stats_window.destroy()
+        self.sessions_window.destroy()
         self.master.destroy()
         self.master.quit()
 
     def set_config(self):
-        config_window = ctk.CTkToplevel(self.master)
-        config_window.title("Config")
-        config_window.geometry("240x220")
+        self.config_window.show()
 
-        label_work = ctk.CTkLabel(
-            config_window, text="Working time (min)", font=("Arial", 14)
-        )
+    def build_config(self, window):
+        window.title("Config")
+        window.geometry("240x220")
+
+        label_work = ctk.CTkLabel(window, text="Working time (min)", font=("Arial", 14))
         label_work.pack(pady=10)
-        entry_working_min = ctk.CTkEntry(config_window)
-        entry_working_min.insert(0, str(self.working_min))
-        entry_working_min.pack()
+        self.entry_working_min = ctk.CTkEntry(window)
+        self.entry_working_min.pack()
 
-        label_rest = ctk.CTkLabel(
-            config_window, text="Rest time (min)", font=("Arial", 14)
-        )
+        label_rest = ctk.CTkLabel(window, text="Rest time (min)", font=("Arial", 14))
         label_rest.pack(pady=10)
-        entry_rest_min = ctk.CTkEntry(config_window)
-        entry_rest_min.insert(0, str(self.rest_min))
-        entry_rest_min.pack()
+        self.entry_rest_min = ctk.CTkEntry(window)
+        self.entry_rest_min.pack()
 
         button = ctk.CTkButton(
-            config_window,
+            window,
             text="Set",
             command=lambda: self.set_new_timer(
-                entry_working_min.get(), entry_rest_min.get()
+                self.entry_working_min.get(), self.entry_rest_min.get()
             ),
         )
         button.pack(pady=20)
-        self.child_windows.append(config_window)
+
+    def fill_config(self):
+        # 開くたびに現在の設定を入れ直す
+        for entry, minutes in (
+            (self.entry_working_min, self.engine.working_min),
+            (self.entry_rest_min, self.engine.rest_min),
+        ):
+            entry.delete(0, "end")
+            entry.insert(0, str(minutes))
 
     def show_stats(self):
-        stats_window = ctk.CTkToplevel(self.master)
-        stats_window.title("Analysis")
-        stats_window.geometry("800x770")
+        # 分析ウィンドウは一度だけ作り、2回目以降は値だけを更新して再表示する
+        # 集計は別スレッドで行い、その間もタイマーの表示を止めない
+        self.stats_window.show()
+        self.refresh_stats()
+
+    def build_stats(self, window):
+        window.title("Analysis")
+        window.geometry("800x770")
+
+        # 集計が終わるまでの表示
+        self.stats_status = ctk.CTkLabel(window, text="", font=("Arial", 12))
+        self.stats_status.pack()
 
         # TreeviewをCustomTkinterのスタイルに合わせて調整
         style = ttk.Style()
@@ -183,132 +311,241 @@ class PomodroTimer:
         )
 
         tree = ttk.Treeview(
-            stats_window,
-            columns=("Year", "Month", "Total Time"),
-            show="headings",
+            window,
+            columns=("Year", "Month", "Tag", "Total Time"),
+            show="tree headings",
         )
+        # プロジェクト別の合計は月の行の下に表示する
+        tree.column("#0", width=30, stretch=False)
         tree.heading("Year", text="Year")
         tree.heading("Month", text="Month")
+        tree.heading("Tag", text="Project")
         tree.heading("Total Time", text="total time")
         tree.pack(pady=10, padx=10, fill=ctk.BOTH, expand=True)
-
-        monthly_stats = self.calculate_monthly_stats()
-        self.child_windows.append(stats_window)
-
-        for (year, month), total_time in monthly_stats.items():
-            tree.insert(
-                "", "end", values=(year, calendar.month_abbr[month], str(total_time))
-            )
-
-        daily_stats = self.calculate_daily_stats()
-
-        # グラフの作製と表示
-        plt.rcParams["font.family"] = "Arial"
-        fig, ax = plt.subplots(figsize=(10, 6))
-        fig.patch.set_facecolor("mintcream")  # figure全体の背景色を設定
-        ax.set_facecolor("mintcream")
-        dates = list(daily_stats.keys())
-        # 辞書オブジェクトの値側をtotaltimeとして取得
-        hours = [
-            total_time.total_seconds() / 3600 for total_time, _ in daily_stats.values()
-        ]
-        weekdays = [weekday for _, weekday in daily_stats.values()]
-        color_map = {
-            "Monday": "slateblue",
-            "Tuesday": "tomato",
-            "Wednesday": "cyan",
-            "Thursday": "palegreen",
-            "Friday": "goldenrod",
-            "Saturday": "rosybrown",
-            "Sunday": "gold",
-        }
-        bar_colors = [color_map[weekday] for weekday in weekdays]
-        ax.bar(dates, hours, color=bar_colors)
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Hours")
-        ax.set_title("Working Time (Last 30 Days)")
-        plt.xticks(rotation=45, ha="right")
-        plt.tight_layout()
-        plt.grid()
-
-        # 凡例
-        handles = [
-            plt.Rectangle((0, 0), 1, 1, color=color) for color in color_map.values()
-        ]
-        labels = list(color_map.keys())
-        plt.legend(
-            handles,
-            labels,
-            title="Weekdays",
-            loc="upper left",
-            bbox_to_anchor=(0, 1),
-            fontsize=8,
+        self.stats_tree = tree
+        tree.bind("<Double-1>", self.drill_down)
+
+        # 日別グラフの期間 (直近の日数を選ぶか、開始日・終了日を入力する)
+        range_frame = ctk.CTkFrame(window, fg_color="transparent")
+        range_frame.pack(fill=ctk.X, padx=10)
+        self.range_choice = ctk.CTkOptionMenu(
+            range_frame,
+            values=list(STATS_RANGES),
+            width=100,
+            command=lambda value: self.select_range(),
+        )
+        self.range_choice.set(DEFAULT_RANGE)
+        self.range_choice.pack(side=ctk.LEFT)
+        self.range_start = ctk.CTkEntry(range_frame, width=110)
+        self.range_start.pack(side=ctk.LEFT, padx=5)
+        ctk.CTkLabel(range_frame, text="-").pack(side=ctk.LEFT)
+        self.range_end = ctk.CTkEntry(range_frame, width=110)
+        self.range_end.pack(side=ctk.LEFT, padx=5)
+        ctk.CTkButton(
+            range_frame, text="Show", width=60, command=self.show_range
+        ).pack(side=ctk.LEFT)
+        self.range_total = ctk.CTkLabel(range_frame, text="")
+        self.range_total.pack(side=ctk.LEFT, padx=10)
+        self.fill_range(STATS_RANGES[DEFAULT_RANGE])
+
+        # 日別のグラフ、プロジェクト別の積み上げグラフ、曜日 x 時のヒートマップを
+        # タブで切り替える
+        chart_tabs = ctk.CTkTabview(window, fg_color="mintcream")
+        chart_tabs.pack(fill=ctk.BOTH, expand=True, padx=10)
+        self.daily_tab = chart_tabs.add("Daily")
+        self.tag_tab = chart_tabs.add("Projects")
+        self.heatmap_tab = chart_tabs.add("Weekday x Hour")
+
+    def build_sessions(self, window):
+        from session_list import SessionList
+
+        # 行数は固定なので、縦には広げない
+        window.resizable(True, False)
+        self.session_list = SessionList(
+            window,
+            self.storage.session_pages(),
+            ("Date", "Start", "End", "Duration", "Project"),
+            untagged="(untagged)",
         )
+        self.session_list.frame.pack(fill=ctk.BOTH, expand=True, padx=10, pady=10)
 
-        canvas = FigureCanvasTkAgg(fig, stats_window)
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(fill=ctk.BOTH, expand=True)
-        plt.close(fig)  # メモリリークを防ぐためにfigureを閉じる
+    def drill_down(self, event):
+        # 月の行 (またはその下のプロジェクトの行) の月のセッションを一覧にする
+        if self.monthly_table is None:
+            return
+        key = self.monthly_table.month_of(self.stats_tree.identify_row(event.y))
+        if key is None:
+            return
+        # 書き出し中なら、終わった時点で最後に選んだ月を開く
+        self.sessions_key = key
+        if not self.flush_job.running():
+            self.flush_job.request(self.on_sessions_flushed)
+
+    def on_sessions_flushed(self, result, error):
+        if error is not None:
+            self.show_load_error(error)
+            return
+        self.sessions_window.show()
+        year, month = key = self.sessions_key
+        self.sessions_window.window.title(f"Sessions {year}-{month:02d}")
+        self.session_list.show(key)
+
+    def hide_stats(self):
+        # 隠している間に終わった集計の結果は使わない
+        self.stats_job.cancel()
+
+    def refresh_stats(self):
+        # 集計中なら新しく始めずに、その結果を待つ
+        self.stats_status.configure(text="Loading...")
+        self.stats_job.request(self.on_stats_loaded)
+
+    @timed("stats_compute")
+    def compute_stats(self):
+        # 別スレッドで実行されるので、ウィジェットには触らない
+        import stats_view  # noqa: F401  重いライブラリの読み込みもここで済ませる
+
+        from day_index import DayIndex, TagIndex
+        from stats_engine import tag_monthly_stats
+
+        stats = self.storage.stats()
+        monthly = self.calculate_monthly_stats(stats)
+        return (
+            DayIndex.from_stats(stats),
+            monthly,
+            stats.hour_heatmap(),
+            TagIndex.from_stats(stats),
+            tag_monthly_stats(stats),
+        )
 
-    def calculate_monthly_stats(self):
-        monthly_stats = defaultdict(timedelta)
+    @timed("show_stats_render")
+    def on_stats_loaded(self, result, error):
+        if error is not None:
+            from day_index import DayIndex, TagIndex
+
+            self.show_load_error(error)
+            result = DayIndex(), {}, [[0] * 24] * 7, TagIndex(), {}
+        self.day_index, monthly, heatmap, self.tag_index, tag_monthly = result
+        self.stats_status.configure(text="")
+        if self.monthly_table is None:
+            from stats_view import MonthlyTable
+
+            self.monthly_table = MonthlyTable(self.stats_tree)
+        self.monthly_table.update(monthly, tag_monthly)
+        self.show_range()
+        self.show_heatmap(heatmap)
+
+    def select_range(self):
+        self.fill_range(STATS_RANGES[self.range_choice.get()])
+        self.show_range()
+
+    def fill_range(self, n_days):
+        # 今日までの n_days 日を開始日・終了日の欄に入れる
+        today = datetime.now().date()
+        first_day = today - timedelta(days=n_days - 1)
+        for entry, day in ((self.range_start, first_day), (self.range_end, today)):
+            entry.delete(0, "end")
+            entry.insert(0, day.isoformat())
 
+    def read_range(self, notify=True):
         try:
-            with open("pomodoro_sessions.csv", "r") as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    date = datetime.strptime(row[0], "%Y-%m-%d")
-                    duration = datetime.strptime(row[1], "%H:%M:%S")
-                    time_delta = timedelta(
-                        hours=duration.hour,
-                        minutes=duration.minute,
-                        seconds=duration.second,
-                    )
-                    monthly_stats[(date.year, date.month)] += time_delta
-        except FileNotFoundError:
-            messagebox.showwarning("警告", "CSVファイルが見つかりません。")
-        except Exception as e:
-            messagebox.showerror(
-                "エラー", f"データの読み込み中にエラーが発生しました: {str(e)}"
+            first_day = date.fromisoformat(self.range_start.get().strip())
+            last_day = date.fromisoformat(self.range_end.get().strip())
+        except ValueError:
+            if notify:
+                messagebox.showerror("エラー", "日付は YYYY-MM-DD の形式で入力してください")
+            return None
+        if last_day < first_day:
+            if notify:
+                messagebox.showerror("エラー", "終了日は開始日以降にしてください")
+            return None
+        return first_day, last_day
+
+    @timed("show_range")
+    def show_range(self, notify=True):
+        # 累積和から求めるので、期間の合計は O(1)、グラフは期間の日数だけで済む
+        from stats_engine import daily_stats
+
+        selected = self.read_range(notify)
+        if self.day_index is None or selected is None:
+            return
+        first_day, last_day = selected
+        total = timedelta(seconds=self.day_index.range_total(first_day, last_day))
+        self.range_total.configure(text=f"Total {total}")
+        n_days = (last_day - first_day).days + 1
+        daily = daily_stats(self.day_index, last_day, n_days)
+        if self.daily_chart is None:
+            import matplotlib
+            from stats_view import DailyChart
+
+            # グラフの作製と表示
+            matplotlib.rcParams["font.family"] = "Arial"
+            self.daily_chart = DailyChart(
+                self.daily_tab, daily, facecolor="mintcream", legend_fontsize=8
             )
+            self.daily_chart.widget.pack(fill=ctk.BOTH, expand=True)
+        title = f"Working Time ({first_day} - {last_day})"
+        self.daily_chart.update(daily, title=title)
+        self.show_tags(first_day, n_days)
+
+    def show_tags(self, first_day, n_days):
+        # タグごとの累積和から、期間内の日別の作業時間を積み上げて表示する
+        dates = [first_day + timedelta(days=i) for i in range(n_days)]
+        tag_daily = self.tag_index.daily_totals(first_day, n_days)
+        if self.tag_chart is None:
+            from stats_view import TagChart
+
+            self.tag_chart = TagChart(
+                self.tag_tab,
+                dates,
+                tag_daily,
+                facecolor="mintcream",
+                legend_fontsize=8,
+            )
+            self.tag_chart.widget.pack(fill=ctk.BOTH, expand=True)
+        else:
+            self.tag_chart.update(dates, tag_daily)
 
-        return dict(sorted(monthly_stats.items(), reverse=True))
+    def show_heatmap(self, heatmap):
+        if self.hour_chart is not None:
+            self.hour_chart.update(heatmap)
+            return
 
-    def calculate_daily_stats(self):
-        daily_stats = defaultdict(timedelta)
-        today = datetime.now().date()
-        thirty_days_ago = today - timedelta(days=29)
+        from stats_view import HourHeatmap
 
-        try:
-            df = pd.read_csv("pomodoro_sessions.csv", names=["date", "duration"])
-            df["date"] = pd.to_datetime(df["date"]).dt.date
-            df["duration"] = pd.to_timedelta(df["duration"])
-
-            # 直近30日のデータをフィルタリング
-            df_filtered = df[(df["date"] >= thirty_days_ago) & (df["date"] <= today)]
-
-            # 日ごとの合計時間を計算(辞書型で保存される)
-            daily_stats = df_filtered.groupby("date")["duration"].sum().to_dict()
-
-            # 30日分のデータを確保（データがない日は0で埋める）
-            all_dates = [thirty_days_ago + timedelta(days=i) for i in range(30)]
-            daily_stats = {
-                date: daily_stats.get(date, timedelta(0)) for date in all_dates
-            }
-            # 曜日の情報を付加する
-            daily_stats_with_weekday = {
-                date: (total_time, date.strftime("%A"))
-                for date, total_time in daily_stats.items()
-            }
-        except FileNotFoundError:
+        self.hour_chart = HourHeatmap(self.heatmap_tab, heatmap, facecolor="mintcream")
+        self.hour_chart.widget.pack(fill=ctk.BOTH, expand=True)
+
+    def add_to_heatmap(self, end_time, seconds, start_time):
+        from session_log import session_times
+        from session_table import SessionTable
+
+        _, start, end, offset = session_times(end_time, seconds, start_time)
+        # ヒートマップには日付を使わない
+        session = SessionTable([0], [seconds], [start], [end], [offset])
+        self.hour_chart.add(session.hour_heatmap())
+
+    def show_load_error(self, error):
+        if isinstance(error, FileNotFoundError):
             messagebox.showwarning("警告", "CSVファイルが見つかりません。")
-        except Exception as e:
+        else:
             messagebox.showerror(
-                "エラー", f"データの読み込み中にエラーが発生しました: {str(e)}"
+                "エラー", f"データの読み込み中にエラーが発生しました: {str(error)}"
             )
-        return daily_stats_with_weekday
+
+    @timed("calculate_monthly_stats")
+    def calculate_monthly_stats(self, stats):
+        from stats_engine import monthly_stats
+
+        return monthly_stats(stats)
 
 
-root = ctk.CTk()
-app = PomodroTimer(root)
-root.mainloop()
+if __name__ == "__main__":
+    # 既に起動していれば、そのウィンドウを前面に出して終了する
+    instance = SingleInstance()
+    if not instance.acquire():
+        raise SystemExit
+    root = ctk.CTk()
+    app = PomodroTimer(root)
+    instance.listen(root)
+    root.mainloop()
+    instance.close()
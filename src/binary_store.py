@@ -0,0 +1,182 @@
+# 固定長のバイナリ形式でセッションを保存する (CSVの高速な複製)
+#   python binary_store.py migrate [CSV] [BIN]  既存のCSVから作成・追いつく
+#   python binary_store.py export [BIN] [CSV]   CSVへ書き出す
+import argparse
+import mmap
+import os
+import struct
+from datetime import date, timedelta
+
+import numpy as np
+
+from session_log import SESSIONS_CSV, format_duration, format_offset
+from session_table import UNKNOWN, SessionTable, iter_sessions
+
+MAGIC = b"KTSESS03"
+# 開始・終了時刻やタグのない以前の形式。次の sync で作り直す
+OLD_MAGICS = (b"KTSESS01", b"KTSESS02")
+# ヘッダー: マジック, レコード数, 取り込み済みのCSVのバイト数
+HEADER = struct.Struct("<8sqq")
+# レコード: 1970-01-01 からの日数, 作業時間 (秒),
+#           開始・終了時刻 (UNIX時間, 不明なら -1), UTCからの時差 (秒),
+#           タグの番号 (0 はタグなし。n 番のタグ名は .tags ファイルの n 行目)
+RECORD_DTYPE = np.dtype(
+    [
+        ("day", "<i4"),
+        ("seconds", "<i4"),
+        ("start", "<i8"),
+        ("end", "<i8"),
+        ("tz", "<i4"),
+        ("tag", "<i4"),
+    ]
+)
+EPOCH = date(1970, 1, 1)
+
+
+def binary_path_for(csv_path):
+    root, _ = os.path.splitext(csv_path)
+    return root + ".bin"
+
+
+class BinaryStore:
+    def __init__(self, path):
+        self.path = path
+        # タグの辞書 (1行に1つ、追記のみなので番号は変わらない)
+        self.tags_path = path + ".tags"
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def create(self):
+        with open(self.path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, 0, 0))
+        open(self.tags_path, "w").close()
+
+    def tag_names(self):
+        try:
+            with open(self.tags_path, encoding="utf-8") as file:
+                return [""] + file.read().splitlines()
+        except FileNotFoundError:
+            return [""]
+
+    def _tag_codes(self, table):
+        # table のタグ番号をこのファイルの番号に付け替える (新しいタグは辞書に追記する)
+        names = self.tag_names()
+        positions = {name: i for i, name in enumerate(names)}
+        added = [name for name in table.tag_names if name not in positions]
+        if added:
+            with open(self.tags_path, "a", encoding="utf-8") as file:
+                file.write("".join(name + "\n" for name in added))
+                file.flush()
+                os.fsync(file.fileno())
+            positions.update((name, len(names) + i) for i, name in enumerate(added))
+        mapping = np.array([positions[name] for name in table.tag_names])
+        return mapping[table.tags]
+
+    def is_outdated(self):
+        with open(self.path, "rb") as file:
+            return file.read(len(MAGIC)) in OLD_MAGICS
+
+    def _read_header(self, file):
+        file.seek(0)
+        magic, count, csv_offset = HEADER.unpack(file.read(HEADER.size))
+        if magic in OLD_MAGICS:
+            raise ValueError(f"outdated session store, run migrate: {self.path}")
+        if magic != MAGIC:
+            raise ValueError(f"not a session store: {self.path}")
+        return count, csv_offset
+
+    def sync(self, csv_path):
+        # CSVに追記された行だけを取り込む (以前の形式なら最初から取り込み直す)
+        # レコードを書いてからヘッダーを更新するので、途中で落ちても次回やり直せる
+        if self.is_outdated():
+            self.create()
+        with open(self.path, "r+b") as file:
+            count, csv_offset = self._read_header(file)
+            file.seek(HEADER.size + count * RECORD_DTYPE.itemsize)
+            added = 0
+            end = csv_offset
+            for table, end in iter_sessions(csv_path, csv_offset):
+                records = np.empty(len(table), dtype=RECORD_DTYPE)
+                records["day"] = table.days
+                records["seconds"] = table.seconds
+                records["start"] = table.start
+                records["end"] = table.end
+                records["tz"] = table.tz
+                records["tag"] = self._tag_codes(table)
+                file.write(records.tobytes())
+                added += len(table)
+            if end == csv_offset:
+                return 0
+            file.truncate()
+            file.flush()
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, count + added, end))
+            file.flush()
+            os.fsync(file.fileno())
+        return added
+
+    def records(self):
+        # mmap した領域をそのまま構造化配列として返す (コピーしない)
+        with open(self.path, "rb") as file:
+            count, _ = self._read_header(file)
+            if count == 0:
+                return np.zeros(0, dtype=RECORD_DTYPE)
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return np.frombuffer(
+            mapped, dtype=RECORD_DTYPE, count=count, offset=HEADER.size
+        )
+
+    def load_table(self, first=0):
+        # first 番目以降のレコード
+        records = self.records()[first:]
+        return SessionTable(
+            records["day"],
+            records["seconds"],
+            records["start"],
+            records["end"],
+            records["tz"],
+            records["tag"],
+            self.tag_names(),
+        )
+
+    def export_csv(self, csv_path):
+        records = self.records()
+        names = self.tag_names()
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            for day, seconds, start, end, tz, tag in records.tolist():
+                end_date = (EPOCH + timedelta(days=day)).isoformat()
+                row = f"{end_date},{format_duration(seconds)}"
+                if start != UNKNOWN:
+                    row += f",{start},{end},{format_offset(tz)}"
+                elif tag:
+                    row += ",,,"
+                if tag:
+                    row += f",{names[tag]}"
+                file.write(row + "\r\n")
+        return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KeepTimer binary session store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="CSVからバイナリ形式へ取り込む")
+    migrate.add_argument("csv", nargs="?", default=SESSIONS_CSV)
+    migrate.add_argument("bin", nargs="?")
+    export = sub.add_parser("export", help="バイナリ形式からCSVへ書き出す")
+    export.add_argument("bin", nargs="?", default=binary_path_for(SESSIONS_CSV))
+    export.add_argument("csv")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        store = BinaryStore(args.bin or binary_path_for(args.csv))
+        if not store.exists():
+            store.create()
+        print(f"{store.sync(args.csv)} sessions imported into {store.path}")
+    else:
+        count = BinaryStore(args.bin).export_csv(args.csv)
+        print(f"{count} sessions exported to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
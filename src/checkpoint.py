@@ -0,0 +1,142 @@
+# 作業中のセッションの状態を固定長のファイルに保存し、強制終了後に復元する
+# ファイルは mmap して同じ位置を上書きするだけなので、追記のように大きくならない
+# 2つの枠に交互に書き込み、チェックサムの合う新しい方を読むので、
+# 書き込み途中で落ちても1つ前の状態は残る
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+
+CHECKPOINT_PATH = "keeptimer.checkpoint"
+CHECKPOINT_INTERVAL_SEC = 5  # 実行中に状態を書き込む間隔
+MAGIC = b"KTCKPT01"
+# 連番, 保存時刻 (UNIX時間), 作業時間, 残り時間, 作業・休憩の分数,
+# 休憩中か, 作業中のセッションがあるか, 作業を始めた時刻 (UNIX時間)
+STATE = struct.Struct("<Qqiiii??q")
+SLOT = struct.Struct(f"<8s{STATE.size}sI")  # MAGIC, 状態, CRC32
+NO_START = -1
+
+
+class Checkpoint:
+    def __init__(self, path=CHECKPOINT_PATH, interval=CHECKPOINT_INTERVAL_SEC):
+        self.path = path
+        self.interval = interval
+        self.next_save = 0.0
+        self.sequence = 0
+        self.file = None
+        self.mapped = None
+
+    def _open(self):
+        # 初回の書き込み時に作成する (固定長なので以後の書き込みで大きさは変わらない)
+        if self.mapped is not None:
+            return
+        # 前回の連番から続けて、古い方の枠に書き込む
+        self.sequence = max((sequence for sequence, _ in self._slots()), default=0)
+        mode = "r+b" if os.path.exists(self.path) else "w+b"
+        self.file = open(self.path, mode)
+        if os.fstat(self.file.fileno()).st_size != 2 * SLOT.size:
+            self.file.truncate(2 * SLOT.size)
+        self.mapped = mmap.mmap(self.file.fileno(), 2 * SLOT.size)
+
+    def _slots(self):
+        # チェックサムの合う枠の状態を (連番, 値) で返す
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read(2 * SLOT.size)
+        except FileNotFoundError:
+            return []
+        slots = []
+        for i in range(2):
+            chunk = data[i * SLOT.size : (i + 1) * SLOT.size]
+            if len(chunk) < SLOT.size:
+                break
+            magic, state, crc = SLOT.unpack(chunk)
+            if magic == MAGIC and zlib.crc32(state) == crc:
+                values = STATE.unpack(state)
+                slots.append((values[0], values))
+        return slots
+
+    def load(self):
+        # 保存された作業中のセッション (なければ None)
+        slots = self._slots()
+        if not slots:
+            return None
+        _, values = max(slots)
+        saved_at, duration, time_left, working, rest, is_break, active, start = (
+            values[1:]
+        )
+        if not active:
+            return None
+        session_start = None
+        if start != NO_START:
+            session_start = datetime.fromtimestamp(start).astimezone()
+        return {
+            "saved_at": datetime.fromtimestamp(saved_at).astimezone(),
+            "duration_time": duration,
+            "time_left": time_left,
+            "working_min": working,
+            "rest_min": rest,
+            "is_break": is_break,
+            "session_start": session_start,
+        }
+
+    def due(self):
+        # tick ごとに呼ばれるので、時刻の比較だけで済ませる
+        return time.monotonic() >= self.next_save
+
+    def save(
+        self,
+        duration_time,
+        time_left,
+        working_min,
+        rest_min,
+        is_break,
+        session_start,
+        active=True,
+    ):
+        self._open()
+        self.sequence += 1
+        start = NO_START if session_start is None else int(session_start.timestamp())
+        state = STATE.pack(
+            self.sequence,
+            int(time.time()),
+            duration_time,
+            time_left,
+            working_min,
+            rest_min,
+            is_break,
+            active,
+            start,
+        )
+        offset = self.sequence % 2 * SLOT.size
+        self.mapped[offset : offset + SLOT.size] = SLOT.pack(
+            MAGIC, state, zlib.crc32(state)
+        )
+        # スリープや電源断に備えてディスクへ書き出す (ページ1枚分)
+        self.mapped.flush()
+        self.next_save = time.monotonic() + self.interval
+
+    def save_engine(self, engine):
+        # TimerEngine の現在の状態を保存する
+        self.save(
+            engine.duration_time,
+            engine.time_left,
+            engine.working_min,
+            engine.rest_min,
+            engine.is_break,
+            engine.session_start,
+        )
+
+    def clear(self):
+        # 記録・破棄したセッションを次回の起動時に復元しないようにする
+        if self.mapped is None and not os.path.exists(self.path):
+            return
+        self.save(0, 0, 0, 0, False, None, active=False)
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.file.close()
+            self.mapped = self.file = None
@@ -0,0 +1,111 @@
+# 日ごとの作業時間の累積和
+# 任意の期間の合計を O(1)、N 日分の日別の値を O(N) で求める (履歴の長さによらない)
+from datetime import date, timedelta
+
+import numpy as np
+
+EPOCH = date(1970, 1, 1)
+
+
+def epoch_day(day):
+    return (day - EPOCH).days
+
+
+class DayIndex:
+    # cumulative[i] は first から i 日分の合計 (cumulative[0] は 0)
+    def __init__(self, first=0, cumulative=None):
+        self.first = first
+        if cumulative is None:
+            cumulative = np.zeros(1, dtype=np.int64)
+        self.cumulative = cumulative
+
+    @classmethod
+    def from_series(cls, days, totals):
+        # days: 1970-01-01 からの日数 (昇順), totals: その日の合計秒
+        days = np.asarray(days, dtype=np.int64)
+        if not len(days):
+            return cls()
+        first = int(days[0])
+        dense = np.bincount(
+            days - first, weights=totals, minlength=int(days[-1]) - first + 1
+        )
+        cumulative = np.concatenate(([0], np.cumsum(dense.astype(np.int64))))
+        return cls(first, cumulative)
+
+    @classmethod
+    def from_stats(cls, stats):
+        return cls.from_series(*stats.daily_series())
+
+    def __len__(self):
+        # 含まれる日数
+        return len(self.cumulative) - 1
+
+    def _positions(self, start, count):
+        # start 日目から count 個の境界の位置 (範囲外は両端に寄せる)
+        offsets = np.arange(start - self.first, start - self.first + count)
+        return np.clip(offsets, 0, len(self))
+
+    def range_total(self, first_day, last_day):
+        # first_day から last_day まで (両端を含む) の合計秒
+        start = self._positions(epoch_day(first_day), 1)[0]
+        end = self._positions(epoch_day(last_day) + 1, 1)[0]
+        return int(self.cumulative[end] - self.cumulative[start])
+
+    def daily_totals(self, first_day, n_days):
+        # first_day から n_days 日分の {日付: 秒} (データがない日は0)
+        edges = self._positions(epoch_day(first_day), n_days + 1)
+        totals = np.diff(self.cumulative[edges]).tolist()
+        return {first_day + timedelta(days=i): s for i, s in enumerate(totals)}
+
+    def add(self, day, seconds):
+        # 記録されたセッションを加える (通常は最後の日なので O(1))
+        offset = epoch_day(day) - self.first
+        if len(self) == 0:
+            self.first, offset = epoch_day(day), 0
+        elif offset < 0:
+            head = np.zeros(-offset, dtype=np.int64)
+            self.cumulative = np.concatenate((head, self.cumulative))
+            self.first, offset = epoch_day(day), 0
+        if offset >= len(self):
+            tail = np.full(offset - len(self) + 1, self.cumulative[-1])
+            self.cumulative = np.concatenate((self.cumulative, tail))
+        self.cumulative[offset + 1 :] += seconds
+
+
+class TagIndex:
+    # タグごとの DayIndex。期間内のタグ別の合計もタグの数 x O(1) で求める
+    def __init__(self, indexes=None):
+        self.indexes = {} if indexes is None else indexes
+
+    @classmethod
+    def from_stats(cls, stats):
+        return cls(
+            {
+                name: DayIndex.from_series(days, totals)
+                for name, (days, totals) in stats.tag_series().items()
+            }
+        )
+
+    def tags(self):
+        return list(self.indexes)
+
+    def range_totals(self, first_day, last_day):
+        # {タグ: 秒}
+        return {
+            name: index.range_total(first_day, last_day)
+            for name, index in self.indexes.items()
+        }
+
+    def daily_totals(self, first_day, n_days):
+        # {タグ: [秒, ...]} (first_day から n_days 日分)
+        return {
+            name: list(index.daily_totals(first_day, n_days).values())
+            for name, index in self.indexes.items()
+        }
+
+    def add(self, tag, day, seconds):
+        if not tag:
+            return
+        if tag not in self.indexes:
+            self.indexes[tag] = DayIndex()
+        self.indexes[tag].add(day, seconds)
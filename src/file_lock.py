@@ -0,0 +1,77 @@
+# プロセス間の排他制御 (アドバイザリロック)
+# 対象のファイルではなく隣に置いたロック用のファイルをロックするので、
+# ロックを取らない読み込み (集計など) は妨げない
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT_SEC = 10.0
+LOCK_POLL_SEC = 0.005  # ロックが空くのを待つ間隔
+
+
+def lock_path_for(path):
+    return path + ".lock"
+
+
+def _try_lock(file):
+    # 取れなければ OSError
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _unlock(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    # with FileLock(lock_path_for(csv_path)): ... の形で使う
+    # プロセスが終了すればOSが解放するので、強制終了されても残らない
+    # timeout=None なら空くまで待つ
+    def __init__(self, path, timeout=LOCK_TIMEOUT_SEC):
+        self.path = path
+        self.timeout = timeout
+        self.file = None
+
+    def acquire(self, blocking=True):
+        file = open(self.path, "a+b")
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            try:
+                _try_lock(file)
+            except OSError:
+                if blocking and (deadline is None or time.monotonic() < deadline):
+                    time.sleep(LOCK_POLL_SEC)
+                    continue
+                file.close()
+                if blocking:
+                    raise TimeoutError(f"could not lock {self.path}")
+                return False
+            self.file = file
+            return True
+
+    def release(self):
+        # ロック用のファイルは消さない。消すと、消す前に開いた他のプロセスと
+        # 消した後に作り直したプロセスが別のファイルをロックし、両方が取れてしまう
+        if self.file is None:
+            return
+        _unlock(self.file)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,83 @@
+# 同じフォルダで2つ目の KeepTimer を起動させず、起動済みのウィンドウを前面に出す
+# 最初のプロセスがロックを取り、localhost で待ち受けるポートをファイルに書いておく
+# 2つ目のプロセスはそのポートへ接続して前面に出すよう伝え、すぐ終了する
+import os
+import socket
+import threading
+
+from file_lock import FileLock
+
+INSTANCE_LOCK = "keeptimer.lock"
+INSTANCE_PORT = "keeptimer.port"
+ACTIVATE = b"activate\n"
+CONNECT_TIMEOUT_SEC = 1.0
+
+
+def activate(window):
+    # 最小化・他のウィンドウの後ろにあっても前面に出す
+    window.deiconify()
+    window.lift()
+    window.focus_force()
+
+
+class SingleInstance:
+    def __init__(self, lock_path=INSTANCE_LOCK, port_path=INSTANCE_PORT):
+        self.lock = FileLock(lock_path)
+        self.port_path = port_path
+        self.server = None
+
+    def acquire(self):
+        # 起動してよければ True。既に起動していればそのウィンドウへ知らせて False
+        if self.lock.acquire(blocking=False):
+            return True
+        self.notify()
+        return False
+
+    def notify(self):
+        try:
+            with open(self.port_path, encoding="ascii") as file:
+                port = int(file.read())
+            address = ("127.0.0.1", port)
+            with socket.create_connection(address, CONNECT_TIMEOUT_SEC) as conn:
+                conn.sendall(ACTIVATE)
+        except (OSError, ValueError):
+            # 起動中のプロセスが待ち受けを始める前なら何もしない
+            pass
+
+    def listen(self, window):
+        # 知らせを受けたら window を前面に出す (受信は別スレッドで待ち、
+        # 表示の操作は after で Tk のスレッドに渡す)
+        self.server = socket.create_server(("127.0.0.1", 0))
+        with open(self.port_path, "w", encoding="ascii") as file:
+            file.write(str(self.server.getsockname()[1]))
+        thread = threading.Thread(target=self._serve, args=(window,), daemon=True)
+        thread.start()
+
+    def _serve(self, window):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return  # close() で閉じられた
+            with conn:
+                conn.settimeout(CONNECT_TIMEOUT_SEC)
+                try:
+                    message = conn.recv(len(ACTIVATE))
+                except OSError:
+                    continue
+            if message == ACTIVATE:
+                try:
+                    window.after(0, activate, window)
+                except Exception:
+                    # メインループの終了後 (ウィンドウが破棄されている)
+                    return
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            try:
+                os.remove(self.port_path)
+            except OSError:
+                pass
+        self.lock.release()
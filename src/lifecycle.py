@@ -0,0 +1,77 @@
+# 子ウィンドウと after() の予約の管理
+# 長時間起動したままでも、開いたウィンドウや予約が溜まり続けないようにする
+import tkinter as tk
+
+
+class AfterRegistry:
+    # after() の予約を名前ごとに1つだけ持ち、終了時にまとめて取り消す
+    # 同じ名前で予約し直すと、前の予約は取り消される
+    def __init__(self, widget):
+        self.widget = widget
+        self.ids = {}  # 名前 -> after の ID
+
+    def schedule(self, name, delay, callback, *args):
+        self.cancel(name)
+        self.ids[name] = self.widget.after(delay, self._run, name, callback, args)
+
+    def _run(self, name, callback, args):
+        # 実行中は予約がないものとして扱う (コールバックの中で予約し直せる)
+        self.ids.pop(name, None)
+        callback(*args)
+
+    def pending(self, name):
+        return name in self.ids
+
+    def cancel(self, name):
+        after_id = self.ids.pop(name, None)
+        if after_id is not None:
+            self.widget.after_cancel(after_id)
+
+    def cancel_all(self):
+        for name in list(self.ids):
+            self.cancel(name)
+
+
+class ChildWindow:
+    # 一度だけ作り、閉じても破棄せずに隠しておく子ウィンドウ
+    # build(window): 中身を作る (最初に表示するときだけ)
+    # on_show(): 表示するたびに呼ぶ / on_hide(): 閉じたときに呼ぶ
+    def __init__(
+        self, master, build, on_show=None, on_hide=None, factory=tk.Toplevel
+    ):
+        self.master = master
+        self.build = build
+        self.on_show = on_show
+        self.on_hide = on_hide
+        self.factory = factory
+        self.window = None
+
+    def exists(self):
+        return self.window is not None and bool(self.window.winfo_exists())
+
+    def visible(self):
+        # 最小化中も表示中として扱う (winfo_viewable() は最小化中は偽になる)
+        # 隠しているのは hide() で withdraw したときだけ
+        return self.exists() and self.window.state() != "withdrawn"
+
+    def show(self):
+        if self.exists():
+            self.window.deiconify()
+            self.window.lift()
+        else:
+            self.window = self.factory(self.master)
+            self.window.protocol("WM_DELETE_WINDOW", self.hide)
+            self.build(self.window)
+        if self.on_show is not None:
+            self.on_show()
+
+    def hide(self):
+        if self.on_hide is not None:
+            self.on_hide()
+        if self.exists():
+            self.window.withdraw()
+
+    def destroy(self):
+        if self.exists():
+            self.window.destroy()
+        self.window = None
@@ -0,0 +1,165 @@
+# セッションログを年/月で分割した Parquet に書き出す (pyarrow が必要)
+#   python parquet_store.py sync [CSV] [DIR]   前回以降に追記された行だけを書き出す
+# DIR/year=2026/month=10/part-<CSVの開始位置>.parquet の形で保存するので、
+# pandas や pyarrow.dataset から型変換なしで読める
+# ParquetStore.read(列, 最初の日, 最後の日) は期間外の年/月と行グループを読み飛ばす
+# (Analysis は使わない。ノートブックなどで期間を絞って読むためのもの)
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from session_log import SESSIONS_CSV, SESSIONS_PARQUET
+from session_table import UNKNOWN, UNTAGGED, iter_sessions
+
+# "_" や "." で始まるファイルはデータセットの読み込みで無視される
+STATE_FILE = "_sync.json"  # 書き出し済みのCSVの位置
+STATE_VERSION = 2  # 列を増やしたら上げる (古い書き出しは作り直す)
+HEAD_BYTES = 4096  # CSVの書き換え検出に使う先頭のバイト数
+ROW_GROUP_ROWS = 64 * 1024
+SCHEMA = pa.schema(
+    [
+        ("date", pa.date32()),
+        ("duration", pa.duration("s")),
+        ("start", pa.timestamp("s", tz="UTC")),
+        ("end", pa.timestamp("s", tz="UTC")),
+        ("tz_offset", pa.int32()),  # UTCからの時差 (秒)
+        ("tag", pa.dictionary(pa.int32(), pa.string())),  # タグなしは null
+    ]
+)
+PARTITIONING = ds.partitioning(
+    pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive"
+)
+
+
+def _head_digest(csv_path, size=HEAD_BYTES):
+    with open(csv_path, "rb") as file:
+        return hashlib.sha1(file.read(size)).hexdigest()
+
+
+class ParquetStore:
+    def __init__(self, path=SESSIONS_PARQUET):
+        self.path = path
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def _read_state(self):
+        try:
+            with open(os.path.join(self.path, STATE_FILE), encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_state(self, state):
+        path = os.path.join(self.path, STATE_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(path + ".tmp", path)
+
+    def sync(self, csv_path):
+        # 前回以降に追記された行を、年/月ごとに1つのファイルとして追加する
+        # ファイル名は今回の開始位置なので、途中で落ちてもやり直せば上書きされる
+        # 書き出し済みの部分の先頭が変わっていれば最初から作り直す
+        state = self._read_state()
+        if state is not None and state.get("version") != STATE_VERSION:
+            state = None
+        if state is not None:
+            size = min(HEAD_BYTES, state["csv_offset"])
+            if (
+                os.path.getsize(csv_path) < state["csv_offset"]
+                or _head_digest(csv_path, size) != state["head"]
+            ):
+                state = None
+        if state is None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            state = {"version": STATE_VERSION, "csv_offset": 0}
+        os.makedirs(self.path, exist_ok=True)
+
+        start = end = state["csv_offset"]
+        batches = []
+        for table, end in iter_sessions(csv_path, start):
+            if len(table):
+                batches.append(_to_batch(table))
+        if batches:
+            table = pa.Table.from_batches(batches, SCHEMA)
+            self._write_partitions(table, f"part-{start:012d}")
+        state["csv_offset"] = end
+        state["head"] = _head_digest(csv_path, min(HEAD_BYTES, end))
+        self._write_state(state)
+        return sum(len(batch) for batch in batches)
+
+    def _write_partitions(self, table, name):
+        days = table["date"].to_numpy().astype("datetime64[D]")
+        months = days.astype("datetime64[M]").astype(np.int64)
+        for month in np.unique(months):
+            # 日付順に並べると行グループの最小・最大が狭くなり、読み飛ばしやすい
+            rows = table.filter(pa.array(months == month)).sort_by("date")
+            year, month_index = divmod(int(month), 12)
+            folder = os.path.join(
+                self.path, f"year={1970 + year}", f"month={month_index + 1}"
+            )
+            os.makedirs(folder, exist_ok=True)
+            temp = os.path.join(folder, f".{name}.parquet")
+            pq.write_table(rows, temp, row_group_size=ROW_GROUP_ROWS)
+            os.replace(temp, os.path.join(folder, f"{name}.parquet"))
+
+    def dataset(self):
+        return ds.dataset(self.path, format="parquet", partitioning=PARTITIONING)
+
+    def read(self, columns, first_day=None, last_day=None):
+        # 期間の条件は年/月のディレクトリと行グループの統計情報で絞り込まれる
+        condition = None
+        if first_day is not None:
+            condition = (ds.field("date") >= first_day) & (
+                ds.field("year") >= first_day.year
+            )
+        if last_day is not None:
+            until = (ds.field("date") <= last_day) & (
+                ds.field("year") <= last_day.year
+            )
+            condition = until if condition is None else condition & until
+        return self.dataset().to_table(columns=columns, filter=condition)
+
+
+def _to_batch(table):
+    # 開始・終了時刻のない古い行は null にする
+    unknown = table.start == UNKNOWN
+    columns = [
+        table.days.astype("datetime64[D]"),
+        table.seconds.astype("timedelta64[s]"),
+        table.start.astype("datetime64[s]"),
+        table.end.astype("datetime64[s]"),
+        table.tz,
+    ]
+    arrays = [
+        pa.array(column, field.type, mask=unknown if i >= 2 else None)
+        for i, (column, field) in enumerate(zip(columns, SCHEMA))
+    ]
+    # タグは番号と名前の辞書のまま渡す (番号 0 = タグなし は null)
+    names = pa.array(table.tag_names, pa.string())
+    codes = pa.array(table.tags, pa.int32(), mask=table.tags == UNTAGGED)
+    arrays.append(pa.DictionaryArray.from_arrays(codes, names))
+    return pa.record_batch(arrays, schema=SCHEMA)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KeepTimer Parquet export")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="CSVに追記された行を Parquet に書き出す")
+    sync.add_argument("csv", nargs="?", default=SESSIONS_CSV)
+    sync.add_argument("dir", nargs="?", default=SESSIONS_PARQUET)
+    args = parser.parse_args()
+
+    store = ParquetStore(args.dir)
+    print(f"{store.sync(args.csv)} sessions written to {store.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# 処理時間の計測
+# 既定では記録しない (KEEPTIMER_PERF=1 で起動するか、Perf ウィンドウで有効にする)
+# 記録は項目ごとに固定長のリングバッファに残し、古い値から捨てる
+import functools
+import io
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+RING_SIZE = 2048  # 項目ごとに残す件数
+PERCENTILES = (50, 90, 99)
+# tick_late_ms のヒストグラムの区切り (ミリ秒)
+LATE_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+PERF_JSON = "keeptimer_perf.json"
+PROFILE_PATH = "keeptimer.prof"
+
+
+def percentile(values, p):
+    # 最近傍順位法 (values は並べ替え済み)
+    index = max(0, -(-len(values) * p // 100) - 1)
+    return values[index]
+
+
+def histogram(values, edges):
+    # edges で区切った各区間の件数 (最後は edges[-1] より大きい値)
+    counts = [0] * (len(edges) + 1)
+    for value in values:
+        counts[bisect_left(edges, value)] += 1
+    return counts
+
+
+class PerfRecorder:
+    def __init__(self, enabled=False, size=RING_SIZE):
+        self.enabled = enabled
+        self.size = size
+        self.series = {}  # 項目名 -> deque
+        # record() は集計スレッドなどからも呼ばれるので、series は lock の中で触る
+        self.lock = threading.Lock()
+        self.profiler = None
+
+    def record(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            ring = self.series.get(name)
+            if ring is None:
+                ring = self.series[name] = deque(maxlen=self.size)
+            ring.append(value)
+
+    def clear(self):
+        with self.lock:
+            self.series = {}
+
+    def snapshot(self):
+        # 項目名 -> 値のリストの写し (集計は lock の外で行う)
+        with self.lock:
+            return {name: list(ring) for name, ring in self.series.items()}
+
+    def summary(self):
+        series = self.snapshot()
+        result = {}
+        for name, ring in sorted(series.items()):
+            values = sorted(ring)
+            if not values:
+                continue
+            stats = {"count": len(values)}
+            for p in PERCENTILES:
+                stats[f"p{p}"] = round(percentile(values, p), 3)
+            stats["max"] = round(values[-1], 3)
+            result[name] = stats
+        late = series.get("tick_late_ms")
+        if late:
+            labels = [f"<={edge}" for edge in LATE_BUCKETS_MS]
+            labels.append(f">{LATE_BUCKETS_MS[-1]}")
+            counts = histogram(late, LATE_BUCKETS_MS)
+            result["tick_late_histogram"] = dict(zip(labels, counts))
+        return result
+
+    def dump_json(self, path=PERF_JSON):
+        import json
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+        return path
+
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        # 呼び出したスレッド (Tk のメインループ) だけを計測する
+        import cProfile
+
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self, path=PROFILE_PATH, limit=25):
+        # 結果をファイルに保存し、累積時間の上位を文字列で返す
+        import pstats
+
+        if self.profiler is None:
+            return ""
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+recorder = PerfRecorder(enabled=os.environ.get("KEEPTIMER_PERF") == "1")
+
+
+def timed(name):
+    # 無効なときは有効かどうかの確認だけで元の関数を呼ぶ
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.record(name, (time.perf_counter() - start) * 1000)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,111 @@
+# 計測結果を表示する Perf ウィンドウ (F12 で開く)
+import os
+import tkinter as tk
+
+from lifecycle import AfterRegistry, ChildWindow
+from perf import PERCENTILES, PROFILE_PATH, recorder
+
+REFRESH_MS = 1000  # 表示の更新間隔
+
+
+class PerfWindow(ChildWindow):
+    # 計測結果の百分位数を表示し、記録・cProfile の切り替えと JSON の保存を行う
+    # 閉じても隠すだけで、表示している間だけ REFRESH_MS ごとに更新する
+    def __init__(self, master, factory=tk.Toplevel):
+        super().__init__(
+            master,
+            self.build_widgets,
+            on_show=self.refresh_now,
+            on_hide=self.stop_refresh,
+            factory=factory,
+        )
+        self.afters = AfterRegistry(master)
+        self.frozen = False  # cProfile の結果を表示している間は更新しない
+
+    def build_widgets(self, window):
+        window.title("Perf")
+        window.geometry("520x420")
+        buttons = tk.Frame(window)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        self.record_button = tk.Button(buttons, command=self.toggle_record)
+        self.record_button.pack(side=tk.LEFT)
+        self.profile_button = tk.Button(buttons, command=self.toggle_profile)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Clear", command=self.clear).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Save JSON", command=self.save).pack(side=tk.LEFT)
+        self.status = tk.Label(window, anchor="w")
+        self.status.pack(fill=tk.X, padx=5)
+
+        self.text = tk.Text(window, font=("Courier", 10), wrap=tk.NONE)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+    def stop_refresh(self):
+        self.afters.cancel_all()
+
+    def destroy(self):
+        self.stop_refresh()
+        super().destroy()
+
+    def refresh(self):
+        # 表示に失敗しても、次の更新は予約しておく
+        try:
+            self.record_button.config(
+                text="Recording: ON" if recorder.enabled else "Recording: OFF"
+            )
+            self.profile_button.config(
+                text="Stop cProfile" if recorder.profiling() else "Start cProfile"
+            )
+            if not self.frozen:
+                self.show_summary()
+        finally:
+            self.afters.schedule("refresh", REFRESH_MS, self.refresh)
+
+    def show_summary(self):
+        lines = []
+        header = "".join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+        lines.append(f"{'name':<22}{'count':>7}{header}{'max':>10}")
+        summary = recorder.summary()
+        histogram = summary.pop("tick_late_histogram", None)
+        for name, stats in summary.items():
+            values = "".join(f"{stats[f'p{p}']:>10.2f}" for p in PERCENTILES)
+            lines.append(
+                f"{name:<22}{stats['count']:>7}{values}{stats['max']:>10.2f}"
+            )
+        if histogram:
+            lines.append("")
+            lines.append("tick lateness (ms)")
+            for label, count in histogram.items():
+                lines.append(f"  {label:>6} {count:>7}")
+        self.set_text("\n".join(lines))
+
+    def set_text(self, text):
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", text)
+
+    def toggle_record(self):
+        recorder.enabled = not recorder.enabled
+        self.frozen = False
+        self.refresh_now()
+
+    def toggle_profile(self):
+        if recorder.profiling():
+            self.set_text(recorder.stop_profile())
+            self.frozen = True
+            self.status.config(text=f"saved {os.path.abspath(PROFILE_PATH)}")
+        else:
+            recorder.start_profile()
+            self.status.config(text="cProfile running")
+        self.refresh_now()
+
+    def clear(self):
+        recorder.clear()
+        self.frozen = False
+        self.refresh_now()
+
+    def save(self):
+        path = recorder.dump_json()
+        self.status.config(text=f"saved {os.path.abspath(path)}")
+
+    def refresh_now(self):
+        # 予約し直すので、前の更新の予約は取り消される
+        self.refresh()
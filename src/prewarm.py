@@ -0,0 +1,26 @@
+import importlib
+import threading
+
+# Analysis を開くときに必要になる重いモジュール
+ANALYSIS_MODULES = (
+    "numpy",
+    "stats_view",
+    "rollup_cache",
+    "stats_engine",
+)
+
+
+def _import_all(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # 読み込みに失敗しても、show_stats 側で改めてエラーになる
+            return
+
+
+def prewarm_analysis(modules=ANALYSIS_MODULES):
+    # ウィンドウ表示後にバックグラウンドで読み込んでおく
+    thread = threading.Thread(target=_import_all, args=(modules,), daemon=True)
+    thread.start()
+    return thread
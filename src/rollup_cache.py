@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from perf import recorder
+from session_log import SESSIONS_CSV
+from session_table import CHUNK_BYTES, iter_sessions
+
+CACHE_VERSION = 3
+HEAD_BYTES = 4096  # 先頭の書き換え検出に使うバイト数
+TAIL_BYTES = 256  # チェックポイント直前の書き換え検出に使うバイト数
+
+
+def cache_path_for(csv_path):
+    root, _ = os.path.splitext(csv_path)
+    return root + ".rollup.json"
+
+
+def binary_cache_path_for(binary_path):
+    return binary_path + ".rollup.json"
+
+
+class SessionRollup:
+    # 日別・月別の合計秒数と、CSVのどこまでを集計済みかを保持する
+    def __init__(self):
+        self.offset = 0
+        self.size = 0
+        self.mtime_ns = 0
+        self.head = ""
+        self.tail = ""
+        self.daily = {}  # "YYYY-MM-DD" -> 秒
+        self.monthly = {}  # "YYYY-MM" -> 秒
+        self.heatmap = [0.0] * (7 * 24)  # 曜日 (月曜=0) x 時 -> 秒
+        # タグ -> {"YYYY-MM-DD": 秒} (タグのない行は含めない)
+        self.tag_daily = {}
+
+    def add_table(self, table):
+        # 追記分を日別・月別に集計してから合算する
+        days, totals = table.daily_totals()
+        keys = np.datetime_as_string(days.astype("datetime64[D]"))
+        for key, seconds in zip(keys.tolist(), totals.tolist()):
+            self.daily[key] = self.daily.get(key, 0) + seconds
+        months, totals = table.monthly_totals()
+        keys = np.datetime_as_string(months.astype("datetime64[M]"))
+        for key, seconds in zip(keys.tolist(), totals.tolist()):
+            self.monthly[key] = self.monthly.get(key, 0) + seconds
+        heatmap = np.asarray(self.heatmap) + table.hour_heatmap().ravel()
+        self.heatmap = heatmap.tolist()
+        names, days, totals = table.tag_daily_totals()
+        keys = np.datetime_as_string(days.astype("datetime64[D]"))
+        for name, key, seconds in zip(names, keys.tolist(), totals.tolist()):
+            daily = self.tag_daily.setdefault(name, {})
+            daily[key] = daily.get(key, 0) + seconds
+
+    def monthly_totals(self):
+        # {(年, 月): 秒}
+        totals = {}
+        for key, seconds in self.monthly.items():
+            year, month = key.split("-")
+            totals[(int(year), int(month))] = seconds
+        return totals
+
+    def daily_totals(self, first_day, n_days):
+        # first_day から n_days 日分の {日付: 秒} (データがない日は0)
+        days = [first_day + timedelta(days=i) for i in range(n_days)]
+        return {day: self.daily.get(day.isoformat(), 0) for day in days}
+
+    def hour_heatmap(self):
+        return np.array(self.heatmap).reshape(7, 24)
+
+    def daily_series(self):
+        # (1970-01-01 からの日数, 合計秒) を日付順の配列で返す
+        return _series(self.daily)
+
+    def tags(self):
+        return list(self.tag_daily)
+
+    def tag_series(self):
+        # {タグ: (日数, 合計秒)}
+        return {name: _series(daily) for name, daily in self.tag_daily.items()}
+
+    def tag_monthly_totals(self):
+        # {タグ: {(年, 月): 秒}}
+        result = {}
+        for name, daily in self.tag_daily.items():
+            totals = result[name] = {}
+            for key, seconds in daily.items():
+                month = (int(key[:4]), int(key[5:7]))
+                totals[month] = totals.get(month, 0) + seconds
+        return result
+
+    def to_dict(self):
+        return {
+            "version": CACHE_VERSION,
+            "offset": self.offset,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "head": self.head,
+            "tail": self.tail,
+            "daily": self.daily,
+            "monthly": self.monthly,
+            "heatmap": self.heatmap,
+            "tag_daily": self.tag_daily,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != CACHE_VERSION:
+            raise ValueError("unsupported rollup cache version")
+        rollup = cls()
+        rollup.offset = int(data["offset"])
+        rollup.size = int(data["size"])
+        rollup.mtime_ns = int(data["mtime_ns"])
+        rollup.head = data["head"]
+        rollup.tail = data["tail"]
+        rollup.daily = {k: int(v) for k, v in data["daily"].items()}
+        rollup.monthly = {k: int(v) for k, v in data["monthly"].items()}
+        rollup.heatmap = [float(v) for v in data["heatmap"]]
+        if len(rollup.heatmap) != 7 * 24:
+            raise ValueError("malformed rollup heatmap")
+        rollup.tag_daily = {
+            name: {k: int(v) for k, v in daily.items()}
+            for name, daily in data["tag_daily"].items()
+        }
+        return rollup
+
+
+def _series(daily):
+    keys = sorted(daily)
+    days = np.array(keys, dtype="datetime64[D]").astype(np.int64)
+    totals = np.array([daily[key] for key in keys], dtype=np.int64)
+    return days, totals
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def fingerprint(file, offset, start=0):
+    # start から offset までの先頭と末尾のハッシュ
+    # (集計済みの部分が書き換えられたかの確認に使う)
+    file.seek(start)
+    head = _digest(file.read(min(HEAD_BYTES, offset - start)))
+    first = max(start, offset - TAIL_BYTES)
+    file.seek(first)
+    tail = _digest(file.read(offset - first))
+    return head, tail
+
+
+def is_valid(rollup, file, stat, start=0):
+    # rollup (offset, size, mtime_ns, head, tail を持つもの。月の索引やマージの状態にも
+    # 使う) を記録した後に、file の切り詰め・書き換えが起きていないかを確認する
+    if stat.st_size < rollup.offset:
+        return False
+    if stat.st_size == rollup.size and stat.st_mtime_ns != rollup.mtime_ns:
+        return False
+    return fingerprint(file, rollup.offset, start) == (rollup.head, rollup.tail)
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as file:
+            return SessionRollup.from_dict(json.load(file))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def write_json(path, obj):
+    # 同じディレクトリの一時ファイルに書いてから置き換える。一時ファイルの名前は
+    # 書き込みごとに変えるので、同時に書いても互いの書きかけを置き換えない
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(obj, file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_cache(cache_path, rollup):
+    try:
+        write_json(cache_path, rollup.to_dict())
+    except OSError:
+        # キャッシュは最適化なので保存できなくても集計は続ける
+        pass
+
+
+def load_rollup(csv_path=SESSIONS_CSV, cache_path=None, chunk_bytes=CHUNK_BYTES):
+    if cache_path is None:
+        cache_path = cache_path_for(csv_path)
+
+    with open(csv_path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        rollup = _read_cache(cache_path)
+        if rollup is None or not is_valid(rollup, file, stat):
+            rollup = SessionRollup()
+        elif stat.st_size == rollup.size and stat.st_mtime_ns == rollup.mtime_ns:
+            return rollup
+
+        # 前回のチェックポイント以降に追記された行だけを、chunk_bytes ずつ集計する
+        # 書き込み途中の最終行は次回に回す
+        start = time.perf_counter()
+        rows = 0
+        tables = iter_sessions(csv_path, rollup.offset, chunk_bytes, stat.st_size)
+        for table, offset in tables:
+            rollup.add_table(table)
+            rollup.offset = offset
+            rows += len(table)
+        if rows:
+            elapsed = time.perf_counter() - start
+            recorder.record("parse_ms", elapsed * 1000)
+            recorder.record("parse_rows_per_sec", rows / max(elapsed, 1e-9))
+        rollup.size = stat.st_size
+        rollup.mtime_ns = stat.st_mtime_ns
+        rollup.head, rollup.tail = fingerprint(file, rollup.offset)
+
+    _write_cache(cache_path, rollup)
+    return rollup
+
+
+def load_binary_rollup(binary_path, cache_path=None):
+    # binary_store.py の形式の集計。load_rollup と同じく、前回集計したレコードの末尾
+    # (offset) 以降に追記されたレコードだけを加える
+    # ヘッダーはレコード数が増えるたびに書き換わるので、書き換えの確認から除く
+    from binary_store import HEADER, RECORD_DTYPE, BinaryStore
+
+    if cache_path is None:
+        cache_path = binary_cache_path_for(binary_path)
+
+    with open(binary_path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        rollup = _read_cache(cache_path)
+        if (
+            rollup is None
+            or rollup.offset < HEADER.size
+            or not is_valid(rollup, file, stat, HEADER.size)
+        ):
+            rollup = SessionRollup()
+            rollup.offset = HEADER.size
+        elif stat.st_size == rollup.size and stat.st_mtime_ns == rollup.mtime_ns:
+            return rollup
+
+        start = time.perf_counter()
+        first = (rollup.offset - HEADER.size) // RECORD_DTYPE.itemsize
+        table = BinaryStore(binary_path).load_table(first)
+        if len(table):
+            rollup.add_table(table)
+            rollup.offset += len(table) * RECORD_DTYPE.itemsize
+            recorder.record("parse_ms", (time.perf_counter() - start) * 1000)
+        rollup.size = stat.st_size
+        rollup.mtime_ns = stat.st_mtime_ns
+        rollup.head, rollup.tail = fingerprint(file, rollup.offset, HEADER.size)
+
+    _write_cache(cache_path, rollup)
+    return rollup
@@ -0,0 +1,176 @@
+# 古いセッションを1日1行の合計にまとめてログを小さくする
+#   python session_compact.py [CSV] [--days 365]
+# まとめた行は日付と合計時間の2列 (古い形式の行と同じ) なので、
+# 月別・日別の集計はそのまま読める。時刻がなくなるため時間帯の集計には含まれない
+# タグのある行はタグごとにまとめ、時刻の列を空にしてタグを残す
+# ログから作った複製 (バイナリ形式・SQLite に取り込んだ行・マージしたログ) も合わせて更新する
+# KeepTimer を終了してから実行する
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+from day_index import EPOCH, epoch_day
+from session_log import SESSIONS_CSV, SESSIONS_DB, SESSIONS_MERGED, format_duration
+from session_table import CHUNK_BYTES, UNTAGGED, iter_sessions
+from file_lock import FileLock, lock_path_for
+from session_writer import journal_paths
+
+COMPACT_DAYS = 365  # これより前の日のセッションをまとめる
+
+
+def _old_totals(csv_path, cutoff, chunk_bytes):
+    # cutoff (1970-01-01 からの日数) より前の {(日, タグ): 合計} と、
+    # 読み込んだ行数、完全な行の末尾の位置
+    totals = {}
+    rows = end = 0
+    for table, end in iter_sessions(csv_path, 0, chunk_bytes):
+        rows += len(table)
+        old = table.take(table.days < cutoff)
+        days, seconds = old.take(old.tags == UNTAGGED).daily_totals()
+        tags = [""] * len(days)
+        names, tag_days, tag_seconds = old.tag_daily_totals()
+        for tag, day, total in zip(
+            tags + names,
+            days.tolist() + tag_days.tolist(),
+            seconds.tolist() + tag_seconds.tolist(),
+        ):
+            totals[day, tag] = totals.get((day, tag), 0) + total
+    return totals, rows, end
+
+
+def _load_seconds(csv_path, chunk_bytes):
+    start = time.perf_counter()
+    for _ in iter_sessions(csv_path, 0, chunk_bytes):
+        pass
+    return time.perf_counter() - start
+
+
+def compact(
+    csv_path=SESSIONS_CSV,
+    keep_days=COMPACT_DAYS,
+    today=None,
+    chunk_bytes=CHUNK_BYTES,
+    binary_path=None,
+    db_path=SESSIONS_DB,
+    merged_path=SESSIONS_MERGED,
+):
+    # today から keep_days 日より前の行を日ごとの合計の行に置き換える
+    # 一時ファイルに書いてから置き換えるので、途中で落ちても元のログは残る
+    from binary_store import binary_path_for
+
+    if journal_paths(csv_path):
+        raise RuntimeError("KeepTimer is running or has unsaved sessions")
+    if binary_path is None:
+        binary_path = binary_path_for(csv_path)
+    with FileLock(lock_path_for(csv_path)):
+        database = _open_import(db_path, csv_path)
+        try:
+            result = _compact(csv_path, keep_days, today, chunk_bytes)
+            if database is not None:
+                # SQLite にはまとめる前の行が残っているので、取り込み済みの位置だけ移す
+                database.mark_imported(csv_path, result["end"])
+        finally:
+            if database is not None:
+                database.close()
+        sync_binary(csv_path, binary_path)
+        reset_merge(merged_path)
+    return result
+
+
+def _open_import(db_path, csv_path):
+    # csv_path を取り込んだ SQLite があれば、まとめる前に残りの行を取り込んでおく
+    from session_storage import SqliteStorage
+
+    if not os.path.exists(db_path):
+        return None
+    database = SqliteStorage(db_path)
+    if database.imported_offset(csv_path) is None:
+        database.close()
+        return None
+    database.import_csv(csv_path)
+    return database
+
+
+def _compact(csv_path, keep_days, today, chunk_bytes):
+    cutoff = epoch_day(today or date.today()) - keep_days
+    size = os.path.getsize(csv_path)
+    load_before = _load_seconds(csv_path, chunk_bytes)
+    totals, rows, end = _old_totals(csv_path, cutoff, chunk_bytes)
+
+    cutoff_date = (EPOCH + timedelta(days=cutoff)).isoformat()
+    temp_path = csv_path + ".tmp"
+    kept = pos = written = 0
+    with open(csv_path, "rb") as source, open(temp_path, "wb") as target:
+        for day, tag in sorted(totals):
+            end_date = (EPOCH + timedelta(days=day)).isoformat()
+            line = f"{end_date},{format_duration(totals[day, tag])}"
+            if tag:
+                line += f",,,,{tag}"
+            written += target.write(f"{line}\r\n".encode("utf-8"))
+        # 新しい行は元の行のまま残す (日付は ISO 形式なので文字列で比較できる)
+        for line in source:
+            pos += len(line)
+            if pos > end:
+                # 書き込み途中の最終行はそのまま残す
+                target.write(line)
+            elif line.strip() and line[:10].decode("ascii") >= cutoff_date:
+                written += target.write(line)
+                kept += 1
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(temp_path, csv_path)
+
+    return {
+        "rows": (rows, len(totals) + kept),
+        "bytes": (size, os.path.getsize(csv_path)),
+        "load_seconds": (load_before, _load_seconds(csv_path, chunk_bytes)),
+        "end": written,  # 完全な行の末尾
+    }
+
+
+def sync_binary(csv_path, binary_path):
+    # バイナリ形式の複製は行の位置で追記を管理しているので作り直す
+    from binary_store import BinaryStore
+
+    store = BinaryStore(binary_path)
+    if store.exists():
+        store.create()
+        store.sync(csv_path)
+
+
+def reset_merge(merged_path):
+    # マージしたログは前回の位置から追記するので、次のマージで最初から作り直させる
+    from session_merge import state_path_for
+
+    try:
+        os.remove(state_path_for(merged_path))
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KeepTimer log compaction")
+    parser.add_argument("csv", nargs="?", default=SESSIONS_CSV)
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=COMPACT_DAYS,
+        help="この日数より前のセッションを1日1行にまとめる",
+    )
+    args = parser.parse_args()
+
+    result = compact(args.csv, args.days)
+    rows_before, rows_after = result["rows"]
+    size_before, size_after = result["bytes"]
+    load_before, load_after = result["load_seconds"]
+    print(f"rows: {rows_before} -> {rows_after}")
+    print(
+        f"size: {size_before / 1e6:.2f} MB -> {size_after / 1e6:.2f} MB "
+        f"({1 - size_after / max(size_before, 1):.0%} smaller)"
+    )
+    print(f"load: {load_before:.3f} s -> {load_after:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# 1か月分のセッションの一覧 (Analysis で月の行をダブルクリックすると開く)
+# 見えている行数分の項目だけを作っておき、スクロールしたら項目の値を入れ替える
+# 行は pages (storage.session_pages()) からページ単位で読み、最近使ったページだけを残す
+import tkinter as tk
+from collections import OrderedDict
+from datetime import timedelta
+from tkinter import ttk
+
+COLUMNS = ("date", "start", "end", "duration", "tag")
+VISIBLE_ROWS = 20
+PAGE_ROWS = 200
+CACHED_PAGES = 8
+WHEEL_ROWS = 3  # マウスホイール1段でスクロールする行数
+
+
+def _clock(time):
+    return "" if time is None else time.strftime("%H:%M")
+
+
+def format_row(row, untagged=""):
+    day, start, end, seconds, tag = row
+    duration = str(timedelta(seconds=seconds))
+    return (day.isoformat(), _clock(start), _clock(end), duration, tag or untagged)
+
+
+class SessionList:
+    # headings: COLUMNS の順の見出し。作業時間の見出しをクリックすると、
+    # ログの順と作業時間の長い順を切り替える
+    def __init__(self, parent, pages, headings, untagged="", rows=VISIBLE_ROWS):
+        self.pages = pages
+        self.headings = headings
+        self.untagged = untagged
+        self.key = None  # 表示している (年, 月)
+        self.total = 0
+        self.top = 0  # 先頭の項目に表示している行の番号
+        self.order = "time"
+        self.cache = OrderedDict()  # ページ番号 -> 行
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(
+            self.frame, columns=COLUMNS, show="headings", height=rows
+        )
+        for column, text in zip(COLUMNS, headings):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=90)
+        self.tree.heading("duration", command=self.toggle_order)
+        self.scrollbar = ttk.Scrollbar(
+            self.frame, orient=tk.VERTICAL, command=self.scroll
+        )
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.items = [self.tree.insert("", "end") for _ in range(rows)]
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self.on_wheel)
+        self.tree.bind("<Prior>", lambda event: self.scroll("scroll", -1, "pages"))
+        self.tree.bind("<Next>", lambda event: self.scroll("scroll", 1, "pages"))
+
+    def show(self, key):
+        # 追記された行を読み込んでから、key の月を先頭から表示する
+        self.pages.refresh()
+        self.key = key
+        self.total = self.pages.count(key)
+        self.move(0, reload=True)
+
+    def toggle_order(self):
+        self.order = "duration" if self.order == "time" else "time"
+        text = self.headings[COLUMNS.index("duration")]
+        if self.order == "duration":
+            text += " ▼"
+        self.tree.heading("duration", text=text)
+        if self.key is not None:
+            self.move(0, reload=True)
+
+    def _page(self, number):
+        rows = self.cache.get(number)
+        if rows is None:
+            first = number * PAGE_ROWS
+            rows = self.pages.page(self.key, first, PAGE_ROWS, self.order)
+            self.cache[number] = rows
+            if len(self.cache) > CACHED_PAGES:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(number)
+        return rows
+
+    def rows(self, first, n):
+        # first 行目から n 行分 (必要なページだけを読む)
+        last = min(first + n, self.total)
+        if last <= first:
+            return []
+        rows = []
+        for number in range(first // PAGE_ROWS, (last - 1) // PAGE_ROWS + 1):
+            rows += self._page(number)
+        skip = first - first // PAGE_ROWS * PAGE_ROWS
+        return rows[skip : skip + last - first]
+
+    def move(self, top, reload=False):
+        top = max(0, min(top, self.total - len(self.items)))
+        if reload:
+            self.cache.clear()
+        elif top == self.top:
+            return
+        self.top = top
+        self.render()
+
+    def render(self):
+        rows = self.rows(self.top, len(self.items))
+        blank = ("",) * len(COLUMNS)
+        for i, item in enumerate(self.items):
+            values = format_row(rows[i], self.untagged) if i < len(rows) else blank
+            self.tree.item(item, values=values)
+        # 選択は項目ではなく行に付いていたものなので、スクロールしたら外す
+        self.tree.selection_remove(self.tree.selection())
+        if self.total:
+            first = self.top / self.total
+            last = min(1.0, (self.top + len(self.items)) / self.total)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def scroll(self, *args):
+        # Scrollbar の command ("moveto", 位置) / ("scroll", 量, "units" か "pages")
+        if args[0] == "moveto":
+            self.move(round(float(args[1]) * self.total))
+            return
+        count, what = int(args[1]), args[2]
+        step = len(self.items) if what == "pages" else 1
+        self.move(self.top + count * step)
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.move(self.top - WHEEL_ROWS)
+        else:
+            self.move(self.top + WHEEL_ROWS)
+        return "break"
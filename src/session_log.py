@@ -0,0 +1,59 @@
+import re
+from datetime import timedelta
+
+SESSIONS_CSV = "pomodoro_sessions.csv"
+SESSIONS_BIN = "pomodoro_sessions.bin"  # binary_store.py migrate で作成する
+SESSIONS_DB = "pomodoro_sessions.db"  # SQLite を使う場合の保存先
+# parquet_store.py sync で作成するディレクトリ (年/月ごとに分割)
+SESSIONS_PARQUET = "pomodoro_sessions.parquet"
+# 他のPCのログと合わせて集計する場合に、session_merge.py でマージしたログ
+SESSIONS_MERGED = "pomodoro_sessions.merged.csv"
+
+
+_DAYS = re.compile(r"(-?\d+) days?,? ")
+
+
+def parse_duration(text):
+    # str(timedelta) の形式 ("1:30:00", "1 day, 0:00:00") を秒数に変換
+    # (カンマを除いた "1 day 0:00:00" も受け付ける)
+    days = 0
+    match = _DAYS.match(text)
+    if match:
+        days = int(match.group(1))
+        text = text[match.end() :]
+    hours, minutes, seconds = text.strip().split(":")
+    return days * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(float(seconds))
+
+
+def format_duration(seconds):
+    # parse_duration の逆。"1 day, 0:00:00" はカンマを含むので csv.writer と同じく
+    # 引用符で囲む
+    text = str(timedelta(seconds=seconds))
+    return f'"{text}"' if "," in text else text
+
+
+def format_offset(seconds):
+    # UTCからの時差 (秒) を "+0900" の形式にする
+    sign = "-" if seconds < 0 else "+"
+    hours, minutes = divmod(abs(seconds) // 60, 60)
+    return f"{sign}{hours:02d}{minutes:02d}"
+
+
+def clean_tag(text):
+    # CSVの1列に収まるように、カンマ・引用符・改行を除き空白を詰める
+    text = text.replace(",", " ").replace('"', " ")
+    return " ".join(text.split())
+
+
+def session_times(end_time, seconds, start_time=None):
+    # (終了日, 開始時刻, 終了時刻 (UNIX時間), UTCからの時差 (秒)) を返す
+    # タイムゾーンのない datetime は現地時刻とみなす。開始時刻がなければ作業時間から求める
+    if end_time.tzinfo is None:
+        end_time = end_time.astimezone()
+    if start_time is None:
+        start = end_time.timestamp() - seconds
+    else:
+        start = start_time.timestamp()
+    offset = int(end_time.utcoffset().total_seconds())
+    return end_time.date(), int(start), int(end_time.timestamp()), offset
+
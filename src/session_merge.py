@@ -0,0 +1,307 @@
+# 複数のPCのセッションログを1つにまとめて集計する
+#   python session_merge.py desktop.csv laptop.csv [-o merged.csv]
+# 各ログを少しずつ読みながら日付順に k-way マージするので、メモリはログの長さによらない
+# (同じ日の行だけを保持する)。重複の除き方:
+# - 時刻のある行は (終了時刻, 作業時間, タグ) が同じなら同じセッションとみなし、
+#   同期などで複数のログ (同じログでも) に含まれていても1行だけを残す
+# - 時刻のない行 (古い形式の行と session_compact.py でまとめた行) は、同じ内容でも
+#   別の作業か同期された重複かを見分けられないので、すべてのログの分を足し合わせる
+# -o を指定すると、前回のマージ以降に追記された行だけを merged.csv に追記する
+# ログは時刻順に追記されるものとする (日付の戻った行は、同じ日の行との重複を除けない)
+import argparse
+import heapq
+import json
+import os
+from itertools import groupby
+from types import SimpleNamespace
+
+from rollup_cache import SessionRollup, fingerprint, is_valid, write_json
+from session_log import SESSIONS_MERGED
+from session_table import CHUNK_BYTES, last_line_end, parse_sessions
+
+MERGE_VERSION = 1
+DATE_BYTES = len(b"YYYY-MM-DD")
+
+
+def state_path_for(output_path):
+    root, _ = os.path.splitext(output_path)
+    return root + ".merge.json"
+
+
+def _first_line(file, pos, end):
+    # pos 以降で最初に始まる行の (位置, 行)。end までに行がなければ (end, b"")
+    if pos:
+        file.seek(pos - 1)
+        file.readline()
+    else:
+        file.seek(0)
+    start = file.tell()
+    if start >= end:
+        return end, b""
+    return start, file.readline()
+
+
+def _date_position(file, day, end):
+    # end より前で、日付が day 以降の最初の行の位置 (行が日付順なので二分探索する)
+    low, high = 0, end
+    while low < high:
+        mid = (low + high) // 2
+        _, line = _first_line(file, mid, end)
+        if not line or line[:DATE_BYTES] >= day:
+            high = mid
+        else:
+            low = mid + 1
+    return _first_line(file, low, end)[0]
+
+
+def _lines(file, start, end, chunk_bytes):
+    # start から end (行の末尾) までの空でない行 (改行を除く)
+    file.seek(start)
+    rest = b""
+    while start < end:
+        block = file.read(min(chunk_bytes, end - start))
+        if not block:
+            break
+        start += len(block)
+        lines = (rest + block).split(b"\n")
+        rest = lines.pop()
+        if len(rest) > chunk_bytes:
+            raise ValueError("session row exceeds chunk size")
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if line:
+                yield line
+
+
+def _line_day(line):
+    return line[:DATE_BYTES]
+
+
+def _source_days(path, source, start, offset, end, chunk_bytes):
+    # (日付, 新しい行か, ログの番号, その日の行)。offset より前の行はマージ済み
+    # マージは行ごとではなく、ログごとの1日分の行をまとめて行う
+    with open(path, "rb") as file:
+        for is_new, first, last in ((False, start, offset), (True, offset, end)):
+            lines = _lines(file, first, last, chunk_bytes)
+            for day, rows in groupby(lines, key=_line_day):
+                yield day, is_new, source, list(rows)
+
+
+def _identity(line):
+    # 時刻のある行は (終了時刻, 作業時間, タグ)。時刻のない行は None
+    if b'"' in line:
+        # "1 day, 0:00:00" のように引用符で囲まれた作業時間
+        _, duration, rest = line.split(b'"', 2)
+        times = rest.split(b",")[1:]
+    else:
+        _, duration, *times = line.split(b",")
+    if len(times) < 3 or not times[1]:
+        return None
+    tag = times[3] if len(times) > 3 else b""
+    return times[1], duration, tag
+
+
+def _merge_day(groups):
+    # 同じ日の行から、新しく出力する行を返す
+    # マージ済みの行にあるセッションは除き、時刻のない行はそのまま加える
+    groups = list(groups)
+    seen = {
+        _identity(row)
+        for _, is_new, _, rows in groups
+        if not is_new
+        for row in rows
+    }
+    for _, is_new, _, rows in groups:
+        if not is_new:
+            continue
+        for row in rows:
+            identity = _identity(row)
+            if identity is None:
+                yield row
+            elif identity not in seen:
+                seen.add(identity)
+                yield row
+
+
+class LogMerge:
+    # paths のログの offsets (マージ済みの位置) 以降の行を日付順にマージする
+    # 読む範囲は作成した時点の完全な行まで (書き込み途中の最終行は次回に回す)
+    def __init__(self, paths, offsets=None, chunk_bytes=CHUNK_BYTES):
+        self.paths = list(paths)
+        self.offsets = list(offsets or [0] * len(self.paths))
+        self.chunk_bytes = chunk_bytes
+        self.stats = []  # 読み始めた時点の os.stat の結果
+        self.ends = []  # 完全な行の末尾
+        self.starts = []  # 重複を数えるために読み始める位置
+        days = []
+        for path, offset in zip(self.paths, self.offsets):
+            with open(path, "rb") as file:
+                self.stats.append(os.fstat(file.fileno()))
+                end = last_line_end(file, chunk_bytes)
+                self.ends.append(end)
+                _, line = _first_line(file, offset, end)
+                if line:
+                    days.append(line[:DATE_BYTES])
+        # 追記された行の最も古い日以降は、マージ済みの行も読んで重複を数える
+        self.first_day = min(days) if days else None
+        for path, offset in zip(self.paths, self.offsets):
+            if self.first_day is None or not offset:
+                self.starts.append(offset)
+                continue
+            with open(path, "rb") as file:
+                self.starts.append(_date_position(file, self.first_day, offset))
+
+    def lines(self):
+        # 重複を除いた新しい行 (改行なしのバイト列) を日付順に返す
+        if self.first_day is None:
+            return
+        sources = [
+            _source_days(path, i, start, offset, end, self.chunk_bytes)
+            for i, (path, start, offset, end) in enumerate(
+                zip(self.paths, self.starts, self.offsets, self.ends)
+            )
+        ]
+        merged = heapq.merge(*sources, key=lambda group: group[0])
+        for _, groups in groupby(merged, key=lambda group: group[0]):
+            yield from _merge_day(groups)
+
+    def marks(self):
+        # 次回のマージで使う、ログごとの読み終えた位置と書き換え検出用の値
+        marks = []
+        for path, stat, end in zip(self.paths, self.stats, self.ends):
+            with open(path, "rb") as file:
+                head, tail = fingerprint(file, end)
+            marks.append(_mark(os.path.abspath(path), end, stat, head, tail))
+        return marks
+
+
+def _mark(path, offset, stat, head, tail):
+    return {
+        "path": path,
+        "offset": offset,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "head": head,
+        "tail": tail,
+    }
+
+
+def _batches(lines, chunk_bytes):
+    # 行を chunk_bytes 程度ずつのバイト列 (CRLF 区切り) にまとめる
+    batch, size = [], 0
+    for line in lines:
+        batch.append(line)
+        size += len(line) + 2
+        if size >= chunk_bytes:
+            yield b"\r\n".join(batch) + b"\r\n"
+            batch, size = [], 0
+    if batch:
+        yield b"\r\n".join(batch) + b"\r\n"
+
+
+def merged_rollup(paths, chunk_bytes=CHUNK_BYTES):
+    # paths のログをマージした結果を、ファイルに書かずにそのまま集計する
+    rollup = SessionRollup()
+    lines = LogMerge(paths, chunk_bytes=chunk_bytes).lines()
+    for data in _batches(lines, chunk_bytes):
+        rollup.add_table(parse_sessions(data.decode("utf-8")))
+    return rollup
+
+
+def _read_state(state_path):
+    try:
+        with open(state_path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != MERGE_VERSION:
+        return None
+    return state
+
+
+def _is_unchanged(path, mark):
+    # mark を記録した後に、path が切り詰め・書き換えられていないか
+    try:
+        with open(path, "rb") as file:
+            return is_valid(SimpleNamespace(**mark), file, os.fstat(file.fileno()))
+    except (OSError, TypeError):
+        return False
+
+
+def _resume(state, paths, output_path):
+    # 前回の (出力を書き終えた位置, ログごとのマージ済みの位置)。ログの組み合わせが
+    # 変わったか、いずれかのログや出力が書き換えられていれば None (最初からやり直す)
+    if state is None:
+        return None
+    output, marks = state.get("output"), state.get("sources")
+    keys = [os.path.abspath(path) for path in paths]
+    if output is None or [mark.get("path") for mark in marks or []] != keys:
+        return None
+    if not _is_unchanged(output_path, output):
+        return None
+    if not all(_is_unchanged(path, mark) for path, mark in zip(paths, marks)):
+        return None
+    return output["offset"], [mark["offset"] for mark in marks]
+
+
+def update_merged(
+    paths, output_path=SESSIONS_MERGED, state_path=None, chunk_bytes=CHUNK_BYTES
+):
+    # paths のログの前回からの追記分を output_path に追記し、追記した行数を返す
+    # 出力は追記だけなので、rollup_cache などの出力の集計も追記分だけで済む
+    if state_path is None:
+        state_path = state_path_for(output_path)
+    resume = _resume(_read_state(state_path), paths, output_path)
+    if resume is None:
+        merge = LogMerge(paths, chunk_bytes=chunk_bytes)
+        output = open(output_path, "wb")
+    else:
+        written, offsets = resume
+        merge = LogMerge(paths, offsets, chunk_bytes)
+        # 前回書き終えた位置から書く (その後の書きかけの行は捨てる)
+        output = open(output_path, "r+b")
+        output.seek(written)
+        output.truncate()
+    added = 0
+    with output:
+        for data in _batches(merge.lines(), chunk_bytes):
+            output.write(data)
+            added += data.count(b"\n")
+        output.flush()
+        end = output.tell()
+    with open(output_path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        head, tail = fingerprint(file, end)
+    state = {
+        "version": MERGE_VERSION,
+        "output": _mark(os.path.abspath(output_path), end, stat, head, tail),
+        "sources": merge.marks(),
+    }
+    write_json(state_path, state)
+    return added
+
+
+def main():
+    from datetime import timedelta
+
+    parser = argparse.ArgumentParser(description="KeepTimer log merge")
+    parser.add_argument("logs", nargs="+", help="まとめるセッションログ (CSV)")
+    parser.add_argument(
+        "-o", "--output", help="マージしたログの保存先 (前回からの追記分だけを書く)"
+    )
+    args = parser.parse_args()
+
+    if args.output:
+        from rollup_cache import load_rollup
+
+        added = update_merged(args.logs, args.output)
+        print(f"{added} sessions appended to {args.output}")
+        rollup = load_rollup(args.output)
+    else:
+        rollup = merged_rollup(args.logs)
+    for (year, month), seconds in sorted(rollup.monthly_totals().items()):
+        print(f"{year}-{month:02d}  {timedelta(seconds=seconds)}")
+
+
+if __name__ == "__main__":
+    main()
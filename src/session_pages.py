@@ -0,0 +1,255 @@
+# 月ごとのセッションをページ単位で読み込む (Analysis の月別の一覧で使う)
+# CSVの行を、同じ月が続く最大 BLOCK_ROWS 行ずつのブロックにまとめてバイト位置を
+# <csv>.months.json に保存しておく。ある月の n 行目へはブロックを1つ読むだけで移動できる
+#   pages = CsvSessionPages(csv_path); pages.refresh()
+#   pages.count((2025, 1)); pages.page((2025, 1), 200, 100, order="duration")
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from rollup_cache import fingerprint, is_valid, write_json
+from session_log import SESSIONS_CSV
+from session_table import CHUNK_BYTES, UNKNOWN, SessionTable, parse_sessions
+
+INDEX_VERSION = 1
+BLOCK_ROWS = 256  # 1つのブロックの最大の行数 (ページを読むときに余分に解析する量)
+ORDERS = ("time", "duration")  # ログの順 (終了時刻順) / 作業時間の長い順
+EPOCH = date(1970, 1, 1)
+_EMPTY = (np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(1, np.int64))
+
+
+def index_path_for(csv_path):
+    root, _ = os.path.splitext(csv_path)
+    return root + ".months.json"
+
+
+def month_number(key):
+    # (年, 月) -> 1970-01 からの月数
+    year, month = key
+    return (year - 1970) * 12 + month - 1
+
+
+def session_row(day, start, end, tz, seconds, tag):
+    # 一覧の1行: (日付, 開始時刻, 終了時刻, 作業秒数, タグ)
+    # 時刻は記録した時点の時差のついた datetime (古い形式の行は None)
+    day = EPOCH + timedelta(days=day)
+    if start is None or start == UNKNOWN:
+        return (day, None, None, seconds, tag)
+    zone = timezone(timedelta(seconds=tz))
+    start = datetime.fromtimestamp(start, zone)
+    return (day, start, datetime.fromtimestamp(end, zone), seconds, tag)
+
+
+def table_rows(table):
+    tags = np.array(table.tag_names, dtype=object)[table.tags].tolist()
+    columns = [
+        column.tolist()
+        for column in (table.days, table.start, table.end, table.tz, table.seconds)
+    ]
+    return [session_row(*values) for values in zip(*columns, tags)]
+
+
+def _line_months(data):
+    # data (完全な行だけのバイト列) の各行の (開始位置, 終了位置, 1970-01 からの月数)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(raw == ord("\n")) + 1
+    starts = np.concatenate(([0], ends[:-1]))
+    # 空行は除く (行は必ず "YYYY-MM-DD" で始まる)
+    keep = ends - starts > len("YYYY-MM")
+    starts, ends = starts[keep], ends[keep]
+    digits = raw[starts[:, None] + np.array([0, 1, 2, 3, 5, 6])].astype(np.int64)
+    digits -= ord("0")
+    year = digits[:, :4] @ np.array([1000, 100, 10, 1])
+    month = digits[:, 4] * 10 + digits[:, 5]
+    return starts, ends, (year - 1970) * 12 + month - 1
+
+
+def _blocks(starts, ends, months, base):
+    # 同じ月が続く行を BLOCK_ROWS 行ずつのブロックにまとめる
+    # [月, 開始位置, 終了位置, 行数] のリスト (base はファイル内での data の位置)
+    n = len(months)
+    if not n:
+        return []
+    rows = np.arange(n)
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = months[1:] != months[:-1]
+    run_start = np.maximum.accumulate(np.where(new_run, rows, 0))
+    heads = np.flatnonzero(new_run | ((rows - run_start) % BLOCK_ROWS == 0))
+    tails = np.append(heads[1:], n) - 1
+    return [
+        list(block)
+        for block in zip(
+            months[heads].tolist(),
+            (starts[heads] + base).tolist(),
+            (ends[tails] + base).tolist(),
+            (tails - heads + 1).tolist(),
+        )
+    ]
+
+
+class MonthIndex:
+    # CSVのどこまでを索引に含めたかと、ファイル順のブロックを保持する
+    def __init__(self):
+        self.offset = 0
+        self.size = 0
+        self.mtime_ns = 0
+        self.head = ""
+        self.tail = ""
+        self.blocks = []  # [月, 開始位置, 終了位置, 行数]
+
+    def add_blocks(self, blocks):
+        for block in blocks:
+            last = self.blocks[-1] if self.blocks else None
+            # 前回の読み込みの続きで同じ月なら、埋まっていないブロックに足す
+            if (
+                last is not None
+                and last[0] == block[0]
+                and last[2] == block[1]
+                and last[3] + block[3] <= BLOCK_ROWS
+            ):
+                last[2] = block[2]
+                last[3] += block[3]
+            else:
+                self.blocks.append(block)
+
+    def by_month(self):
+        # {月: (開始位置, 終了位置, 行数の累積和)} (累積和の先頭は0)
+        grouped = {}
+        for month, start, end, rows in self.blocks:
+            grouped.setdefault(month, []).append((start, end, rows))
+        result = {}
+        for month, blocks in grouped.items():
+            starts, ends, rows = np.array(blocks, dtype=np.int64).T
+            result[month] = (starts, ends, np.concatenate(([0], np.cumsum(rows))))
+        return result
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "offset": self.offset,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "head": self.head,
+            "tail": self.tail,
+            "blocks": self.blocks,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError("unsupported month index version")
+        index = cls()
+        index.offset = int(data["offset"])
+        index.size = int(data["size"])
+        index.mtime_ns = int(data["mtime_ns"])
+        index.head = data["head"]
+        index.tail = data["tail"]
+        index.blocks = [[int(value) for value in block] for block in data["blocks"]]
+        if any(len(block) != 4 for block in index.blocks):
+            raise ValueError("malformed month index block")
+        return index
+
+
+def _read_index(index_path):
+    try:
+        with open(index_path, "r", encoding="utf-8") as file:
+            return MonthIndex.from_dict(json.load(file))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_index(index_path, index):
+    try:
+        write_json(index_path, index.to_dict())
+    except OSError:
+        # 索引は最適化なので保存できなくても読み込みは続ける
+        pass
+
+
+def load_month_index(csv_path=SESSIONS_CSV, index_path=None, chunk_bytes=CHUNK_BYTES):
+    if index_path is None:
+        index_path = index_path_for(csv_path)
+
+    with open(csv_path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        index = _read_index(index_path)
+        if index is None or not is_valid(index, file, stat):
+            index = MonthIndex()
+        elif stat.st_size == index.size and stat.st_mtime_ns == index.mtime_ns:
+            return index
+
+        # 前回の位置以降に追記された行だけを、解析せずに日付の先頭の桁だけ見て索引にする
+        # 書き込み途中の最終行は次回に回す
+        file.seek(index.offset)
+        rest = b""
+        while file.tell() < stat.st_size:
+            data = rest + file.read(min(chunk_bytes, stat.st_size - file.tell()))
+            complete = data.rfind(b"\n") + 1
+            rest = data[complete:]
+            if len(rest) > chunk_bytes:
+                raise ValueError("session row exceeds chunk size")
+            index.add_blocks(_blocks(*_line_months(data[:complete]), index.offset))
+            index.offset += complete
+        index.size = stat.st_size
+        index.mtime_ns = stat.st_mtime_ns
+        index.head, index.tail = fingerprint(file, index.offset)
+
+    _write_index(index_path, index)
+    return index
+
+
+class CsvSessionPages:
+    # 月を (年, 月) で指定し、その月のセッションを行番号の範囲で取り出す
+    def __init__(self, csv_path=SESSIONS_CSV, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self.months = {}
+        self.sorted = None  # (月, 作業時間の長い順に並べた月のテーブル)
+
+    def refresh(self):
+        # 追記された行を索引に加える (一覧を開くたびに呼ぶ)
+        index = load_month_index(self.csv_path, self.index_path)
+        self.months = index.by_month()
+        self.sorted = None
+
+    def count(self, key):
+        return int(self.months.get(month_number(key), _EMPTY)[2][-1])
+
+    def _read(self, file, starts, ends, i):
+        file.seek(starts[i])
+        return parse_sessions(file.read(ends[i] - starts[i]).decode("utf-8"))
+
+    def _by_duration(self, month):
+        if self.sorted is None or self.sorted[0] != month:
+            # 並べ替えには月のすべての行が要るが、読むのはその月のブロックだけ
+            starts, ends, _ = self.months.get(month, _EMPTY)
+            with open(self.csv_path, "rb") as file:
+                tables = [
+                    self._read(file, starts, ends, i) for i in range(len(starts))
+                ]
+            table = SessionTable.concat(tables)
+            order = np.argsort(-table.seconds, kind="stable")
+            self.sorted = (month, table.take(order))
+        return self.sorted[1]
+
+    def page(self, key, first, n, order="time"):
+        # first 行目から n 行分の一覧の行 (session_row の形式)
+        month = month_number(key)
+        if order == "duration":
+            return table_rows(self._by_duration(month).take(slice(first, first + n)))
+        if order != "time":
+            raise ValueError(f"unknown order: {order}")
+        starts, ends, cumulative = self.months.get(month, _EMPTY)
+        # first 行目を含むブロックから読み始める
+        i = int(np.searchsorted(cumulative, first, side="right")) - 1
+        skip = first - int(cumulative[i]) if i >= 0 else 0
+        rows = []
+        with open(self.csv_path, "rb") as file:
+            while len(rows) < n and 0 <= i < len(starts):
+                table = self._read(file, starts, ends, i)
+                rows += table_rows(table.take(slice(skip, skip + n - len(rows))))
+                skip = 0
+                i += 1
+        return rows
@@ -0,0 +1,453 @@
+# record_session と Analysis が使う保存先
+#   "csv":    pomodoro_sessions.csv (従来の形式)
+#   "sqlite": pomodoro_sessions.db (日付インデックス付き)
+#   "merge":  pomodoro_sessions.csv に記録し、他のPCのログと合わせて集計する
+#             (session_merge.py でマージした pomodoro_sessions.merged.csv を使う)
+# 既存のCSVをSQLiteへ取り込む:
+#   python session_storage.py import-csv [CSV] [DB]
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from session_log import (
+    SESSIONS_BIN,
+    SESSIONS_CSV,
+    SESSIONS_DB,
+    SESSIONS_MERGED,
+    format_offset,
+    session_times,
+)
+from session_writer import SessionWriter
+
+EPOCH = date(1970, 1, 1)
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    day INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    start_time INTEGER,
+    end_time INTEGER,
+    tz_offset INTEGER,
+    tag_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_day ON sessions (day, seconds);
+CREATE INDEX IF NOT EXISTS sessions_month ON sessions (month, seconds);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS imports (
+    csv_path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+"""
+# day: 1970-01-01 からの日数, month: 1970-01 からの月数
+# start_time, end_time: UNIX時間, tz_offset: UTCからの時差 (秒)。古い行は NULL
+# tag_id: tags.id (タグのない行は NULL)
+ADDED_COLUMNS = ("start_time", "end_time", "tz_offset", "tag_id")
+# タグの列を追加した後に作る索引 (タグ別の日別・月別の集計を並べ替えなしで行う)
+TAG_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS sessions_tag ON sessions (tag_id, day, seconds)",
+    "CREATE INDEX IF NOT EXISTS sessions_tag_month "
+    "ON sessions (tag_id, month, seconds)",
+)
+INSERT_SQL = (
+    "INSERT INTO sessions "
+    "(day, month, seconds, start_time, end_time, tz_offset, tag_id) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+MONTHLY_SQL = "SELECT month, SUM(seconds) FROM sessions GROUP BY month"
+IMPORTED_SQL = (
+    "INSERT INTO imports (csv_path, offset) VALUES (?, ?) "
+    "ON CONFLICT (csv_path) DO UPDATE SET offset = offset + excluded.offset"
+)
+DAILY_SQL = (
+    "SELECT day, SUM(seconds) FROM sessions WHERE day BETWEEN ? AND ? GROUP BY day"
+)
+SERIES_SQL = "SELECT day, SUM(seconds) FROM sessions GROUP BY day ORDER BY day"
+TIMES_SQL = (
+    "SELECT start_time, end_time, tz_offset, seconds FROM sessions "
+    "WHERE start_time IS NOT NULL"
+)
+# 曜日 (月曜=0) x 時 (現地時刻) ごとの作業時間。cell は 曜日 * 24 + 時
+# 時の境界をまたぐセッションは時ごとに分けて加えるので、行を追加するたびに更新する
+HOURS_TABLE_SQL = """
+CREATE TABLE hour_totals (
+    cell INTEGER PRIMARY KEY,
+    seconds REAL NOT NULL
+)
+"""
+ADD_HOURS_SQL = (
+    "INSERT INTO hour_totals (cell, seconds) VALUES (?, ?) "
+    "ON CONFLICT (cell) DO UPDATE SET seconds = seconds + excluded.seconds"
+)
+HOUR_TOTALS_SQL = "SELECT cell, seconds FROM hour_totals"
+FILL_ROWS = 64 * 1024  # hour_totals を作るときに一度に読む行数
+TAGS_SQL = "SELECT name FROM tags ORDER BY id"
+TAG_SERIES_SQL = (
+    "SELECT name, day, SUM(seconds) FROM sessions JOIN tags ON tags.id = tag_id "
+    "GROUP BY tag_id, day ORDER BY tag_id, day"
+)
+TAG_MONTHLY_SQL = (
+    "SELECT name, month, SUM(seconds) FROM sessions JOIN tags ON tags.id = tag_id "
+    "GROUP BY tag_id, month"
+)
+# 月別の一覧のページ。月と作業時間の索引をそのままたどれる順にする
+PAGE_SQL = (
+    "SELECT day, start_time, end_time, tz_offset, seconds, name FROM sessions "
+    "LEFT JOIN tags ON tags.id = tag_id WHERE month = ? "
+    "ORDER BY {} LIMIT ? OFFSET ?"
+)
+PAGE_ORDERS = {"time": "sessions.id", "duration": "seconds DESC, sessions.id DESC"}
+MONTH_COUNT_SQL = "SELECT COUNT(*) FROM sessions WHERE month = ?"
+
+
+def epoch_day(day):
+    return (day - EPOCH).days
+
+
+def epoch_month(day):
+    return (day.year - 1970) * 12 + day.month - 1
+
+
+def connect(db_path):
+    # 書き込み用の接続。スキーマの作成・更新は SqliteStorage を開くときに一度だけ行う
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA_SQL)
+    # 開始・終了時刻やタグの列がない以前のデータベースには列を追加する
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(sessions)")}
+    with connection:
+        for column in ADDED_COLUMNS:
+            if column not in columns:
+                connection.execute(f"ALTER TABLE sessions ADD COLUMN {column} INTEGER")
+        for sql in TAG_INDEX_SQL:
+            connection.execute(sql)
+    _create_hours(connection)
+    return connection
+
+
+def _create_hours(connection):
+    # hour_totals がなければ、記録済みのセッションから一度だけ作る
+    # (他のプロセスと同時に作らないように、書き込みのロックを取ってから確認する)
+    import numpy as np
+
+    from session_table import hour_heatmap
+
+    with connection:
+        connection.execute("BEGIN IMMEDIATE")
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'hour_totals'"
+        ).fetchone()
+        if exists:
+            return
+        connection.execute(HOURS_TABLE_SQL)
+        heatmap = np.zeros(7 * 24)
+        rows = connection.execute(TIMES_SQL)
+        while chunk := rows.fetchmany(FILL_ROWS):
+            times = np.array(chunk, dtype=np.int64).reshape(-1, 4)
+            heatmap += hour_heatmap(*times.T).ravel()
+        add_hours(connection, heatmap)
+
+
+def add_hours(connection, heatmap):
+    # 7x24 の作業時間 (session_table.hour_heatmap の結果) を hour_totals に加える
+    cells = [(i, s) for i, s in enumerate(heatmap.ravel().tolist()) if s]
+    connection.executemany(ADD_HOURS_SQL, cells)
+
+
+def connect_reader(db_path):
+    # 集計・一覧の読み込み用の接続 (WAL はデータベースに記録されているので設定しない)
+    # 接続ごとに文の準備がキャッシュされるので、同じ接続で問い合わせを続ける
+    return sqlite3.connect(db_path)
+
+
+def tag_id(connection, tag):
+    # タグ名の番号 (初めてのタグは追加する)。タグなしは None
+    if not tag:
+        return None
+    connection.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag,))
+    row = connection.execute("SELECT id FROM tags WHERE name = ?", (tag,)).fetchone()
+    return row[0]
+
+
+class CsvStorage:
+    def __init__(
+        self,
+        csv_path=SESSIONS_CSV,
+        binary_path=SESSIONS_BIN,
+    ):
+        self.csv_path = csv_path
+        self.binary_path = binary_path
+        self.writer = SessionWriter(csv_path, binary_path=binary_path)
+
+    def append(self, end_time, seconds, start_time=None, tag=""):
+        end_date, start, end, offset = session_times(end_time, seconds, start_time)
+        td = timedelta(seconds=seconds)
+        row = [end_date.isoformat(), str(td), start, end, format_offset(offset)]
+        # タグのない行は以前と同じ5列にする
+        self.writer.append(row + [tag] if tag else row)
+
+    def flush(self):
+        return self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+    def stats(self):
+        # 集計は一度だけ行い、月別・日別の統計で共有する
+        from binary_store import BinaryStore
+        from rollup_cache import load_binary_rollup, load_rollup
+
+        self.flush()
+        store = BinaryStore(self.binary_path)
+        # 以前の形式のバイナリは次の書き込みで作り直されるので、それまではCSVを読む
+        if store.exists() and not store.is_outdated():
+            # バイナリ形式があれば、CSVを解析せずに前回から追記されたレコードだけを
+            # 集計に加える (<bin>.rollup.json に集計済みのレコードの位置を保存する)
+            return load_binary_rollup(self.binary_path)
+        return load_rollup(self.csv_path)
+
+    def session_pages(self):
+        # 月別の一覧で使う。flush() した行は、ページを読む前の refresh() で索引に加わる
+        from session_pages import CsvSessionPages
+
+        return CsvSessionPages(self.csv_path)
+
+
+class MergedStorage(CsvStorage):
+    # 記録は自分のCSVに行い、集計と月別の一覧には other_logs (他のPCのログ) と
+    # マージしたログを使う。マージは前回からの追記分だけを行う
+    def __init__(self, other_logs=(), merged_path=SESSIONS_MERGED, **kwargs):
+        super().__init__(**kwargs)
+        self.logs = [self.csv_path, *other_logs]
+        self.merged_path = merged_path
+        # Analysis の集計 (別スレッド) と月別の一覧が同時にマージしないようにする
+        self.merge_lock = threading.Lock()
+
+    def flush(self):
+        # 書き込み待ちの行を書き出し、マージしたログにも加える
+        # (同期中などでまだないログは、見つかった時点で最初からマージし直す)
+        from session_merge import update_merged
+
+        flushed = super().flush()
+        logs = [path for path in self.logs if os.path.exists(path)]
+        with self.merge_lock:
+            update_merged(logs, self.merged_path)
+        return flushed
+
+    def stats(self):
+        from rollup_cache import load_rollup
+
+        self.flush()
+        return load_rollup(self.merged_path)
+
+    def session_pages(self):
+        from session_pages import CsvSessionPages
+
+        return CsvSessionPages(self.merged_path)
+
+
+class SqliteStorage:
+    def __init__(self, db_path=SESSIONS_DB):
+        self.db_path = db_path
+        self.connection = connect(db_path)
+
+    def append(self, end_time, seconds, start_time=None, tag=""):
+        end_date, start, end, offset = session_times(end_time, seconds, start_time)
+        day, month = epoch_day(end_date), epoch_month(end_date)
+        import numpy as np
+
+        from session_table import hour_heatmap
+
+        heatmap = hour_heatmap(*(np.array([v]) for v in (start, end, offset, seconds)))
+        with self.connection:
+            tag = tag_id(self.connection, tag)
+            self.connection.execute(
+                INSERT_SQL, (day, month, seconds, start, end, offset, tag)
+            )
+            add_hours(self.connection, heatmap)
+
+    def flush(self):
+        return True
+
+    def close(self):
+        self.connection.close()
+
+    def stats(self):
+        return SqliteStats(self.db_path)
+
+    def session_pages(self):
+        return SqliteSessionPages(self.db_path)
+
+    def import_csv(self, csv_path):
+        # 前回取り込んだ位置以降の行だけを追加する
+        import numpy as np
+
+        from session_table import UNKNOWN, iter_sessions
+
+        key = os.path.abspath(csv_path)
+        row = self.connection.execute(
+            "SELECT offset FROM imports WHERE csv_path = ?", (key,)
+        ).fetchone()
+        start = end = row[0] if row else 0
+        added = 0
+        # 一度に読み込む量を抑えつつ、全体を1つのトランザクションで取り込む
+        with self.connection:
+            for table, end in iter_sessions(csv_path, start):
+                months = table.days.astype("datetime64[D]").astype("datetime64[M]")
+                months = months.astype(int).tolist()
+                known = table.start != UNKNOWN
+                # 時刻のない古い形式の行は NULL にする
+                times = (
+                    np.where(known, column.astype(object), None).tolist()
+                    for column in (table.start, table.end, table.tz)
+                )
+                ids = [tag_id(self.connection, name) for name in table.tag_names]
+                tags = np.array(ids, dtype=object)[table.tags].tolist()
+                days, seconds = table.days.tolist(), table.seconds.tolist()
+                records = zip(days, months, seconds, *times, tags)
+                self.connection.executemany(INSERT_SQL, records)
+                add_hours(self.connection, table.hour_heatmap())
+                added += len(table)
+            self.connection.execute(IMPORTED_SQL, (key, end - start))
+        return added
+
+    def imported_offset(self, csv_path):
+        # csv_path を取り込んだことがなければ None
+        key = os.path.abspath(csv_path)
+        row = self.connection.execute(
+            "SELECT offset FROM imports WHERE csv_path = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def mark_imported(self, csv_path, offset):
+        # CSVを書き換えた (session_compact.py) 後に、取り込み済みの位置を付け直す
+        with self.connection:
+            self.connection.execute(
+                "UPDATE imports SET offset = ? WHERE csv_path = ?",
+                (offset, os.path.abspath(csv_path)),
+            )
+
+
+class SqliteStats:
+    # 集計は SQL の GROUP BY で行うので、読み込む量は問い合わせる期間で決まる
+    # stats() を呼んだスレッド (Analysis の集計スレッド) で作られ、そのスレッドの中で
+    # 1つの接続を使い回す (参照がなくなれば閉じられる)
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = connect_reader(db_path)
+
+    def _query(self, sql, params=()):
+        return self.connection.execute(sql, params).fetchall()
+
+    def monthly_totals(self):
+        return {
+            (1970 + month // 12, month % 12 + 1): seconds
+            for month, seconds in self._query(MONTHLY_SQL)
+        }
+
+    def daily_totals(self, first_day, n_days):
+        start = epoch_day(first_day)
+        totals = dict(self._query(DAILY_SQL, (start, start + n_days - 1)))
+        return {
+            first_day + timedelta(days=i): totals.get(start + i, 0)
+            for i in range(n_days)
+        }
+
+    def daily_series(self):
+        rows = self._query(SERIES_SQL)
+        return [day for day, _ in rows], [seconds for _, seconds in rows]
+
+    def hour_heatmap(self):
+        import numpy as np
+
+        # 行を追加するたびに更新している hour_totals の 168 行を読むだけで済む
+        heatmap = np.zeros(7 * 24)
+        for cell, seconds in self._query(HOUR_TOTALS_SQL):
+            heatmap[cell] = seconds
+        return heatmap.reshape(7, 24)
+
+    def tags(self):
+        return [name for (name,) in self._query(TAGS_SQL)]
+
+    def tag_series(self):
+        series = {}
+        for name, day, seconds in self._query(TAG_SERIES_SQL):
+            days, totals = series.setdefault(name, ([], []))
+            days.append(day)
+            totals.append(seconds)
+        return series
+
+    def tag_monthly_totals(self):
+        result = {}
+        for name, month, seconds in self._query(TAG_MONTHLY_SQL):
+            result.setdefault(name, {})[(1970 + month // 12, month % 12 + 1)] = seconds
+        return result
+
+
+class SqliteSessionPages:
+    # CsvSessionPages と同じ問い合わせを、月の索引と LIMIT/OFFSET で行う
+    # 一覧を表示する UI スレッドで作られ、ページごとの問い合わせに同じ接続を使う
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = connect_reader(db_path)
+
+    def _query(self, sql, params=()):
+        return self.connection.execute(sql, params).fetchall()
+
+    def refresh(self):
+        pass
+
+    def count(self, key):
+        from session_pages import month_number
+
+        return self._query(MONTH_COUNT_SQL, (month_number(key),))[0][0]
+
+    def page(self, key, first, n, order="time"):
+        from session_pages import month_number, session_row
+
+        if order not in PAGE_ORDERS:
+            raise ValueError(f"unknown order: {order}")
+        sql = PAGE_SQL.format(PAGE_ORDERS[order])
+        rows = self._query(sql, (month_number(key), n, first))
+        return [session_row(*row[:5], row[5] or "") for row in rows]
+
+
+STORAGES = {"csv": CsvStorage, "sqlite": SqliteStorage}
+
+
+def open_storage(backend="csv", other_logs=()):
+    # other_logs: "merge" のときに合わせて集計する、他のPCのセッションログ
+    if backend == "merge":
+        return MergedStorage(other_logs)
+    try:
+        return STORAGES[backend]()
+    except KeyError:
+        raise ValueError(f"unknown session backend: {backend}") from None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KeepTimer session storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    importer = sub.add_parser("import-csv", help="CSVの行をSQLiteへ取り込む")
+    importer.add_argument("csv", nargs="?", default=SESSIONS_CSV)
+    importer.add_argument("db", nargs="?", default=SESSIONS_DB)
+    args = parser.parse_args()
+
+    storage = SqliteStorage(args.db)
+    try:
+        count = storage.import_csv(args.csv)
+    finally:
+        storage.close()
+    print(f"{count} sessions imported into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
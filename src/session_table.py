@@ -0,0 +1,309 @@
+import csv
+import os
+from itertools import repeat
+
+import numpy as np
+
+from session_log import parse_duration
+
+# 行の列: 日付, 作業時間, 開始時刻, 終了時刻 (UNIX時間), UTCからの時差 (+0900),
+# プロジェクトのタグ (タグのない行は5列)
+# 古い形式の行と session_compact.py でまとめた1日分の合計の行は、日付と作業時間の2列だけ
+# (タグのある合計の行は時刻の列を空にした6列)
+COLUMNS = 6
+ROW_WIDTHS = (2, 5, 6)
+UNKNOWN = -1  # 時刻が記録されていない (古い形式の) 行
+UNTAGGED = 0  # タグの番号。tag_names[0] は常に "" (タグなし)
+# 一度に読み込むバイト数。ログ全体を読まずに集計する場合のメモリ使用量の上限になる
+# (解析中の配列を含めると、最大でこのおよそ20倍を使う)
+CHUNK_BYTES = 1024 * 1024
+
+
+class SessionTable:
+    # セッションログを列ごとの配列として保持する
+    # days: 1970-01-01 からの日数 (終了日), seconds: 作業時間 (秒)
+    # start, end: 開始・終了時刻 (UNIX時間, 不明な行は UNKNOWN), tz: UTCからの時差 (秒)
+    # tags: tag_names の番号 (辞書式に符号化したタグ)
+    def __init__(
+        self, days, seconds, start=None, end=None, tz=None, tags=None, tag_names=None
+    ):
+        self.days = np.asarray(days, dtype=np.int32)
+        self.seconds = np.asarray(seconds, dtype=np.int64)
+        unknown = np.full(len(self.days), UNKNOWN, dtype=np.int64)
+        self.start = unknown if start is None else np.asarray(start, dtype=np.int64)
+        self.end = unknown if end is None else np.asarray(end, dtype=np.int64)
+        if tz is None:
+            tz = np.zeros(len(self.days), dtype=np.int32)
+        self.tz = np.asarray(tz, dtype=np.int32)
+        if tags is None:
+            tags = np.full(len(self.days), UNTAGGED, dtype=np.int32)
+        self.tags = np.asarray(tags, dtype=np.int32)
+        self.tag_names = [""] if tag_names is None else list(tag_names)
+
+    @classmethod
+    def concat(cls, tables):
+        if not tables:
+            return cls([], [])
+        # タグの辞書をまとめ、各テーブルの番号を付け替える
+        names = [""]
+        positions = {"": UNTAGGED}
+        tags = []
+        for table in tables:
+            for name in table.tag_names:
+                if name not in positions:
+                    positions[name] = len(names)
+                    names.append(name)
+            mapping = np.array([positions[name] for name in table.tag_names])
+            tags.append(mapping[table.tags].astype(np.int32))
+        columns = (
+            np.concatenate([getattr(table, name) for table in tables])
+            for name in ("days", "seconds", "start", "end", "tz")
+        )
+        return cls(*columns, np.concatenate(tags), names)
+
+    def take(self, mask):
+        return SessionTable(
+            self.days[mask],
+            self.seconds[mask],
+            self.start[mask],
+            self.end[mask],
+            self.tz[mask],
+            self.tags[mask],
+            self.tag_names,
+        )
+
+    def __len__(self):
+        return len(self.days)
+
+    def daily_totals(self):
+        # 日ごとの合計 (日付順)
+        days, index = np.unique(self.days, return_inverse=True)
+        totals = np.bincount(index, weights=self.seconds, minlength=len(days))
+        return days, totals.astype(np.int64)
+
+    def monthly_totals(self):
+        # 月ごとの合計 (1970-01 からの月数, 合計秒)
+        months = self.days.astype("datetime64[D]").astype("datetime64[M]")
+        months, index = np.unique(months.astype(np.int32), return_inverse=True)
+        totals = np.bincount(index, weights=self.seconds, minlength=len(months))
+        return months, totals.astype(np.int64)
+
+    def window_totals(self, first_day, n_days):
+        # first_day から n_days 日分の合計 (データがない日は0)
+        offset = self.days.astype(np.int64) - first_day
+        mask = (offset >= 0) & (offset < n_days)
+        totals = np.bincount(
+            offset[mask], weights=self.seconds[mask], minlength=n_days
+        )
+        return totals.astype(np.int64)
+
+    def tag_daily_totals(self):
+        # タグのある行の (タグ名, 日, 合計秒) ごとの合計 (タグ・日付順)
+        tagged = self.tags != UNTAGGED
+        keys = self.tags[tagged].astype(np.int64) << 32 | self.days[tagged]
+        keys, index = np.unique(keys, return_inverse=True)
+        totals = np.bincount(index, weights=self.seconds[tagged], minlength=len(keys))
+        names = [self.tag_names[tag] for tag in (keys >> 32).tolist()]
+        days = (keys & 0xFFFFFFFF).astype(np.int32)
+        return names, days, totals.astype(np.int64)
+
+    def hour_heatmap(self):
+        return hour_heatmap(self.start, self.end, self.tz, self.seconds)
+
+
+def hour_heatmap(start, end, tz, seconds):
+    # 曜日 (月曜=0) × 時 (0-23) ごとの作業時間 (秒) を 7x24 の配列で返す
+    # セッションを現地時刻の時の境界で分割し、作業時間を各部分の長さの比で割り振る
+    # (日付をまたぐセッションも両方の日に分かれる)。時刻のない行は含めない
+    known = (start != UNKNOWN) & (end != UNKNOWN)
+    first = start[known] + tz[known]
+    # 長さ0のセッションは開始した時に含める
+    last = np.maximum(end[known] + tz[known], first + 1)
+    seconds = seconds[known]
+    first_hour = first // 3600
+    counts = (last - 1) // 3600 - first_hour + 1
+    bounds = np.cumsum(counts)
+    pieces = np.arange(bounds[-1] if len(bounds) else 0)
+    # 各部分がどのセッションに属するか
+    row = np.searchsorted(bounds, pieces, side="right")
+    hour = first_hour[row] + pieces - (bounds[row] - counts[row])
+    overlap = np.minimum(last[row], (hour + 1) * 3600) - np.maximum(
+        first[row], hour * 3600
+    )
+    weights = overlap * seconds[row] / (last - first)[row]
+    # 1970-01-01 は木曜日
+    cells = (hour // 24 + 3) % 7 * 24 + hour % 24
+    return np.bincount(cells, weights=weights, minlength=7 * 24).reshape(7, 24)
+
+
+def _split_columns(text):
+    lines = [line for line in text.splitlines() if line]
+    if not lines:
+        return [[] for _ in range(COLUMNS)]
+    if '"' in text:
+        # 引用符付きの行 ("1 day, 0:00:00" など) だけ csv モジュールで読み、
+        # 値の中のカンマを除いて他の行と同じように分割できるようにする
+        for i, line in enumerate(lines):
+            if '"' in line:
+                row = next(csv.reader([line]))
+                lines[i] = ",".join(field.replace(",", "") for field in row)
+    commas = list(map(str.count, lines, repeat(",")))
+    widths = {count + 1 for count in set(commas)}
+    if not widths <= set(ROW_WIDTHS):
+        raise ValueError("malformed session row")
+    if len(widths) == 1:
+        (width,) = widths
+    else:
+        # 形式の異なる行が混ざっていれば、足りない列を空の値で補って揃える
+        width = COLUMNS
+        lines = [
+            line + "," * (COLUMNS - 1 - count) for line, count in zip(lines, commas)
+        ]
+    # 列数が揃っているので、まとめて分割する
+    fields = ",".join(lines).split(",")
+    columns = [fields[i::width] for i in range(width)]
+    return columns + [None] * (COLUMNS - width)
+
+
+def _parse_epochs(values):
+    if values is None:
+        return None
+    raw = np.array(values, dtype="S")
+    epochs = np.full(len(raw), UNKNOWN, dtype=np.int64)
+    known = raw != b""
+    epochs[known] = raw[known].astype(np.int64)
+    return epochs
+
+
+def _parse_offsets(values):
+    # "+0900" 形式の時差を秒に変換する (種類は少ないので値ごとに変換する)
+    if values is None:
+        return None
+    unique, index = np.unique(np.array(values, dtype="U"), return_inverse=True)
+    offsets = [
+        (-1 if text[0] == "-" else 1) * (int(text[1:3]) * 3600 + int(text[3:5]) * 60)
+        if text
+        else 0
+        for text in unique.tolist()
+    ]
+    return np.array(offsets, dtype=np.int32)[index]
+
+
+def _parse_durations(values):
+    if not values:
+        return np.zeros(0, dtype=np.int64)
+    raw = np.array(values, dtype="S")
+    width = max(raw.dtype.itemsize, 9)
+    chars = np.char.rjust(raw, width).view(np.uint8).reshape(-1, width)
+    # 右詰めにすると H:MM:SS の各桁が固定位置に並ぶ
+    digits = np.where(chars == ord(" "), 0, chars.astype(np.int64) - ord("0"))
+    seconds = (
+        (digits[:, -8] * 10 + digits[:, -7]) * 3600
+        + (digits[:, -5] * 10 + digits[:, -4]) * 60
+        + digits[:, -2] * 10
+        + digits[:, -1]
+    )
+    # "1 day, ..." や想定外の書式の行は1行ずつ解釈する
+    bad_digit = (digits[:, -8:] < 0) | (digits[:, -8:] > 9)
+    irregular = (
+        (chars[:, -3] != ord(":"))
+        | (chars[:, -6] != ord(":"))
+        | (chars[:, :-8] != ord(" ")).any(axis=1)
+        | (bad_digit & (chars[:, -8:] != ord(":"))).any(axis=1)
+    )
+    for i in np.flatnonzero(irregular):
+        seconds[i] = parse_duration(values[i])
+    return seconds
+
+
+def _parse_tags(values):
+    # (番号, 辞書)。"" (タグなし) は必ず0番になる
+    if values is None:
+        return None, None
+    names, index = np.unique(np.array(values, dtype="U"), return_inverse=True)
+    names = names.tolist()
+    if names and names[0] == "":
+        return index.astype(np.int32), names
+    return (index + 1).astype(np.int32), [""] + names
+
+
+def parse_sessions(text):
+    dates, durations, start, end, tz, tags = _split_columns(text)
+    days = np.array(dates, dtype="datetime64[D]").astype(np.int32)
+    return SessionTable(
+        days,
+        _parse_durations(durations),
+        _parse_epochs(start),
+        _parse_epochs(end),
+        _parse_offsets(tz),
+        *_parse_tags(tags),
+    )
+
+
+def load_sessions(csv_path, offset=0):
+    # offset 以降の完全な行を読み込み、(テーブル, 読み込んだバイト数) を返す
+    with open(csv_path, "rb") as file:
+        file.seek(offset)
+        data = file.read()
+    complete = data[: data.rfind(b"\n") + 1]
+    return parse_sessions(complete.decode("utf-8")), len(complete)
+
+
+def iter_sessions(csv_path, offset=0, chunk_bytes=CHUNK_BYTES, end=None):
+    # offset から end (省略時は末尾) までを chunk_bytes ずつ読み、
+    # (テーブル, 読み込みを終えた位置) を返す。書き込み途中の最終行は読み込まない
+    with open(csv_path, "rb") as file:
+        file.seek(offset)
+        rest = b""
+        while True:
+            size = chunk_bytes if end is None else min(chunk_bytes, end - file.tell())
+            block = file.read(size)
+            if not block:
+                return
+            data = rest + block
+            complete = data.rfind(b"\n") + 1
+            rest = data[complete:]
+            if len(rest) > chunk_bytes:
+                raise ValueError("session row exceeds chunk size")
+            if complete:
+                offset += complete
+                yield parse_sessions(data[:complete].decode("utf-8")), offset
+
+
+def last_line_end(file, chunk_bytes):
+    # 最後の改行の直後の位置 (書き込み途中の最終行を除いた末尾)
+    pos = file.seek(0, os.SEEK_END)
+    while pos > 0:
+        start = max(0, pos - chunk_bytes)
+        file.seek(start)
+        newline = file.read(pos - start).rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        pos = start
+    return 0
+
+
+def load_recent_sessions(csv_path, first_day, chunk_bytes=CHUNK_BYTES):
+    # first_day 以降の行だけを返す
+    # 行は時刻順に追記されるので、末尾から遡り first_day より前に達したら止める
+    first = np.datetime64(first_day, "D").astype(np.int32)
+    tables = []
+    with open(csv_path, "rb") as file:
+        pos = last_line_end(file, chunk_bytes)
+        head = b""  # 前のブロックにまたがる行の後半
+        while pos > 0:
+            start = max(0, pos - chunk_bytes)
+            file.seek(start)
+            data = file.read(pos - start) + head
+            pos = start
+            cut = data.find(b"\n") + 1 if start else 0
+            head, data = data[:cut], data[cut:]
+            if len(head) > chunk_bytes:
+                raise ValueError("session row exceeds chunk size")
+            table = parse_sessions(data.decode("utf-8"))
+            recent = table.days >= first
+            tables.append(table.take(recent))
+            if not recent.all():
+                break
+    tables.reverse()
+    return SessionTable.concat(tables)
@@ -0,0 +1,242 @@
+import csv
+import glob
+import io
+import os
+import queue
+import threading
+
+from file_lock import FileLock, lock_path_for
+from session_log import SESSIONS_CSV
+
+
+# fsync の方針
+FSYNC_NEVER = "never"  # flush のみ (OSのキャッシュに任せる)
+FSYNC_BATCH = "batch"  # CSVへの書き込みごとに fsync
+FSYNC_ALWAYS = "always"  # ジャーナルへの追記ごとにも fsync
+
+BATCH_DELAY_SEC = 0.5  # まとめて書き込むために待つ時間
+FLUSH_TIMEOUT_SEC = 2.0  # 終了時に書き込みを待つ上限
+WRITE_MARK = "#write "
+COMMIT_MARK = "#commit "
+
+
+def journal_path_for(csv_path, pid=None):
+    # 同じCSVに書き込むプロセスが他にあれば、プロセスごとのジャーナルを使う
+    root, _ = os.path.splitext(csv_path)
+    return root + ".wal" if pid is None else f"{root}.{pid}.wal"
+
+
+def journal_paths(csv_path):
+    # 残っているジャーナル (書き込み中のプロセスのものを含む)
+    root, _ = os.path.splitext(csv_path)
+    paths = glob.glob(glob.escape(root) + ".*.wal")
+    if os.path.exists(root + ".wal"):
+        paths.insert(0, root + ".wal")
+    return paths
+
+
+def format_row(row):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
+
+
+def _pending_rows(journal_path):
+    # ジャーナルのうち、コミット済みと記録されていない行と、
+    # 書き込み途中だった場合はその開始位置と行数を返す
+    rows = []
+    in_flight = None
+    with open(journal_path, "r", newline="", encoding="utf-8") as file:
+        for line in file:
+            if line.startswith(WRITE_MARK):
+                offset, count = line[len(WRITE_MARK) :].split()
+                in_flight = (int(offset), int(count))
+            elif line.startswith(COMMIT_MARK):
+                del rows[: int(line[len(COMMIT_MARK) :])]
+                in_flight = None
+            elif line.endswith("\n"):
+                rows.append(line)
+    return rows, in_flight
+
+
+def _recover_in_flight(csv_path, rows, in_flight):
+    # CSVへの書き込み中に落ちた場合、書き込みが完了していればその行を除き、
+    # 途中までしか書かれていなければCSVを書き込み前の長さに戻す
+    offset, count = in_flight
+    data = "".join(rows[:count]).encode("utf-8")
+    with open(csv_path, "r+b") as file:
+        file.seek(offset)
+        if file.read(len(data)) == data:
+            return rows[count:]
+        file.truncate(offset)
+    return rows
+
+
+class SessionWriter:
+    # record_session の書き込みを専用スレッドで行う
+    # 行は先にジャーナルへ追記されるので、プロセスが強制終了されても失われない
+    def __init__(
+        self,
+        csv_path=SESSIONS_CSV,
+        journal_path=None,
+        fsync=FSYNC_BATCH,
+        binary_path=None,
+    ):
+        if fsync not in (FSYNC_NEVER, FSYNC_BATCH, FSYNC_ALWAYS):
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        self.csv_path = csv_path
+        # バイナリ形式 (binary_store) のファイルがあれば、CSVと一緒に更新する
+        self.binary_path = binary_path
+        # CSVへの追記は、同じCSVに書き込む他のプロセスとロックで排他する
+        self.csv_lock = FileLock(lock_path_for(csv_path), timeout=None)
+        self.journal_path, self.journal_lock = self._claim_journal(journal_path)
+        self.fsync = fsync
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+        self.appended = 0
+        self.committed = 0
+
+        self._recover()
+        self.journal = open(self.journal_path, "a", newline="", encoding="utf-8")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _claim_journal(self, journal_path):
+        # ジャーナルはロックして使う。ロックできるジャーナルは書き込んだプロセスが
+        # 終了しているので、残っている行を復旧してよい
+        if journal_path is not None:
+            candidates = [journal_path]
+        else:
+            candidates = [
+                journal_path_for(self.csv_path),
+                journal_path_for(self.csv_path, os.getpid()),
+            ]
+        for path in candidates:
+            lock = FileLock(lock_path_for(path))
+            if lock.acquire(blocking=False):
+                return path, lock
+        raise RuntimeError(f"journal is in use: {candidates[-1]}")
+
+    def _recover(self):
+        # 前回 (または終了した他のプロセスが) 書き込めなかった行をCSVへ反映する
+        with self.csv_lock:
+            for path in journal_paths(self.csv_path):
+                if path == self.journal_path:
+                    self._recover_journal(path)
+                    continue
+                lock = FileLock(lock_path_for(path))
+                if lock.acquire(blocking=False):
+                    self._recover_journal(path)
+                    lock.release()
+
+    def _recover_journal(self, journal_path):
+        if not os.path.exists(journal_path):
+            return
+        rows, in_flight = _pending_rows(journal_path)
+        if in_flight is not None and os.path.exists(self.csv_path):
+            rows = _recover_in_flight(self.csv_path, rows, in_flight)
+        if rows:
+            with open(self.csv_path, "a", newline="", encoding="utf-8") as file:
+                file.write("".join(rows))
+                file.flush()
+                os.fsync(file.fileno())
+        os.remove(journal_path)
+
+    def append(self, row):
+        line = format_row(row)
+        with self.lock:
+            self.journal.write(line)
+            self._flush_journal()
+            self.appended += 1
+        self.queue.put(line)
+
+    def _flush_journal(self):
+        self.journal.flush()
+        if self.fsync == FSYNC_ALWAYS:
+            os.fsync(self.journal.fileno())
+
+    def _run(self):
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as file:
+            while True:
+                line = self.queue.get()
+                if line is None:
+                    return
+                batch = [line]
+                stop = False
+                # 少し待って、続けて来た行をまとめて書き込む
+                try:
+                    while True:
+                        line = self.queue.get(timeout=BATCH_DELAY_SEC)
+                        if line is None:
+                            stop = True
+                            break
+                        batch.append(line)
+                except queue.Empty:
+                    pass
+
+                with self.csv_lock:
+                    self._mark_write(file, len(batch))
+                    file.write("".join(batch))
+                    file.flush()
+                    if self.fsync != FSYNC_NEVER:
+                        os.fsync(file.fileno())
+                    self._sync_binary()
+                self._commit(len(batch))
+                if stop:
+                    return
+
+    def _sync_binary(self):
+        if self.binary_path is None or not os.path.exists(self.binary_path):
+            return
+        try:
+            from binary_store import BinaryStore
+
+            BinaryStore(self.binary_path).sync(self.csv_path)
+        except Exception:
+            # 複製の更新に失敗してもCSVへの書き込みは続ける
+            import logging
+
+            logging.getLogger(__name__).exception(
+                "failed to update %s", self.binary_path
+            )
+
+    def _mark_write(self, file, count):
+        # 書き込み前のCSVの長さを記録しておき、書き込み途中で落ちても復旧できるようにする
+        file.flush()
+        with self.lock:
+            if not self.journal.closed:
+                offset = os.fstat(file.fileno()).st_size
+                self.journal.write(f"{WRITE_MARK}{offset} {count}\n")
+                self._flush_journal()
+
+    def _commit(self, count):
+        with self.lock:
+            self.committed += count
+            self.done.notify_all()
+            if self.journal.closed:
+                return
+            if self.committed == self.appended:
+                # 未書き込みの行がなければジャーナルを空にする
+                self.journal.seek(0)
+                self.journal.truncate()
+            else:
+                self.journal.write(f"{COMMIT_MARK}{count}\n")
+            self._flush_journal()
+
+    def flush(self, timeout=FLUSH_TIMEOUT_SEC):
+        # キューに積まれた行がCSVに書き込まれるまで待つ
+        with self.lock:
+            return self.done.wait_for(
+                lambda: self.committed == self.appended, timeout=timeout
+            )
+
+    def close(self, timeout=FLUSH_TIMEOUT_SEC):
+        # 時間内に書き込めなかった行はジャーナルに残り、次回起動時に反映される
+        self.queue.put(None)
+        self.thread.join(timeout)
+        with self.lock:
+            self.journal.close()
+            if not self.thread.is_alive() and self.committed == self.appended:
+                os.remove(self.journal_path)
+            self.journal_lock.release()
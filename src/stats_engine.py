@@ -0,0 +1,167 @@
+# 画面に依存しない集計処理と、複数ファイルをまとめて集計するコマンド
+#   python stats_engine.py a.csv b.csv ... [--format csv|json] [--days 30] [--total]
+#                          [--chunk-mb 1] [--recent]
+# ファイルごとの結果は終わった順に出力する (json は1行1オブジェクト)
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+DAILY_WINDOW = 30  # Analysis のグラフに表示する日数
+
+
+def monthly_stats(stats):
+    # {(年, 月): 合計時間} を新しい月から順に返す
+    monthly = {
+        month: timedelta(seconds=seconds)
+        for month, seconds in stats.monthly_totals().items()
+    }
+    return dict(sorted(monthly.items(), reverse=True))
+
+
+def tag_monthly_stats(stats):
+    # {タグ: {(年, 月): 合計時間}} (タグのない行は含めない)
+    return {
+        tag: {
+            month: timedelta(seconds=seconds) for month, seconds in months.items()
+        }
+        for tag, months in stats.tag_monthly_totals().items()
+    }
+
+
+def daily_stats(stats, today, n_days=DAILY_WINDOW):
+    # today までの n_days 日分の {日付: (合計時間, 曜日)} (データがない日は0)
+    first_day = today - timedelta(days=n_days - 1)
+    return {
+        day: (timedelta(seconds=seconds), day.strftime("%A"))
+        for day, seconds in stats.daily_totals(first_day, n_days).items()
+    }
+
+
+def aggregate_file(path, today, n_days=DAILY_WINDOW, chunk_bytes=None, recent=False):
+    # プロセスプールで実行される。例外は結果として返し、他のファイルの集計を続ける
+    # ファイルは chunk_bytes ずつ読み、日別・月別の合計だけを残す
+    from rollup_cache import SessionRollup
+    from session_table import CHUNK_BYTES, iter_sessions, load_recent_sessions
+
+    chunk_bytes = chunk_bytes or CHUNK_BYTES
+    first_day = today - timedelta(days=n_days - 1)
+    stats = SessionRollup()
+    sessions = 0
+    try:
+        if recent:
+            # 日別の集計だけなら、末尾から first_day まで遡って読めば足りる
+            tables = [load_recent_sessions(path, first_day, chunk_bytes)]
+        else:
+            tables = (table for table, _ in iter_sessions(path, 0, chunk_bytes))
+        for table in tables:
+            stats.add_table(table)
+            sessions += len(table)
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "path": path,
+        "sessions": sessions,
+        "monthly": {
+            f"{year:04d}-{month:02d}": seconds
+            for (year, month), seconds in sorted(stats.monthly_totals().items())
+            if not recent
+        },
+        "daily": {
+            day.isoformat(): seconds
+            for day, seconds in stats.daily_totals(first_day, n_days).items()
+        },
+    }
+
+
+def aggregate_files(
+    paths, today, n_days=DAILY_WINDOW, workers=None, chunk_bytes=None, recent=False
+):
+    # 各ファイルを別プロセスで集計し、終わったものから返す
+    # 同時に読み込むのは最大で workers * chunk_bytes 程度になる
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(aggregate_file, path, today, n_days, chunk_bytes, recent)
+            for path in paths
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def add_to_total(total, result):
+    total["sessions"] += result["sessions"]
+    for kind in ("monthly", "daily"):
+        merged = total[kind]
+        for period, seconds in result[kind].items():
+            merged[period] = merged.get(period, 0) + seconds
+        total[kind] = dict(sorted(merged.items()))
+
+
+class CsvOutput:
+    def __init__(self, stream):
+        self.writer = csv.writer(stream, lineterminator="\n")
+        self.writer.writerow(["path", "kind", "period", "seconds", "error"])
+        self.stream = stream
+
+    def write(self, result):
+        if "error" in result:
+            self.writer.writerow([result["path"], "error", "", "", result["error"]])
+        else:
+            for kind in ("monthly", "daily"):
+                for period, seconds in result[kind].items():
+                    self.writer.writerow([result["path"], kind, period, seconds, ""])
+        self.stream.flush()
+
+
+class JsonOutput:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, result):
+        self.stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+OUTPUTS = {"csv": CsvOutput, "json": JsonOutput}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KeepTimer session report")
+    parser.add_argument("paths", nargs="+", help="pomodoro_sessions.csv のパス")
+    parser.add_argument("--format", choices=sorted(OUTPUTS), default="csv")
+    parser.add_argument("--days", type=int, default=DAILY_WINDOW)
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--total", action="store_true", help="全ファイルの合計も出力")
+    parser.add_argument(
+        "--chunk-mb", type=float, default=1, help="1プロセスが一度に読み込む量 (MB)"
+    )
+    parser.add_argument(
+        "--recent", action="store_true", help="日別の集計だけを末尾から読んで求める"
+    )
+    args = parser.parse_args(argv)
+    chunk_bytes = max(1, int(args.chunk_mb * 1024 * 1024))
+
+    output = OUTPUTS[args.format](sys.stdout)
+    total = {"path": "TOTAL", "sessions": 0, "monthly": {}, "daily": {}}
+    failed = 0
+    results = aggregate_files(
+        args.paths, args.today, args.days, args.workers, chunk_bytes, args.recent
+    )
+    for result in results:
+        output.write(result)
+        if "error" in result:
+            failed += 1
+            print(f"{result['path']}: {result['error']}", file=sys.stderr)
+        else:
+            add_to_total(total, result)
+    if args.total:
+        output.write(total)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
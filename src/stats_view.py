@@ -0,0 +1,267 @@
+# Analysis ウィンドウの表とグラフ
+# 一度作ったウィジェットと matplotlib のオブジェクトを使い回し、値だけを更新する
+import calendar
+from datetime import timedelta
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+
+COLOR_MAP = {
+    "Monday": "slateblue",
+    "Tuesday": "tomato",
+    "Wednesday": "cyan",
+    "Thursday": "palegreen",
+    "Friday": "goldenrod",
+    "Saturday": "rosybrown",
+    "Sunday": "gold",
+}
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+class MonthlyTable:
+    # 月別の合計時間を表示する Treeview (列: 年, 月, タグ, 合計時間)
+    # タグのある月には、タグごとの合計とタグのない残りを子の行として表示する
+    def __init__(self, tree, untagged="(untagged)"):
+        self.tree = tree
+        self.untagged = untagged
+        self.totals = {}
+        self.tag_totals = {}  # (年, 月) -> {タグ: 合計時間}
+        self.rows = {}
+        self.tag_rows = {}  # ((年, 月), タグ) -> 子の行 (タグ "" はタグのない残り)
+
+    def _values(self, key):
+        year, month = key
+        return (year, calendar.month_abbr[month], "", str(self.totals[key]))
+
+    def _tag_values(self, key, tag):
+        tags = self.tag_totals[key]
+        if tag:
+            total = tags[tag]
+        else:
+            total = self.totals[key] - sum(tags.values(), timedelta(0))
+        return ("", "", tag or self.untagged, str(total))
+
+    def _set_tag_row(self, key, tag):
+        row = self.tag_rows.get((key, tag))
+        if row is not None:
+            self.tree.item(row, values=self._tag_values(key, tag))
+            return
+        # タグのない残りの行は常に最後に置く
+        untagged = self.tag_rows.get((key, ""))
+        index = "end" if untagged is None else self.tree.index(untagged)
+        self.tag_rows[key, tag] = self.tree.insert(
+            self.rows[key], index, values=self._tag_values(key, tag)
+        )
+
+    def update(self, monthly_stats, tag_monthly_stats=None):
+        # tag_monthly_stats: {タグ: {(年, 月): 合計時間}}
+        self.tree.delete(*self.tree.get_children())
+        self.totals = dict(monthly_stats)
+        self.tag_totals = {}
+        for tag, months in (tag_monthly_stats or {}).items():
+            for key, total in months.items():
+                self.tag_totals.setdefault(key, {})[tag] = total
+        self.rows = {
+            key: self.tree.insert("", "end", values=self._values(key))
+            for key in self.totals
+        }
+        self.tag_rows = {}
+        for key, tags in self.tag_totals.items():
+            if key not in self.rows:
+                continue
+            for tag in sorted(tags, key=tags.get, reverse=True):
+                self._set_tag_row(key, tag)
+            self._set_tag_row(key, "")
+
+    def month_of(self, item):
+        # 行 (タグの子の行を含む) の (年, 月)。月の行でなければ None
+        if not item:
+            return None
+        item = self.tree.parent(item) or item
+        for key, row in self.rows.items():
+            if row == item:
+                return key
+        return None
+
+    def add(self, day, seconds, tag=""):
+        key = (day.year, day.month)
+        delta = timedelta(seconds=seconds)
+        self.totals[key] = self.totals.get(key, timedelta(0)) + delta
+        if key in self.rows:
+            self.tree.item(self.rows[key], values=self._values(key))
+        else:
+            # 新しい月は先頭 (新しい順) に追加する
+            self.rows[key] = self.tree.insert("", 0, values=self._values(key))
+        if tag:
+            tags = self.tag_totals.setdefault(key, {})
+            tags[tag] = tags.get(tag, timedelta(0)) + delta
+            self._set_tag_row(key, tag)
+        if key in self.tag_totals:
+            self._set_tag_row(key, "")
+
+
+class DailyChart:
+    # 日別の作業時間の棒グラフ (既定は直近30日)
+    def __init__(self, parent, daily_stats, facecolor=None, legend_fontsize=None):
+        self.figure = Figure(figsize=(10, 6))
+        self.ax = self.figure.add_subplot()
+        if facecolor is not None:
+            self.figure.patch.set_facecolor(facecolor)
+            self.ax.set_facecolor(facecolor)
+
+        dates = list(daily_stats.keys())
+        self.bars = self.ax.bar(dates, [0] * len(dates))
+        self.ax.set_xlabel("Date")
+        self.ax.set_ylabel("Hours")
+        self.ax.set_title("Working Time (Last 30 Days)")
+        self.update(daily_stats, draw=False)
+        self.figure.tight_layout()
+        self.ax.grid()
+
+        # 凡例
+        handles = [Rectangle((0, 0), 1, 1, color=color) for color in COLOR_MAP.values()]
+        self.ax.legend(
+            handles,
+            list(COLOR_MAP.keys()),
+            title="Weekdays",
+            loc="upper left",
+            bbox_to_anchor=(0, 1),
+            fontsize=legend_fontsize,
+        )
+
+        self.canvas = FigureCanvasTkAgg(self.figure, parent)
+        self.widget = self.canvas.get_tk_widget()
+
+    def update(self, daily_stats, draw=True, title=None):
+        # 日数が変わらなければ、既存の棒の位置・高さ・色だけを変更する
+        self.dates = list(daily_stats.keys())
+        if len(self.dates) != len(self.bars):
+            self.bars.remove()
+            self.bars = self.ax.bar(self.dates, [0] * len(self.dates))
+        if title is not None:
+            self.ax.set_title(title)
+        for bar, date, (total_time, weekday) in zip(
+            self.bars, self.dates, daily_stats.values()
+        ):
+            bar.set_x(mdates.date2num(date) - bar.get_width() / 2)
+            bar.set_height(total_time.total_seconds() / 3600)
+            bar.set_color(COLOR_MAP[weekday])
+        self._rescale()
+        if draw:
+            self.canvas.draw_idle()
+
+    def _rescale(self):
+        first = mdates.date2num(self.dates[0])
+        last = mdates.date2num(self.dates[-1])
+        self.ax.set_xlim(first - 1, last + 1)
+        self.ax.relim()
+        self.ax.autoscale_view(scalex=False)
+        for label in self.ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment("right")
+
+
+class TagChart:
+    # プロジェクト (タグ) ごとの日別の作業時間の積み上げ棒グラフ
+    # タグの組み合わせと日数が変わらなければ、棒の位置・高さだけを更新する
+    def __init__(
+        self, parent, dates, tag_daily, facecolor=None, legend_fontsize=None
+    ):
+        self.figure = Figure(figsize=(10, 6))
+        self.ax = self.figure.add_subplot()
+        if facecolor is not None:
+            self.figure.patch.set_facecolor(facecolor)
+            self.ax.set_facecolor(facecolor)
+        self.legend_fontsize = legend_fontsize
+        self.stacks = {}  # タグ -> 棒 (合計の大きいタグから下に積む)
+        self.ax.set_xlabel("Date")
+        self.ax.set_ylabel("Hours")
+        self.ax.set_title("Working Time by Project")
+        self.ax.grid()
+        self.update(dates, tag_daily, draw=False)
+        self.figure.tight_layout()
+
+        self.canvas = FigureCanvasTkAgg(self.figure, parent)
+        self.widget = self.canvas.get_tk_widget()
+
+    def update(self, dates, tag_daily, draw=True, title=None):
+        # tag_daily: {タグ: [秒, ...]} (dates と同じ日数)。期間内に作業のないタグは除く
+        self.dates = list(dates)
+        hours = {
+            tag: np.asarray(seconds, dtype=float) / 3600
+            for tag, seconds in tag_daily.items()
+            if any(seconds)
+        }
+        order = sorted(hours, key=lambda tag: hours[tag].sum(), reverse=True)
+        if order != list(self.stacks) or any(
+            len(bars) != len(self.dates) for bars in self.stacks.values()
+        ):
+            self._rebuild(order)
+        if title is not None:
+            self.ax.set_title(title)
+        bottom = np.zeros(len(self.dates))
+        positions = mdates.date2num(self.dates)
+        for tag, bars in self.stacks.items():
+            for bar, x, y, height in zip(bars, positions, bottom, hours[tag]):
+                bar.set_x(x - bar.get_width() / 2)
+                bar.set_y(y)
+                bar.set_height(height)
+            bottom += hours[tag]
+        if self.dates:
+            self.ax.set_xlim(positions[0] - 1, positions[-1] + 1)
+        self.ax.set_ylim(0, max(bottom.max(initial=0) * 1.05, 1))
+        for label in self.ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment("right")
+        if draw:
+            self.canvas.draw_idle()
+
+    def _rebuild(self, order):
+        for bars in self.stacks.values():
+            bars.remove()
+        zeros = [0] * len(self.dates)
+        self.stacks = {
+            tag: self.ax.bar(self.dates, zeros, color=f"C{i % 10}", label=tag)
+            for i, tag in enumerate(order)
+        }
+        if order:
+            self.ax.legend(
+                title="Projects", loc="upper left", fontsize=self.legend_fontsize
+            )
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+
+
+class HourHeatmap:
+    # 曜日 x 時ごとの作業時間のヒートマップ
+    def __init__(self, parent, heatmap, facecolor=None):
+        self.figure = Figure(figsize=(10, 6))
+        self.ax = self.figure.add_subplot()
+        if facecolor is not None:
+            self.figure.patch.set_facecolor(facecolor)
+        self.hours = np.zeros((7, 24))
+        self.image = self.ax.imshow(self.hours, aspect="auto", cmap="YlOrRd")
+        self.ax.set_xticks(range(24))
+        self.ax.set_yticks(range(7), WEEKDAYS)
+        self.ax.set_xlabel("Hour")
+        self.ax.set_title("Working Time by Weekday and Hour")
+        self.figure.colorbar(self.image, ax=self.ax, label="Hours")
+        self.update(heatmap, draw=False)
+        self.figure.tight_layout()
+
+        self.canvas = FigureCanvasTkAgg(self.figure, parent)
+        self.widget = self.canvas.get_tk_widget()
+
+    def update(self, heatmap, draw=True):
+        # heatmap: 7x24 の作業時間 (秒)
+        self.hours = np.asarray(heatmap, dtype=float) / 3600
+        self.image.set_data(self.hours)
+        self.image.set_clim(0, max(self.hours.max(), 1))
+        if draw:
+            self.canvas.draw_idle()
+
+    def add(self, heatmap):
+        self.update(self.hours * 3600 + heatmap)
@@ -0,0 +1,78 @@
+import threading
+
+POLL_MS = 50  # 集計が終わったかを確認する間隔
+
+# 集計はストレージのキャッシュ (.rollup.json など) を読み書きするので、同時に1つだけ
+# 行う。取り消した集計のスレッドが残っていても、次の集計はそれが終わるのを待つ
+# (その間に更新されたキャッシュを使うので、2回目の集計は追記分だけで済む)
+_compute_lock = threading.Lock()
+
+
+class _Run:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class StatsJob:
+    # Analysis の集計を別スレッドで行い、結果を after() でUIスレッドに戻す
+    # 集計中に再度要求された場合は、新しく始めずに同じ結果を待つ
+    def __init__(self, master, compute):
+        self.master = master
+        self.compute = compute
+        self.callbacks = []
+        self.run = None
+        self.after_id = None
+        self.stale = False
+
+    def running(self):
+        return self.run is not None
+
+    def request(self, callback):
+        self.callbacks.append(callback)
+        if self.run is None:
+            self._start()
+
+    def invalidate(self):
+        # 集計中にデータが変わった場合は、終わった後にもう一度集計する
+        if self.run is not None:
+            self.stale = True
+
+    def cancel(self):
+        # スレッドは止められないので、結果を受け取らないようにする
+        if self.after_id is not None:
+            self.master.after_cancel(self.after_id)
+            self.after_id = None
+        self.run = None
+        self.callbacks = []
+        self.stale = False
+
+    def _start(self):
+        self.stale = False
+        self.run = _Run()
+        thread = threading.Thread(target=self._work, args=(self.run,), daemon=True)
+        thread.start()
+        self.after_id = self.master.after(POLL_MS, self._poll)
+
+    def _work(self, run):
+        try:
+            with _compute_lock:
+                run.result = self.compute()
+        except Exception as e:
+            run.error = e
+        run.done.set()
+
+    def _poll(self):
+        run = self.run
+        if not run.done.is_set():
+            self.after_id = self.master.after(POLL_MS, self._poll)
+            return
+        self.after_id = None
+        self.run = None
+        if self.stale:
+            self._start()
+            return
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback(run.result, run.error)
@@ -0,0 +1,73 @@
+import math
+import time
+
+from perf import recorder
+
+# 秒境界の直後に発火させるための余裕 (ミリ秒)
+BOUNDARY_SLACK_MS = 2
+
+
+class DeadlineTicker:
+    # 残り時間を time.monotonic() の期限から計算するので、
+    # after() の遅延やダイアログでの停止が積み重なっても時間がずれない
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.deadline = None
+        self.expected = None
+        self.last_report = None
+        self._reset_stats(0)
+
+    def _reset_stats(self, seconds):
+        self.nominal = seconds
+        self.ticks = 0
+        self.max_late = 0.0
+        self.total_late = 0.0
+
+    def start(self, seconds):
+        self.deadline = self.clock() + seconds
+        self.expected = None
+        self._reset_stats(seconds)
+
+    def remaining(self):
+        now = self.clock()
+        if self.expected is not None:
+            late = max(0.0, now - self.expected)
+            self.ticks += 1
+            self.total_late += late
+            self.max_late = max(self.max_late, late)
+            recorder.record("tick_late_ms", late * 1000)
+        return max(0, math.ceil(self.deadline - now))
+
+    def next_delay(self):
+        # 表示が次に切り替わる秒境界までのミリ秒数
+        now = self.clock()
+        left = self.deadline - now
+        fraction = left - (math.ceil(left) - 1) if left > 0 else 0.0
+        delay = math.ceil(fraction * 1000) + BOUNDARY_SLACK_MS
+        self.expected = now + delay / 1000
+        return delay
+
+    def end_delay(self):
+        # 期限 (残り時間が0になる時点) までのミリ秒数
+        # 表示を更新しない間は、これで次の切り替えまで一度だけ起こす
+        now = self.clock()
+        delay = max(0, math.ceil((self.deadline - now) * 1000)) + BOUNDARY_SLACK_MS
+        self.expected = now + delay / 1000
+        return delay
+
+    def finish(self):
+        # フェーズの終了時に、期限からのずれと途中の遅れを計測結果に加える
+        # (Perf ウィンドウと keeptimer_perf.json に phase_* として表示される)
+        now = self.clock()
+        self.last_report = {
+            "nominal_sec": self.nominal,
+            "end_drift_ms": round((now - self.deadline) * 1000, 1),
+            "ticks": self.ticks,
+            "max_late_ms": round(self.max_late * 1000, 1),
+            "mean_late_ms": round(self.total_late * 1000 / max(self.ticks, 1), 1),
+        }
+        for name in ("end_drift_ms", "max_late_ms", "mean_late_ms"):
+            recorder.record(f"phase_{name}", self.last_report[name])
+        self.deadline = None
+        self.expected = None
+        return self.last_report
@@ -1,8 +1,15 @@
 import tkinter as tk
 from tkinter import messagebox
-import csv
-from datetime import datetime, timedelta
 import subprocess
+from timer_engine import TimerEngine
+from checkpoint import CHECKPOINT_INTERVAL_SEC, Checkpoint
+from perf import timed
+from timer_checkpoint import recover_session, resync, save_if_due
+from session_storage import open_storage
+from instance import SingleInstance
+from lifecycle import AfterRegistry
+
+SESSION_BACKEND = "csv"  # セッションの保存先 ("csv" または "sqlite")
 
 
 class PomodroTimer:
@@ -12,73 +19,114 @@ class PomodroTimer:
         self.master.geometry("300x150")
         self.master.attributes("-topmost", True)  # ウィンドウを最前面に表示
 
-        self.time_left = 90 * 60  # 25分（秒単位）
-        self.is_break = False
-        self.is_running = False
+        # 90分作業, 10分休憩
+        self.engine = TimerEngine(
+            90,
+            10,
+            on_tick=self.show_time,
+            on_work_end=self.end_work,
+            on_break_end=self.end_break,
+            # 最小化中も、チェックポイントの間隔では起きて保存する
+            idle_wake_sec=CHECKPOINT_INTERVAL_SEC,
+        )
 
         self.label = tk.Label(master, text="90:00", font=("Arial", 48))
         self.label.pack(pady=20)
 
         self.button = tk.Button(master, text="Start", command=self.start_timer)
         self.button.pack()
-        self.duration_time = 0
+        # after() の予約 (終了時にまとめて取り消す)
+        self.afters = AfterRegistry(self.master)
+        self.storage = open_storage(SESSION_BACKEND)
+        # 強制終了に備えて、実行中の状態を数秒ごとに保存する
+        self.checkpoint = Checkpoint()
 
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # 最小化されている間は秒ごとに起こさず、再表示されたらすぐに表示を合わせる
+        self.time_text = None  # 表示中の残り時間
+        for sequence in ("<Map>", "<Unmap>", "<FocusIn>"):
+            self.master.bind(sequence, lambda event: resync(self, event), add="+")
+        # F12 で計測結果の Perf ウィンドウを開く
+        self.master.bind("<F12>", lambda event: self.show_perf())
+        self.perf_window = None
+        self.master.after_idle(lambda: recover_session(self))
 
     # タイマーのスタートとストップを切り替えるためのスクリプト
     def start_timer(self):
-        if not self.is_running:
-            self.is_running = True
+        if not self.engine.is_running:
+            self.engine.start()
             self.button.config(text="Stop")
             self.update_timer()
         else:
-            self.is_running = False
-            self.button.config(text="Start")
+            self.stop_timer()
+
+    def stop_timer(self):
+        self.engine.stop()
+        self.button.config(text="Start")
+        self.afters.cancel("tick")
+        self.checkpoint.save_engine(self.engine)
 
+    @timed("update_timer")
     def update_timer(self):
-        if self.is_running:
-            self.time_left -= 1
-            if self.is_running:
-                self.duration_time += 1
-            minutes, seconds = divmod(self.time_left, 60)
-            time_string = f"{minutes:02d}:{seconds:02d}"
-            self.label.config(text=time_string)
-
-            if self.time_left <= 0:
-                if not self.is_break:
-                    self.record_session()
-                    messagebox.showinfo(
-                        "Pomodoro", "作業セッション終了！休憩を取りましょう。"
-                    )
-                    self.time_left = 10 * 60  # 10分休憩
-                    self.is_break = True
-                    self.duration_time = 0  # duration_timeを0に変える
-                else:
-                    messagebox.showinfo("Pomodoro", "休憩終了！作業を再開しましょう。")
-                    self.time_left = 90 * 60  # 90分作業
-                    self.is_break = False
-
-            self.master.after(1000, self.update_timer)
-
-    def record_session(self):
-        end_time = datetime.now()
-        td = timedelta(seconds=self.duration_time)
-        with open("pomodoro_sessions.csv", "a", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(
-                [
-                    end_time.strftime("%Y-%m-%d"),
-                    str(td),
-                ]
-            )
+        hidden = self.is_hidden()
+        delay = self.engine.tick(idle=hidden)
+        if delay is None:
+            return
+        save_if_due(self, hidden)
+        self.afters.schedule("tick", delay, self.update_timer)
+
+    def show_time(self, time_left):
+        # 文字が変わったときだけ描き直す
+        minutes, seconds = divmod(time_left, 60)
+        text = f"{minutes:02d}:{seconds:02d}"
+        if text != self.time_text:
+            self.time_text = text
+            self.label.config(text=text)
+
+    def is_hidden(self):
+        return self.master.state() in ("iconic", "withdrawn")
+
+    def end_work(self):
+        self.record_session()
+        messagebox.showinfo("Pomodoro", "作業セッション終了！休憩を取りましょう。")
+
+    def end_break(self):
+        messagebox.showinfo("Pomodoro", "休憩終了！作業を再開しましょう。")
+
+    @timed("record_session")
+    def record_session(self, end_time=None):
+        self.storage.append(*self.engine.take_session(end_time))
+        self.checkpoint.clear()
+
+    def show_perf(self):
+        from perf_window import PerfWindow
+
+        # 一度だけ作り、閉じても隠しておく
+        if self.perf_window is None:
+            self.perf_window = PerfWindow(self.master)
+        self.perf_window.show()
 
     def on_closing(self):
+        if self.perf_window is not None:
+            self.perf_window.destroy()
+        self.afters.cancel_all()
         if messagebox.askyesno("保存", "現在の作業時間を保存しますか？"):
             self.record_session()
+        # 記録しなかった作業も、閉じて終了した場合は次回復元しない
+        self.checkpoint.clear()
+        self.checkpoint.close()
+        self.storage.close()
         self.master.destroy()
 
 
-root = tk.Tk()
-app = PomodroTimer(root)
-# 静止画面の生成のために必要
-root.mainloop()
+if __name__ == "__main__":
+    # 既に起動していれば、そのウィンドウを前面に出して終了する
+    instance = SingleInstance()
+    if not instance.acquire():
+        raise SystemExit
+    root = tk.Tk()
+    app = PomodroTimer(root)
+    instance.listen(root)
+    # 静止画面の生成のために必要
+    root.mainloop()
+    instance.close()
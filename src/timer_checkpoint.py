@@ -0,0 +1,60 @@
+# タイマーの状態の保存と復元 (timer.py / timer6.py / 260130_timer.py で共通)
+# app は engine, checkpoint, afters, master, is_hidden(), update_timer(),
+# record_session(end_time), show_time(time_left) を持つタイマーのウィンドウ
+from tkinter import EventType, messagebox
+
+
+def ask_recover(duration_time):
+    # 再開するなら True、記録するなら False、破棄するなら None
+    minutes, seconds = divmod(duration_time, 60)
+    return messagebox.askyesnocancel(
+        "復元",
+        f"前回の作業 ({minutes}分{seconds}秒) が記録されていません。\n"
+        "続きから再開しますか？\n(いいえ: 記録する / キャンセル: 破棄する)",
+    )
+
+
+def recover(checkpoint, engine, record, ask=ask_recover):
+    # 前回、記録されずに終了した作業があれば、再開するか記録するかを選ぶ
+    # record(end_time): 記録する。再開した場合は True を返す
+    state = checkpoint.load()
+    if state is None or state["duration_time"] == 0:
+        return False
+    answer = ask(state["duration_time"])
+    if answer is None:
+        checkpoint.clear()
+        return False
+    if not answer:
+        # 最後に保存した時点で終了したものとして記録する
+        engine.duration_time = state["duration_time"]
+        engine.session_start = state["session_start"]
+        record(state["saved_at"])
+        engine.duration_time = 0
+        return False
+    engine.restore(state)
+    return True
+
+
+def recover_session(app):
+    if recover(app.checkpoint, app.engine, app.record_session):
+        app.show_time(app.engine.time_left)
+
+
+def save_if_due(app, hidden):
+    # 最小化中は起きる回数が少ないので、起きるたびに保存する
+    if hidden or app.checkpoint.due():
+        app.checkpoint.save_engine(app.engine)
+
+
+def resync(app, event):
+    # 表示・非表示が切り替わったら、待っている after を取り消してすぐに進め、
+    # 次に起こす時刻を決め直す (子ウィジェットの Map/Unmap は無視する)
+    if event.type != EventType.FocusIn and event.widget is not app.master:
+        return
+    if not app.afters.pending("tick"):
+        return
+    app.afters.cancel("tick")
+    if app.is_hidden():
+        # 次に起きるまでの分を失わないよう、隠した時点でも保存しておく
+        app.checkpoint.save_engine(app.engine)
+    app.update_timer()
@@ -0,0 +1,139 @@
+# 作業・休憩の切り替えと経過時間の管理 (画面に依存しない)
+# 時計を差し替えられるので、ウィンドウなしで何日分ものセッションを一瞬で進められる
+#   engine = TimerEngine(on_tick=..., on_work_end=..., on_break_end=...)
+#   engine.start(); delay = engine.tick()  # delay ミリ秒後にまた tick() を呼ぶ
+#   ウィンドウが最小化されている間は tick(idle=True) で次の切り替えまで呼ばない
+#   (idle_wake_sec を指定すると、最小化中もその間隔では起こす)
+import time
+from datetime import datetime, timedelta
+
+from tick import DeadlineTicker
+
+WORKING_MIN = 90
+REST_MIN = 10
+
+
+def local_now():
+    return datetime.now().astimezone()
+
+
+def _ignore(*args):
+    pass
+
+
+class TimerEngine:
+    # on_tick(time_left): 残り時間が進んだとき
+    # on_work_end(): 作業時間が終わったとき (duration_time は作業した秒数のまま)
+    # on_break_end(): 休憩時間が終わったとき
+    # コールバックの中でダイアログを表示しても、閉じた時点から次の時間を計測する
+    # idle_wake_sec: 最小化中に起こす間隔 (チェックポイントを保存するため)
+    def __init__(
+        self,
+        working_min=WORKING_MIN,
+        rest_min=REST_MIN,
+        clock=time.monotonic,
+        now=local_now,
+        on_tick=_ignore,
+        on_work_end=_ignore,
+        on_break_end=_ignore,
+        idle_wake_sec=None,
+    ):
+        self.now = now
+        self.idle_wake_sec = idle_wake_sec
+        self.ticker = DeadlineTicker(clock)
+        self.on_tick = on_tick
+        self.on_work_end = on_work_end
+        self.on_break_end = on_break_end
+        self.is_running = False
+        self.configure(working_min, rest_min)
+
+    def configure(self, working_min, rest_min):
+        # 作業・休憩の時間を変えて、作業の最初に戻す
+        self.working_min = working_min
+        self.rest_min = rest_min
+        self.time_left = working_min * 60
+        self.is_break = False
+        self.duration_time = 0
+        self.session_start = None  # 作業セッションを始めた時刻
+
+    def restore(self, state):
+        # Checkpoint.load() の結果から途中の状態に戻す
+        self.working_min = state["working_min"]
+        self.rest_min = state["rest_min"]
+        self.time_left = state["time_left"]
+        self.is_break = state["is_break"]
+        self.duration_time = state["duration_time"]
+        self.session_start = state["session_start"]
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        if not self.is_break and self.session_start is None:
+            self.session_start = self.now()
+        self.ticker.start(self.time_left)
+
+    def stop(self):
+        # 最小化中は tick() が呼ばれないので、止めた時点までの経過を反映しておく
+        if self.is_running:
+            self._advance()
+        self.is_running = False
+
+    def take_session(self, end_time=None):
+        # 記録する (終了時刻, 作業した秒数, 開始時刻)。開始時刻は次の作業のために空にする
+        end_time = end_time or self.now()
+        start_time, self.session_start = self.session_start, None
+        return end_time, self.duration_time, start_time
+
+    def _advance(self):
+        # 期限から残り時間を求めて、経過した秒数だけ進める
+        elapsed = self.time_left - self.ticker.remaining()
+        self.time_left -= elapsed
+        if not self.is_break:
+            self.duration_time += elapsed
+
+    def tick(self, idle=False):
+        # 経過した秒数だけ進め、次に呼ぶまでのミリ秒数を返す (止まっていれば None)
+        # idle なら秒ごとではなく、作業・休憩の終わりまで
+        if not self.is_running:
+            return None
+        self._advance()
+        self.on_tick(self.time_left)
+
+        if self.time_left <= 0:
+            self.ticker.finish()
+            if not self.is_break:
+                self.on_work_end()
+                self.time_left = self.rest_min * 60
+                self.is_break = True
+                self.duration_time = 0
+            else:
+                self.on_break_end()
+                self.session_start = self.now()
+                self.time_left = self.working_min * 60
+                self.is_break = False
+            # コールバック (ダイアログ) が戻った時点から次の時間を計測する
+            self.ticker.start(self.time_left)
+        if idle:
+            delay = self.ticker.end_delay()
+            if self.idle_wake_sec is not None:
+                delay = min(delay, self.idle_wake_sec * 1000)
+            return delay
+        return self.ticker.next_delay()
+
+
+class VirtualClock:
+    # ベンチマーク用の時計。advance() で進めた分だけ時間が経つ
+    #   clock = VirtualClock(); TimerEngine(clock=clock.monotonic, now=clock.now)
+    def __init__(self, start=None):
+        self.start = start or local_now()
+        self.elapsed = 0.0
+
+    def monotonic(self):
+        return self.elapsed
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def advance(self, seconds):
+        self.elapsed += seconds
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src/ のモジュールはスクリプトと同じく、ディレクトリを import パスに入れて読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,42 @@
+from lifecycle import ChildWindow
+
+
+class FakeWindow:
+    # 表示状態だけを持つ Toplevel の代わり (テスト環境には画面がない)
+    def __init__(self, master):
+        self.status = "normal"
+
+    def winfo_exists(self):
+        return True
+
+    def state(self):
+        return self.status
+
+    def protocol(self, name, callback):
+        pass
+
+    def deiconify(self):
+        self.status = "normal"
+
+    def lift(self):
+        pass
+
+    def iconify(self):
+        self.status = "iconic"
+
+    def withdraw(self):
+        self.status = "withdrawn"
+
+
+def test_minimized_window_is_still_visible():
+    window = ChildWindow(None, lambda window: None, factory=FakeWindow)
+    assert not window.visible()
+    window.show()
+    assert window.visible()
+    # 最小化中に記録したセッションも、分析ウィンドウの集計に加える
+    window.window.iconify()
+    assert window.visible()
+    window.hide()
+    assert not window.visible()
+    window.show()
+    assert window.visible()
@@ -0,0 +1,29 @@
+import threading
+
+from perf import RING_SIZE, PerfRecorder
+
+
+def test_summary_while_recording_on_another_thread():
+    # 集計スレッドが記録している間に、Perf ウィンドウが summary() を呼ぶ
+    recorder = PerfRecorder(enabled=True)
+    stop = threading.Event()
+
+    def record():
+        i = 0
+        while not stop.is_set():
+            recorder.record("tick_late_ms", float(i % 50))
+            i += 1
+
+    recorder.record("tick_late_ms", 0.0)
+    thread = threading.Thread(target=record)
+    thread.start()
+    try:
+        for _ in range(50):
+            summary = recorder.summary()
+            # 件数とヒストグラムは同じ写しから数える
+            count = summary["tick_late_ms"]["count"]
+            assert sum(summary["tick_late_histogram"].values()) == count
+    finally:
+        stop.set()
+        thread.join()
+    assert recorder.summary()["tick_late_ms"]["count"] == RING_SIZE
@@ -0,0 +1,47 @@
+import os
+
+from binary_store import BinaryStore
+from rollup_cache import SessionRollup, binary_cache_path_for, load_binary_rollup
+
+ROWS = [
+    b"2024-01-01,1:30:00",
+    b"2024-01-01,0:25:00,1704069000,1704070500,+0900,work",
+    b"2024-01-02,0:25:00,1704155400,1704156900,+0900",
+]
+
+
+def append(path, rows):
+    with open(path, "ab") as file:
+        file.write(b"".join(row + b"\r\n" for row in rows))
+
+
+def full_rollup(store):
+    rollup = SessionRollup()
+    rollup.add_table(store.load_table())
+    return rollup
+
+
+def test_binary_rollup_adds_only_new_records(tmp_path):
+    csv_path = str(tmp_path / "sessions.csv")
+    binary_path = str(tmp_path / "sessions.bin")
+    append(csv_path, ROWS[:2])
+    store = BinaryStore(binary_path)
+    store.create()
+    store.sync(csv_path)
+    first = load_binary_rollup(binary_path)
+    assert os.path.exists(binary_cache_path_for(binary_path))
+
+    append(csv_path, ROWS[2:])
+    store.sync(csv_path)
+    rollup = load_binary_rollup(binary_path)
+    expected = full_rollup(store)
+    assert rollup.offset > first.offset
+    assert rollup.daily == expected.daily
+    assert rollup.tag_daily == expected.tag_daily
+    assert rollup.heatmap == expected.heatmap
+
+    # 作り直したストアでは、キャッシュを使わずに集計し直す
+    store.create()
+    append(csv_path, ROWS[2:])
+    store.sync(csv_path)
+    assert load_binary_rollup(binary_path).daily == full_rollup(store).daily
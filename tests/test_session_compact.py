@@ -0,0 +1,63 @@
+import os
+from datetime import date, datetime, timedelta
+
+from binary_store import BinaryStore
+from session_compact import compact
+from session_merge import state_path_for
+from session_storage import CsvStorage, SqliteStorage
+from session_table import load_sessions
+
+TODAY = date(2026, 1, 1)
+
+
+def write_log(csv_path, binary_path, days):
+    storage = CsvStorage(csv_path, binary_path)
+    for day in days:
+        for hour in (9, 13, 15):
+            end = datetime(day.year, day.month, day.day, hour)
+            storage.append(end, 25 * 60, tag="work" if hour == 13 else "")
+    storage.close()
+
+
+def total(table):
+    return int(table.seconds.sum())
+
+
+def test_compact_updates_copies(tmp_path):
+    csv_path = str(tmp_path / "sessions.csv")
+    binary_path = str(tmp_path / "sessions.bin")
+    db_path = str(tmp_path / "sessions.db")
+    merged_path = str(tmp_path / "sessions.merged.csv")
+    days = [TODAY - timedelta(days=n) for n in range(40, 0, -1)]
+    write_log(csv_path, binary_path, days[:30])
+    store = BinaryStore(binary_path)
+    store.create()
+    store.sync(csv_path)
+    database = SqliteStorage(db_path)
+    database.import_csv(csv_path)
+    database.close()
+    open(state_path_for(merged_path), "w").close()
+
+    # 取り込んでいない行も、まとめる前に SQLite に取り込まれる
+    write_log(csv_path, binary_path, days[30:])
+    expected = total(load_sessions(csv_path)[0])
+    result = compact(
+        csv_path,
+        20,
+        TODAY,
+        binary_path=binary_path,
+        db_path=db_path,
+        merged_path=merged_path,
+    )
+    assert result["rows"][1] < result["rows"][0]
+    assert total(load_sessions(csv_path)[0]) == expected
+    assert total(store.load_table()) == expected
+    assert not os.path.exists(state_path_for(merged_path))
+
+    # 次の取り込みは、まとめた後に追記された行だけを加える
+    write_log(csv_path, binary_path, [TODAY])
+    database = SqliteStorage(db_path)
+    assert database.import_csv(csv_path) == 3
+    monthly = database.stats().monthly_totals()
+    database.close()
+    assert sum(monthly.values()) == expected + 3 * 25 * 60
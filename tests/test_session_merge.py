@@ -0,0 +1,46 @@
+from collections import Counter
+
+from session_merge import update_merged
+
+TIMED = b"2024-01-01,0:25:00,1704069000,1704070500,+0900"
+TAGGED = b"2024-01-01,0:25:00,1704069000,1704070500,+0900,work"
+LEGACY = b"2024-01-01,1:30:00"  # 開始・終了時刻のない以前の形式
+SUMMARY = b"2023-12-01,4:00:00,,,,work"  # session_compact.py でまとめた行
+LONG = b'2024-01-02,"1 day, 0:00:00",1704067200,1704153600,+0900'
+
+
+def write(path, rows, mode="wb"):
+    with open(path, mode) as file:
+        file.write(b"".join(row + b"\r\n" for row in rows))
+
+
+def merged(tmp_path, *logs):
+    paths = []
+    for i, rows in enumerate(logs):
+        path = str(tmp_path / f"log{i}.csv")
+        write(path, sorted(rows, key=lambda row: row[:10]))
+        paths.append(path)
+    output = str(tmp_path / "merged.csv")
+    update_merged(paths, output)
+    return Counter(open(output, "rb").read().splitlines()), paths, output
+
+
+def test_timed_sessions_are_kept_once(tmp_path):
+    rows, _, _ = merged(tmp_path, [TIMED, TAGGED, LONG], [TIMED, LONG], [TIMED])
+    # 同じ時刻でもタグが違えば別のセッション
+    assert rows == Counter({TIMED: 1, TAGGED: 1, LONG: 1})
+
+
+def test_rows_without_times_add_up(tmp_path):
+    rows, _, _ = merged(tmp_path, [LEGACY, LEGACY, SUMMARY], [LEGACY, SUMMARY])
+    assert rows == Counter({LEGACY: 3, SUMMARY: 2})
+
+
+def test_incremental_merge_matches_full_merge(tmp_path):
+    later = b"2024-01-01,0:25:00,1704073000,1704074500,+0900"
+    _, paths, output = merged(tmp_path, [TIMED, LEGACY], [LEGACY])
+    write(paths[0], [later], "ab")
+    write(paths[1], [TIMED, later, LEGACY], "ab")
+    update_merged(paths, output)
+    rows = Counter(open(output, "rb").read().splitlines())
+    assert rows == Counter({TIMED: 1, later: 1, LEGACY: 3})
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from session_storage import (
+    MONTHLY_SQL,
+    SERIES_SQL,
+    TAG_MONTHLY_SQL,
+    TAG_SERIES_SQL,
+    SqliteStorage,
+    connect,
+)
+from session_table import load_sessions
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "sessions.db"))
+    yield storage
+    storage.close()
+
+
+@pytest.mark.parametrize(
+    "sql", [MONTHLY_SQL, SERIES_SQL, TAG_SERIES_SQL, TAG_MONTHLY_SQL]
+)
+def test_aggregates_do_not_sort(storage, sql):
+    # 集計は索引の順にたどれるので、一時的な B-tree での並べ替えはいらない
+    plan = storage.connection.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    details = [row[-1] for row in plan]
+    assert not [detail for detail in details if "TEMP B-TREE" in detail]
+    assert any("COVERING INDEX" in detail for detail in details)
+
+
+def test_hour_totals_follow_appends_and_imports(tmp_path, storage):
+    # 時の境界をまたぐセッションも、行を追加するたびに時ごとに分けて加わる
+    csv_path = str(tmp_path / "sessions.csv")
+    with open(csv_path, "wb") as file:
+        file.write(
+            b"2024-01-01,1:30:00\r\n"
+            b"2024-01-01,0:50:00,1704069000,1704072000,+0900,work\r\n"
+            b"2024-01-06,2:00:00,1704520800,1704528000,+0900\r\n"
+        )
+    storage.import_csv(csv_path)
+    expected = load_sessions(csv_path)[0].hour_heatmap()
+    assert np.array_equal(storage.stats().hour_heatmap(), expected)
+
+    storage.append(datetime(2024, 1, 3, 10, 10), 40 * 60, tag="work")
+    added = storage.stats().hour_heatmap() - expected
+    weekday = datetime(2024, 1, 3).weekday()
+    assert added[weekday, 9] == 30 * 60
+    assert added[weekday, 10] == 10 * 60
+    assert added.sum() == 40 * 60
+
+    # 以前のデータベースでは、開いたときに記録済みの行から一度だけ作る
+    heatmap = storage.stats().hour_heatmap()
+    storage.connection.execute("DROP TABLE hour_totals")
+    connect(storage.db_path).close()
+    assert np.array_equal(storage.stats().hour_heatmap(), heatmap)
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+from rollup_cache import write_json
+from stats_worker import StatsJob
+
+
+class FakeMaster:
+    # after() を呼び出し側で進める代わり
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_until(self, done, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            pending, self.pending = self.pending, {}
+            for callback in pending.values():
+                callback()
+            time.sleep(0.001)
+
+
+def test_runs_do_not_overlap_after_cancel():
+    master = FakeMaster()
+    active, overlaps = [0], []
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            active[0] += 1
+            overlaps.append(active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return "done"
+
+    first = StatsJob(master, compute)
+    second = StatsJob(master, compute)
+    first.request(lambda result, error: None)
+    # 取り消してもスレッドは残るので、次の集計はその終わりを待つ
+    first.cancel()
+    results = []
+    first.request(lambda result, error: results.append(result))
+    second.request(lambda result, error: results.append(result))
+    master.run_until(lambda: len(results) == 2)
+    assert results == ["done", "done"]
+    assert max(overlaps) == 1
+
+
+def test_write_json_uses_unique_temp_files(tmp_path):
+    path = str(tmp_path / "cache.json")
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(50):
+                write_json(path, {"writer": n, "i": i})
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert os.listdir(tmp_path) == ["cache.json"]
@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bench"))
+
+from binary_store import BinaryStore  # noqa: E402
+from session_writer import journal_paths  # noqa: E402
+from stress_append import KEY_BASE, check, import_until, write_rows  # noqa: E402
+
+WRITERS = 4
+ROWS = 100
+
+
+def test_concurrent_writers_keep_every_row(tmp_path):
+    # bench/stress_append.py --binary --importer を小さくしたもの
+    csv_path = str(tmp_path / "pomodoro_sessions.csv")
+    db_path = str(tmp_path / "pomodoro_sessions.db")
+    binary_path = str(tmp_path / "pomodoro_sessions.bin")
+    open(csv_path, "w").close()
+    BinaryStore(binary_path).create()
+    expected = [w * KEY_BASE + i for w in range(WRITERS) for i in range(ROWS)]
+
+    stop = multiprocessing.Event()
+    importer = multiprocessing.Process(
+        target=import_until, args=(csv_path, db_path, stop)
+    )
+    importer.start()
+    writers = [
+        multiprocessing.Process(
+            target=write_rows, args=(csv_path, binary_path, i, ROWS)
+        )
+        for i in range(WRITERS)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+    stop.set()
+    importer.join(60)
+
+    assert [writer.exitcode for writer in writers] == [0] * WRITERS
+    assert importer.exitcode == 0
+    assert check(csv_path, expected) == len(expected)
+    assert not journal_paths(csv_path)
+    starts = BinaryStore(binary_path).load_table().start.tolist()
+    assert sorted(starts) == expected
+    with sqlite3.connect(db_path) as connection:
+        (imported,) = connection.execute("SELECT COUNT(*) FROM sessions").fetchone()
+    assert imported == len(expected)
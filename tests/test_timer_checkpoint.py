@@ -0,0 +1,49 @@
+from checkpoint import Checkpoint
+from timer_checkpoint import recover
+from timer_engine import TimerEngine, VirtualClock
+
+
+def interrupted(tmp_path):
+    # 20分作業したところで強制終了された状態
+    clock = VirtualClock()
+    engine = TimerEngine(90, 10, clock=clock.monotonic, now=clock.now)
+    engine.start()
+    engine.tick()
+    clock.advance(1200)
+    engine.tick()
+    checkpoint = Checkpoint(str(tmp_path / "keeptimer.checkpoint"))
+    checkpoint.save_engine(engine)
+    checkpoint.close()
+    return Checkpoint(checkpoint.path), TimerEngine(90, 10)
+
+
+def test_resume_restores_engine(tmp_path):
+    checkpoint, engine = interrupted(tmp_path)
+    assert recover(checkpoint, engine, None, ask=lambda duration: True)
+    assert engine.duration_time == 1200
+    assert engine.time_left == 90 * 60 - 1200
+
+
+def test_record_uses_saved_time(tmp_path):
+    checkpoint, engine = interrupted(tmp_path)
+    recorded = []
+
+    def record(end_time):
+        recorded.append(engine.take_session(end_time))
+        checkpoint.clear()
+
+    assert not recover(checkpoint, engine, record, ask=lambda duration: False)
+    [(end_time, seconds, start_time)] = recorded
+    assert seconds == 1200
+    # 最後に保存した時点で終了したものとして、開始時刻と合わせて記録する
+    assert end_time is not None and start_time is not None
+    assert engine.duration_time == 0
+    # 記録した作業は次回の起動時に復元しない
+    assert checkpoint.load() is None
+
+
+def test_discard_clears_checkpoint(tmp_path):
+    checkpoint, engine = interrupted(tmp_path)
+    assert not recover(checkpoint, engine, None, ask=lambda duration: None)
+    assert checkpoint.load() is None
+    assert not recover(checkpoint, engine, None, ask=None)
@@ -0,0 +1,71 @@
+from timer_engine import TimerEngine, VirtualClock
+
+
+def make_engine():
+    clock = VirtualClock()
+    engine = TimerEngine(90, 10, clock=clock.monotonic, now=clock.now)
+    return engine, clock
+
+
+def test_stop_counts_time_while_idle():
+    # 最小化中は作業の終わりまで tick() が呼ばれないので、stop() で経過を反映する
+    engine, clock = make_engine()
+    engine.start()
+    engine.tick()
+    clock.advance(5)
+    engine.tick(idle=True)
+    clock.advance(1200)
+    engine.stop()
+    assert engine.duration_time == 1205
+    assert engine.time_left == 90 * 60 - 1205
+    assert engine.take_session()[1] == 1205
+
+
+def test_stop_after_restart_does_not_count_paused_time():
+    engine, clock = make_engine()
+    engine.start()
+    clock.advance(60)
+    engine.stop()
+    clock.advance(600)  # 止めている間
+    engine.start()
+    clock.advance(30)
+    engine.stop()
+    assert engine.duration_time == 90
+
+
+def test_stop_during_break_keeps_duration():
+    engine, clock = make_engine()
+    engine.start()
+    clock.advance(90 * 60)
+    engine.tick()
+    assert engine.is_break and engine.duration_time == 0
+    clock.advance(120)
+    engine.stop()
+    assert engine.duration_time == 0
+    assert engine.time_left == 10 * 60 - 120
+
+
+def test_idle_wakes_at_checkpoint_interval():
+    clock = VirtualClock()
+    engine = TimerEngine(90, 10, clock=clock.monotonic, now=clock.now, idle_wake_sec=5)
+    engine.start()
+    assert engine.tick(idle=True) == 5000
+    clock.advance(90 * 60 - 2)
+    # 作業の終わりが近ければ、終わりまでしか待たない
+    assert engine.tick(idle=True) < 5000
+
+
+def test_phase_drift_is_recorded(monkeypatch):
+    from perf import recorder
+
+    monkeypatch.setattr(recorder, "enabled", True)
+    monkeypatch.setattr(recorder, "series", {})
+    engine, clock = make_engine()
+    engine.start()
+    delay = engine.tick()
+    while not engine.is_break:
+        clock.advance(delay / 1000 + 0.003)  # 毎回 3 ms 遅れて起きる
+        delay = engine.tick()
+    summary = recorder.summary()
+    assert summary["phase_end_drift_ms"]["count"] == 1
+    assert summary["phase_max_late_ms"]["max"] >= 3